@@ -1,18 +1,17 @@
 #!/usr/bin/env python3
+import functools
 import os
+from typing import Callable, List, Mapping, Optional
 
 import aws_cdk as cdk
 
-from .lib.rfdk_deadline_template_stack import RfdkDeadlineTemplateStack, DeadlineStackProps
-from .lib.vpc_stack import VpcStack
-from .lib.storage_stack import StorageStack, StorageStackProps
-from .lib.spot_fleet_stack import SpotFleetStack, SpotFleetStackProps
-from .config import AppConfig
+from .config import AppConfig, config
+from .lib.instance_types import resolve_instance_requirements
+from .synth_cache import SynthCache
 
 app = cdk.App()
 
-# Get RFDK configuration options
-config: AppConfig = AppConfig()
+PROJECT_DIR = os.path.join(os.path.dirname(os.path.realpath(__file__)), os.pardir)
 
 # Create environment for the stacks
 env = cdk.Environment(
@@ -20,89 +19,532 @@ env = cdk.Environment(
     region=config.aws_region
 )
 
-# Create VPC Stack only if vpc_id is not provided
-vpc_stack = None
-if not config.vpc_id:
-    vpc_stack = VpcStack(
+# Fleets that state instance_requirements get their instance types from the bundled instance catalog
+config.spot_fleet_configs = resolve_instance_requirements(config.spot_fleet_configs)
+
+# Stacks are built on demand so that stacks which are not selected, and the
+# libraries they import, are never loaded.
+stacks: dict = {}
+
+
+def get_stack(name: str) -> Optional[cdk.Stack]:
+    """
+    Returns the named stack, building it and the stacks it depends on first
+    """
+    if name not in stacks:
+        stacks[name] = STACK_BUILDERS[name](config)
+    return stacks[name]
+
+
+def build_vpc_stack(config: AppConfig):
+    # Create VPC Stack only if vpc_id is not provided
+    if config.vpc_id:
+        return None
+
+    from .lib.vpc_stack import VpcStack, VpcStackProps
+
+    return VpcStack(
         app,
         "Renderfarm-VPC",
+        props=VpcStackProps(
+            nat_gateway_mode=config.nat_gateway_mode,
+            vpc_endpoints=config.vpc_endpoints
+        ),
+        env=env
+    )
+
+
+def build_vpc_endpoints_stack(config: AppConfig):
+    # Create VPC Endpoints Stack only for an imported VPC that opts in
+    if not config.vpc_id or not config.imported_vpc_endpoints:
+        return None
+    if config.nat_gateway_mode != 'single':
+        raise ValueError(
+            "nat_gateway_mode 'per_az' needs the VPC created by this app, imported VPCs keep their NAT gateways")
+
+    from .lib.vpc_stack import VpcEndpointsStack, VpcEndpointsStackProps
+
+    return VpcEndpointsStack(
+        app,
+        "Renderfarm-VPC-Endpoints",
+        props=VpcEndpointsStackProps(
+            vpc_id=config.vpc_id,
+            vpc_endpoints=config.imported_vpc_endpoints
+        ),
         env=env
     )
 
-# Create Deadline Stack with appropriate VPC reference
-if vpc_stack:
-    # Pass VPC object directly
+
+def build_deadline_stack(config: AppConfig):
+    from .lib.rfdk_deadline_template_stack import RfdkDeadlineTemplateStack, DeadlineStackProps
+
+    vpc_stack = get_stack("Renderfarm-VPC")
+
+    # Create Deadline Stack with appropriate VPC reference
     stack_props = DeadlineStackProps(
-        vpc=vpc_stack.vpc,
+        vpc=vpc_stack.vpc if vpc_stack else None,
+        vpc_id=config.vpc_id if not vpc_stack else None,
         aws_region=config.aws_region,
         renderqueue_name=config.renderqueue_name,
         zone_name=config.zone_name,
         deadline_version=config.deadline_version,
         use_traffic_encryption=config.use_traffic_encryption,
-        docker_recipes_stage_path=os.path.join(os.path.dirname(os.path.realpath(__file__)), os.pardir, 'stage'),
+        docker_recipes_stage_path=os.path.join(PROJECT_DIR, 'stage'),
         spot_fleet_configs=config.spot_fleet_configs,
+        baseline_fleet_configs=config.baseline_fleet_configs,
+        render_queue_instance_type=config.render_queue_instance_type,
+        render_queue_min_capacity=config.render_queue_min_capacity,
+        render_queue_max_capacity=config.render_queue_max_capacity,
+        render_queue_desired_capacity=config.render_queue_desired_capacity,
+        render_queue_scaling_metric=config.render_queue_scaling_metric,
+        render_queue_scaling_target=config.render_queue_scaling_target,
+        database_instance_type=config.database_instance_type,
+        database_instance_count=config.database_instance_count,
+        database_parameters=config.database_parameters,
+        burst_client_cidrs={region: settings['vpc_cidr'] for region, settings in config.burst_regions.items()},
     )
-else:
-    # Use existing VPC ID
-    stack_props = DeadlineStackProps(
-        vpc_id=config.vpc_id,
+
+    deadline_stack = RfdkDeadlineTemplateStack(
+        app,
+        "RfdkDeadlineTemplateStack",
+        props=stack_props,
+        env=env
+    )
+
+    # Add dependency only if VPC stack was created
+    if vpc_stack:
+        deadline_stack.add_dependency(vpc_stack)
+
+    return deadline_stack
+
+
+def build_storage_stack(config: AppConfig):
+    from .lib.storage_stack import StorageStack, StorageStackProps
+
+    vpc_stack = get_stack("Renderfarm-VPC")
+
+    storage_stack = StorageStack(
+        app,
+        "RenderFarmStorageStack",
+        props=StorageStackProps(
+            vpc=vpc_stack.vpc if vpc_stack else None,
+            vpc_id=config.vpc_id if not vpc_stack else None,
+            enable_fsx_zfs=config.enable_fsx_zfs,
+            enable_efs=config.enable_efs,
+            efs_throughput_mode=config.efs_throughput_mode,
+            efs_provisioned_throughput=config.efs_provisioned_throughput,
+            efs_performance_mode=config.efs_performance_mode,
+            production_storage=config.production_storage,
+            enable_fsx_lustre=config.enable_fsx_lustre,
+            lustre_deployment_type=config.lustre_deployment_type,
+            lustre_storage_capacity=config.lustre_storage_capacity,
+            lustre_throughput_per_tib=config.lustre_throughput_per_tib,
+            lustre_s3_bucket_name=config.lustre_s3_bucket_name,
+            enable_asset_bucket=config.enable_asset_bucket,
+            asset_bucket_name=config.asset_bucket_name,
+            spot_fleet_configs=config.spot_fleet_configs,
+            baseline_fleet_configs=config.baseline_fleet_configs,
+            zfs_throughput_per_worker=config.zfs_throughput_per_worker,
+            zfs_iops_per_worker=config.zfs_iops_per_worker,
+            zfs_capacity_per_worker=config.zfs_capacity_per_worker,
+            zfs_storage_capacity=config.zfs_storage_capacity,
+            zfs_throughput_capacity=config.zfs_throughput_capacity,
+            zfs_iops=config.zfs_iops,
+            storage_placement=config.storage_placement,
+            zfs_subnet_ids=config.zfs_subnet_ids,
+            burst_client_cidrs={
+                region: settings['vpc_cidr'] for region, settings in config.burst_regions.items()
+                if settings.get('mount_storage', True)
+            }
+        ),
+        env=env
+    )
+
+    # Add dependencies for storage stack
+    if vpc_stack:
+        storage_stack.add_dependency(vpc_stack)
+
+    return storage_stack
+
+
+def build_worker_ami_stack(config: AppConfig):
+    # Create Worker AMI Stack only if golden worker AMIs are enabled
+    if not config.build_worker_ami:
+        return None
+
+    from .lib.worker_ami_stack import WorkerAmiStack, WorkerAmiStackProps
+
+    vpc_stack = get_stack("Renderfarm-VPC")
+
+    worker_ami_stack = WorkerAmiStack(
+        app,
+        "WorkerAmiStack",
+        props=WorkerAmiStackProps(
+            vpc=vpc_stack.vpc if vpc_stack else None,
+            vpc_id=config.vpc_id if not vpc_stack else None,
+            deadline_version=config.deadline_version,
+            spot_fleet_configs=config.spot_fleet_configs,
+            ami_version=config.worker_ami_version
+        ),
+        env=env
+    )
+    if vpc_stack:
+        worker_ami_stack.add_dependency(vpc_stack)
+
+    return worker_ami_stack
+
+
+def build_spot_fleet_stack(config: AppConfig):
+    from .lib.spot_fleet_stack import SpotFleetStack, SpotFleetStackProps
+
+    vpc_stack = get_stack("Renderfarm-VPC")
+    deadline_stack = get_stack("RfdkDeadlineTemplateStack")
+    storage_stack = get_stack("RenderFarmStorageStack")
+    worker_ami_stack = get_stack("WorkerAmiStack")
+
+    # Point each fleet at its baked AMI
+    spot_fleet_configs = config.spot_fleet_configs
+    if worker_ami_stack:
+        spot_fleet_configs = {
+            key: {**fleet, 'worker_image': {config.aws_region: worker_ami_stack.image_ids[fleet['name']]}}
+            if fleet['name'] in worker_ami_stack.image_ids else fleet
+            for key, fleet in config.spot_fleet_configs.items()
+        }
+
+    # Create Spot Fleet Stack
+    spot_fleet_props = SpotFleetStackProps(
+        vpc=deadline_stack.vpc,
         aws_region=config.aws_region,
-        renderqueue_name=config.renderqueue_name,
-        zone_name=config.zone_name,
-        deadline_version=config.deadline_version,
+        spot_fleet_configs=spot_fleet_configs,
+        render_queue=deadline_stack.render_queue,
+        repository=deadline_stack.repository,
+        security_group_ids=[deadline_stack.render_worker_sg.security_group_id],
+        create_resource_tracker_role=True,
         use_traffic_encryption=config.use_traffic_encryption,
-        docker_recipes_stage_path=os.path.join(os.path.dirname(os.path.realpath(__file__)), os.pardir, 'stage'),
-        spot_fleet_configs=config.spot_fleet_configs,
+        worker_mounts=storage_stack.worker_mounts,
+        worker_local_storage=config.worker_local_storage,
+        worker_boot_timing=config.worker_boot_timing,
+        spot_plugin_preset=config.spot_plugin_preset,
+        spot_plugin_settings=config.spot_plugin_settings
     )
 
-deadline_stack = RfdkDeadlineTemplateStack(
-    app,
-    "RfdkDeadlineTemplateStack",
-    props=stack_props,
-    env=env
-)
+    spot_fleet_stack = SpotFleetStack(
+        app,
+        "SpotFleetStack",
+        props=spot_fleet_props,
+        env=env
+    )
 
-# Add dependency only if VPC stack was created
-if vpc_stack:
-    deadline_stack.add_dependency(vpc_stack)
+    # Add dependencies
+    if vpc_stack:
+        spot_fleet_stack.add_dependency(vpc_stack)
+    spot_fleet_stack.add_dependency(deadline_stack)
+    spot_fleet_stack.add_dependency(storage_stack)
+    if worker_ami_stack:
+        spot_fleet_stack.add_dependency(worker_ami_stack)
 
-# Create Storage Stack
-storage_stack = StorageStack(
-    app,
-    "RenderFarmStorageStack",
-    props=StorageStackProps(
-        vpc=vpc_stack.vpc if vpc_stack else None,
-        vpc_id=config.vpc_id if not vpc_stack else None,
-        enable_efs=config.enable_efs
-    ),
-    env=env
-)
+    return spot_fleet_stack
 
-# Add dependencies for storage stack
-if vpc_stack:
-    storage_stack.add_dependency(vpc_stack)
-
-# Create Spot Fleet Stack
-spot_fleet_props = SpotFleetStackProps(
-    vpc=vpc_stack.vpc if vpc_stack else None,
-    vpc_id=config.vpc_id if not vpc_stack else None,
-    aws_region=config.aws_region,
-    spot_fleet_configs=config.spot_fleet_configs,
-    render_queue=deadline_stack.render_queue,
-    security_group_ids=[deadline_stack.render_worker_sg.security_group_id],
-    create_resource_tracker_role=True
-)
 
-spot_fleet_stack = SpotFleetStack(
-    app,
-    "SpotFleetStack",
-    props=spot_fleet_props,
-    env=env
+def build_baseline_fleet_stack(config: AppConfig):
+    # Create Baseline Fleet Stack only if baseline fleets are configured
+    if not config.baseline_fleet_configs:
+        return None
+
+    from .lib.baseline_fleet_stack import BaselineFleetStack, BaselineFleetStackProps
+
+    vpc_stack = get_stack("Renderfarm-VPC")
+    deadline_stack = get_stack("RfdkDeadlineTemplateStack")
+    storage_stack = get_stack("RenderFarmStorageStack")
+
+    baseline_fleet_stack = BaselineFleetStack(
+        app,
+        "BaselineFleetStack",
+        props=BaselineFleetStackProps(
+            vpc=deadline_stack.vpc,
+            baseline_fleet_configs=config.baseline_fleet_configs,
+            render_queue=deadline_stack.render_queue,
+            repository=deadline_stack.repository,
+            security_group_id=deadline_stack.render_worker_sg.security_group_id,
+            use_traffic_encryption=config.use_traffic_encryption,
+            worker_mounts=storage_stack.worker_mounts,
+            worker_local_storage=config.worker_local_storage,
+            worker_boot_timing=config.worker_boot_timing
+        ),
+        env=env
+    )
+
+    if vpc_stack:
+        baseline_fleet_stack.add_dependency(vpc_stack)
+    baseline_fleet_stack.add_dependency(deadline_stack)
+    baseline_fleet_stack.add_dependency(storage_stack)
+
+    return baseline_fleet_stack
+
+
+def build_monitoring_stack(config: AppConfig):
+    # Create Monitoring Stack only if monitoring is enabled
+    if not config.enable_monitoring:
+        return None
+
+    from .lib.monitoring_stack import MonitoringStack, MonitoringStackProps
+
+    deadline_stack = get_stack("RfdkDeadlineTemplateStack")
+    storage_stack = get_stack("RenderFarmStorageStack")
+
+    monitoring_stack = MonitoringStack(
+        app,
+        "RenderFarmMonitoringStack",
+        props=MonitoringStackProps(
+            render_queue=deadline_stack.render_queue,
+            render_queue_service=deadline_stack.render_queue_service,
+            database=deadline_stack.database,
+            efs_file_system_id=getattr(storage_stack, 'efs_file_system_id', None),
+            zfs_file_system_id=getattr(storage_stack, 'fsx_file_system_id', None),
+            lustre_file_system_id=getattr(storage_stack, 'lustre_file_system_id', None),
+            spot_fleet_configs=config.spot_fleet_configs,
+            alarm_thresholds=config.alarm_thresholds,
+            alarm_email=config.alarm_email,
+            worker_boot_timing=config.worker_boot_timing
+        ),
+        env=env
+    )
+    monitoring_stack.add_dependency(deadline_stack)
+    monitoring_stack.add_dependency(storage_stack)
+
+    return monitoring_stack
+
+
+def build_burst_region_stack(config: AppConfig, region: str):
+    from .lib.burst_region_stack import BurstRegionStack, BurstRegionStackProps, validate_burst_regions
+
+    deadline_stack = get_stack("RfdkDeadlineTemplateStack")
+    storage_stack = get_stack("RenderFarmStorageStack")
+    validate_burst_regions(config.aws_region, deadline_stack.vpc.vpc_cidr_block,
+                           config.burst_regions, config.spot_fleet_configs)
+    burst_settings = config.burst_regions[region]
+    render_queue = deadline_stack.render_queue
+
+    burst_stack = BurstRegionStack(
+        app,
+        f"BurstRegion-{region}",
+        props=BurstRegionStackProps(
+            primary_region=config.aws_region,
+            primary_vpc=deadline_stack.vpc,
+            vpc_cidr=burst_settings['vpc_cidr'],
+            spot_fleet_configs={
+                key: fleet for key, fleet in config.spot_fleet_configs.items()
+                if region in (fleet.get('burst_regions') or {})
+            },
+            render_queue_address=f'{render_queue.endpoint.hostname}:{render_queue.endpoint.port_as_string()}',
+            render_queue_ca_secret_arn=render_queue.cert_chain.secret_arn if render_queue.cert_chain else None,
+            use_traffic_encryption=config.use_traffic_encryption,
+            worker_mounts=storage_stack.worker_mounts if burst_settings.get('mount_storage', True) else [],
+            worker_local_storage=config.worker_local_storage,
+            worker_boot_timing=config.worker_boot_timing,
+            nat_gateway_mode=config.nat_gateway_mode,
+            vpc_endpoints=config.vpc_endpoints
+        ),
+        env=cdk.Environment(account=env.account, region=region)
+    )
+
+    burst_stack.add_dependency(deadline_stack)
+    burst_stack.add_dependency(storage_stack)
+    return burst_stack
+
+
+def build_burst_peering_stack(config: AppConfig, region: str):
+    from .lib.burst_region_stack import BurstPeeringStack, BurstPeeringStackProps
+
+    deadline_stack = get_stack("RfdkDeadlineTemplateStack")
+    burst_stack = get_stack(f"BurstRegion-{region}")
+
+    peering_stack = BurstPeeringStack(
+        app,
+        f"BurstPeering-{region}",
+        props=BurstPeeringStackProps(
+            burst_region=region,
+            burst_vpc=burst_stack.vpc,
+            vpc_cidr=config.burst_regions[region]['vpc_cidr'],
+            peering_connection_id=burst_stack.peering_connection_id,
+            primary_vpc=deadline_stack.vpc,
+            dns_zone=deadline_stack.dns_zone
+        ),
+        env=env
+    )
+    peering_stack.add_dependency(burst_stack)
+    return peering_stack
+
+
+STACK_BUILDERS: Mapping[str, Callable[[AppConfig], Optional[cdk.Stack]]] = {
+    "Renderfarm-VPC": build_vpc_stack,
+    "Renderfarm-VPC-Endpoints": build_vpc_endpoints_stack,
+    "RfdkDeadlineTemplateStack": build_deadline_stack,
+    "RenderFarmStorageStack": build_storage_stack,
+    "WorkerAmiStack": build_worker_ami_stack,
+    "SpotFleetStack": build_spot_fleet_stack,
+    "BaselineFleetStack": build_baseline_fleet_stack,
+    "RenderFarmMonitoringStack": build_monitoring_stack,
+}
+
+# Stacks each stack depends on
+STACK_DEPENDENCIES: Mapping[str, List[str]] = {
+    "Renderfarm-VPC": [],
+    "Renderfarm-VPC-Endpoints": [],
+    "RfdkDeadlineTemplateStack": ["Renderfarm-VPC"],
+    "RenderFarmStorageStack": ["Renderfarm-VPC"],
+    "WorkerAmiStack": ["Renderfarm-VPC"],
+    "SpotFleetStack": ["Renderfarm-VPC", "RfdkDeadlineTemplateStack", "RenderFarmStorageStack", "WorkerAmiStack"],
+    "BaselineFleetStack": ["Renderfarm-VPC", "RfdkDeadlineTemplateStack", "RenderFarmStorageStack"],
+    "RenderFarmMonitoringStack": ["RfdkDeadlineTemplateStack", "RenderFarmStorageStack"],
+}
+
+# Each burst region gets a worker stack in that region and a peering stack in the primary region
+for burst_region in config.burst_regions:
+    STACK_BUILDERS[f"BurstRegion-{burst_region}"] = functools.partial(build_burst_region_stack, region=burst_region)
+    STACK_BUILDERS[f"BurstPeering-{burst_region}"] = functools.partial(build_burst_peering_stack, region=burst_region)
+    STACK_DEPENDENCIES[f"BurstRegion-{burst_region}"] = ["RfdkDeadlineTemplateStack", "RenderFarmStorageStack"]
+    STACK_DEPENDENCIES[f"BurstPeering-{burst_region}"] = ["RfdkDeadlineTemplateStack", f"BurstRegion-{burst_region}"]
+
+# AppConfig fields that shape each stack's template, used to key the synthesis cache.
+# Values a stack takes from the stacks it depends on are covered by their keys.
+STACK_CONFIG_FIELDS: Mapping[str, List[str]] = {
+    "Renderfarm-VPC": ['aws_region', 'vpc_id', 'nat_gateway_mode', 'vpc_endpoints'],
+    "Renderfarm-VPC-Endpoints": ['aws_region', 'vpc_id', 'nat_gateway_mode', 'imported_vpc_endpoints'],
+    "RfdkDeadlineTemplateStack": [
+        'aws_region', 'vpc_id', 'renderqueue_name', 'zone_name', 'deadline_version',
+        'use_traffic_encryption', 'spot_fleet_configs', 'render_queue_instance_type',
+        'render_queue_min_capacity', 'render_queue_max_capacity', 'render_queue_desired_capacity',
+        'render_queue_scaling_metric', 'render_queue_scaling_target', 'database_instance_type',
+        'database_instance_count', 'database_parameters', 'burst_regions', 'baseline_fleet_configs',
+    ],
+    "RenderFarmStorageStack": [
+        'aws_region', 'vpc_id', 'enable_fsx_zfs', 'enable_efs', 'efs_throughput_mode',
+        'efs_provisioned_throughput', 'efs_performance_mode', 'production_storage', 'enable_fsx_lustre',
+        'lustre_deployment_type', 'lustre_storage_capacity', 'lustre_throughput_per_tib',
+        'lustre_s3_bucket_name', 'spot_fleet_configs', 'zfs_throughput_per_worker', 'zfs_iops_per_worker',
+        'zfs_capacity_per_worker', 'zfs_storage_capacity', 'zfs_throughput_capacity', 'zfs_iops', 'burst_regions',
+        'baseline_fleet_configs', 'enable_asset_bucket', 'asset_bucket_name', 'storage_placement',
+        'zfs_subnet_ids',
+    ],
+    "WorkerAmiStack": [
+        'aws_region', 'vpc_id', 'build_worker_ami', 'worker_ami_version', 'deadline_version', 'spot_fleet_configs',
+    ],
+    "SpotFleetStack": [
+        'aws_region', 'vpc_id', 'spot_fleet_configs', 'build_worker_ami', 'use_traffic_encryption',
+        'worker_local_storage', 'worker_boot_timing', 'spot_plugin_preset', 'spot_plugin_settings',
+    ],
+    "BaselineFleetStack": [
+        'aws_region', 'vpc_id', 'baseline_fleet_configs', 'use_traffic_encryption', 'worker_local_storage',
+        'worker_boot_timing',
+    ],
+    "RenderFarmMonitoringStack": [
+        'aws_region', 'spot_fleet_configs', 'alarm_thresholds', 'alarm_email', 'worker_boot_timing',
+    ],
+    **{f"BurstRegion-{burst_region}": [
+        'aws_region', 'vpc_id', 'burst_regions', 'spot_fleet_configs', 'use_traffic_encryption',
+        'worker_local_storage', 'worker_boot_timing', 'nat_gateway_mode', 'vpc_endpoints',
+    ] for burst_region in config.burst_regions},
+    **{f"BurstPeering-{burst_region}": ['aws_region', 'vpc_id', 'burst_regions']
+       for burst_region in config.burst_regions},
+}
+
+# Context keys that only select what this app builds and never shape a template
+CACHE_IGNORED_CONTEXT = ['stacks', 'synth-cache', 'aws:cdk:bundling-stacks']
+
+
+def is_stack_enabled(name: str) -> bool:
+    """
+    Returns False for optional stacks the config turns off
+    """
+    if name == "Renderfarm-VPC":
+        return not config.vpc_id
+    if name == "Renderfarm-VPC-Endpoints":
+        return bool(config.vpc_id and config.imported_vpc_endpoints)
+    if name == "WorkerAmiStack":
+        return config.build_worker_ami
+    if name == "RenderFarmMonitoringStack":
+        return config.enable_monitoring
+    if name == "BaselineFleetStack":
+        return bool(config.baseline_fleet_configs)
+    return True
+
+
+def with_dependencies(names: List[str]) -> List[str]:
+    """
+    Returns the enabled stacks together with every enabled stack they depend on, in STACK_BUILDERS order
+    """
+    required = set()
+    pending = list(names)
+    while pending:
+        name = pending.pop()
+        if name in required or not is_stack_enabled(name):
+            continue
+        required.add(name)
+        pending += STACK_DEPENDENCIES[name]
+    return [name for name in STACK_BUILDERS if name in required]
+
+
+def get_dependents(name: str) -> List[str]:
+    """
+    Returns the enabled stacks that depend on a stack
+    """
+    return [other for other, dependencies in STACK_DEPENDENCIES.items()
+            if name in dependencies and is_stack_enabled(other)]
+
+
+# Build only some stacks with `cdk synth -c stacks=SpotFleetStack,WorkerAmiStack`, the stacks they
+# depend on are built as well. Stacks that depend on a stack add resources and exports to it, so
+# the templates of dependencies built without their dependents differ from a full synth. Use the
+# flag to synth or diff the selected stacks and deploy from a full synth. All stacks are built by default.
+selected_stacks = app.node.try_get_context('stacks')
+if selected_stacks:
+    selected_stacks = [name.strip() for name in selected_stacks.split(',') if name.strip()]
+    unknown_stacks = [name for name in selected_stacks if name not in STACK_BUILDERS]
+    if unknown_stacks:
+        raise ValueError(
+            f"Unknown stacks {', '.join(unknown_stacks)}, expected any of {', '.join(STACK_BUILDERS)}")
+else:
+    selected_stacks = list(STACK_BUILDERS)
+selected_stacks = with_dependencies(selected_stacks)
+
+# With `-c synth-cache=true`, stacks whose config fields, context, libraries and source are
+# unchanged since the last synth are copied from the local cache in .cdk-cache instead of being
+# built. config.py is left out of the source hash, each stack is keyed on its STACK_CONFIG_FIELDS
+# instead, and config fields no stack lists are part of every key. The fleet stacks take RFDK
+# constructs from the Deadline stack, so a stack is only restored together with every stack
+# it depends on or that depends on it, which in practice only happens on an unchanged rerun.
+synth_cache = SynthCache(
+    cache_dir=os.path.join(PROJECT_DIR, '.cdk-cache'),
+    source_dir=os.path.dirname(os.path.realpath(__file__)),
+    enabled=str(app.node.try_get_context('synth-cache')).lower() == 'true',
+    ignored_files=['config.py']
 )
+if synth_cache.enabled:
+    with open(os.path.join(PROJECT_DIR, 'cdk.json')) as cdk_json:
+        cdk_settings = cdk_json.read()
+    # Context from cdk.context.json, the CLI and lookups, e.g. the VPC found by Vpc.from_lookup
+    context = {key: value for key, value in app.node.get_all_context().items() if key not in CACHE_IGNORED_CONTEXT}
+    unlisted_fields = [field for field in vars(config)
+                       if not any(field in fields for fields in STACK_CONFIG_FIELDS.values())]
+    for name in selected_stacks:
+        synth_cache.compute_key(name, {
+            'account': env.account,
+            'cdk_settings': cdk_settings,
+            'context': context,
+            'config': {field: value for field, value in vars(config).items()
+                       if field in STACK_CONFIG_FIELDS[name] or field in unlisted_fields},
+        })
+cached_stacks = synth_cache.select_restorable(selected_stacks, STACK_DEPENDENCIES)
+
+built_stacks = [name for name in selected_stacks if name not in cached_stacks]
+for name in built_stacks:
+    get_stack(name)
 
-# Add dependencies
-if vpc_stack:
-    spot_fleet_stack.add_dependency(vpc_stack)
-spot_fleet_stack.add_dependency(deadline_stack)
+# Stacks built without every stack that depends on them are incomplete and never cached
+complete_stacks = [name for name in built_stacks
+                   if all(dependent in selected_stacks for dependent in get_dependents(name))]
 
-app.synth()
\ No newline at end of file
+assembly = app.synth()
+synth_cache.save(assembly.directory, complete_stacks)
+synth_cache.restore(assembly.directory, cached_stacks)
@@ -12,6 +12,17 @@ class AppConfig:
         self.aws_region:str = os.getenv('CDK_DEFAULT_REGION')
         self.vpc_id: str = os.getenv('CDK_DEFAULT_VPC')
 
+        # Network settings, applied to the VPC this app creates and the burst region VPCs.
+        # 'single' NAT gateway or one NAT gateway 'per_az'. Imported VPCs (vpc_id) keep their NAT gateways.
+        self.nat_gateway_mode: str = 'single'
+        # VPC endpoints for the private subnets. 's3' is a free gateway endpoint, 'ecr',
+        # 'secrets_manager', 'ssm', 'logs' and 'ec2' are interface endpoints billed per AZ and hour
+        # that keep worker and RCS traffic to those services off the NAT.
+        self.vpc_endpoints: list = ['s3']
+        # VPC endpoints added to an imported VPC (vpc_id), same names as vpc_endpoints. None by default,
+        # since they change the VPC's route tables and private DNS for everything else running in it.
+        self.imported_vpc_endpoints: list = []
+
         # DNS settings
         self.renderqueue_name: str = 'renderqueue'
         self.zone_name: str = 'deadline.internal'
@@ -20,12 +31,122 @@ class AppConfig:
         self.deadline_version: str = '10.4.2'
         self.use_traffic_encryption: bool = True
 
+        # Render Queue (RCS) scaling. Settings left as None are derived from the
+        # total max_capacity of the Spot fleets.
+        self.render_queue_instance_type: str = None
+        self.render_queue_min_capacity: int = None
+        self.render_queue_max_capacity: int = None
+        self.render_queue_desired_capacity: int = None
+        # When max exceeds min, RCS tasks scale with target tracking and an ECS capacity provider
+        # scales the instances. Farms deployed before autoscaling have their RCS service replaced once.
+        # Target tracking on 'cpu' (average CPU %) or 'requests' (ALB requests per RCS per minute)
+        self.render_queue_scaling_metric: str = 'cpu'
+        self.render_queue_scaling_target: int = None
+
+        # Deadline Repository database (DocumentDB). Settings left as None are derived
+        # from the total max_capacity of the Spot fleets. They apply to the cluster RFDK's
+        # Repository creates, which changing them modifies in place rather than replacing.
+        self.database_instance_type: str = None
+        # The first instance is the writer, the rest are read replicas
+        self.database_instance_count: int = None
+        # DocumentDB cluster parameter overrides, e.g. {'profiler': 'enabled'}
+        self.database_parameters: dict = {}
+
         # Deadline's Resource Tracker only supports a single Deadline Repository per AWS account.
         # Set to False if there is an existing Deadline Repository in the account.
         self.create_resource_tracker_role: bool = True
 
         # Storage settings
+        self.enable_fsx_zfs: bool = True
         self.enable_efs: bool = True
+        # 'elastic', 'provisioned' or 'bursting'
+        self.efs_throughput_mode: str = 'elastic'
+        # MiB/s, only used by the provisioned throughput mode
+        self.efs_provisioned_throughput: int = None
+        # 'general_purpose' or 'max_io'
+        self.efs_performance_mode: str = 'general_purpose'
+        # File system mounted on workers as /mnt/production, 'efs' or 'zfs'
+        self.production_storage: str = 'efs'
+
+        # Assemble instance store NVMe (RAID0 across several disks) on workers, cache reads from
+        # /mnt/production on it with FS-Cache and expose /mnt/local/scratch (RENDER_SCRATCH) to jobs.
+        # Instances without instance store (types without a 'd', e.g. c5 vs c5d) get scratch on the root volume.
+        self.worker_local_storage: bool = True
+
+        # FSx OpenZFS sizing, derived from the total max_capacity of the Spot fleets.
+        # Per-worker budgets are rounded up to valid FSx values.
+        self.zfs_throughput_per_worker: int = 50  # MB/s
+        self.zfs_iops_per_worker: int = 500
+        self.zfs_capacity_per_worker: int = 16  # GiB
+        # Set to override the computed values
+        self.zfs_storage_capacity: int = None  # GiB
+        self.zfs_throughput_capacity: int = None  # MB/s
+        self.zfs_iops: int = None
+
+        # Where single-AZ storage (Lustre) and the preferred OpenZFS file server are placed. 'first_az' uses
+        # the VPC's first private subnet, 'fleet_az' uses the AZ that can run the most workers, weighted by
+        # max_capacity and the fleets' availability_zones, so NFS traffic stays in-AZ
+        self.storage_placement: str = 'first_az'
+        # Subnets of an OpenZFS file system deployed by an earlier version of this app, which picked two
+        # random private subnets. A different pair replaces the file system and loses its data, so copy
+        # them from `aws fsx describe-file-systems`, PreferredSubnetId first. They take precedence over
+        # storage_placement. e.g. ['subnet-0a1b2c3d', 'subnet-4e5f6a7b']
+        self.zfs_subnet_ids: list = None
+
+        # FSx for Lustre scratch tier, mounted on workers as /mnt/lustre
+        self.enable_fsx_lustre: bool = False
+        # SCRATCH_2, PERSISTENT_1 or PERSISTENT_2
+        self.lustre_deployment_type: str = 'SCRATCH_2'
+        # GiB, 1200, 2400 or a multiple of 2400
+        self.lustre_storage_capacity: int = 1200
+        # MB/s per TiB, required for persistent deployment types (PERSISTENT_2: 125, 250, 500 or 1000)
+        self.lustre_throughput_per_tib: int = None
+        # Optional S3 bucket linked to the Lustre file system
+        self.lustre_s3_bucket_name: str = None
+
+        # S3 bucket for the read-mostly asset library (HDRIs, texture packs, add-ons), mounted read-only
+        # at /mnt/assets on workers with Mountpoint for S3 and cached on their local storage.
+        # The bucket is retained when the stack is deleted.
+        self.enable_asset_bucket: bool = False
+        # Globally unique bucket name, a name is generated when None
+        self.asset_bucket_name: str = None
+
+        # Worker AMI settings
+        # When enabled, EC2 Image Builder bakes the Deadline client, storage tooling and each
+        # fleet's render_app into an Amazon Linux 2023 AMI that replaces the fleet's worker_image.
+        # Components and recipes are named after a digest of their contents, so changes, including
+        # deadline_version bumps, create new ones. worker_ami_version is their semantic version.
+        self.build_worker_ami: bool = False
+        self.worker_ami_version: str = '1.0.0'
+
+        # Monitoring settings
+        # CloudWatch dashboard and alarms for the Render Queue, database, storage and fleets
+        self.enable_monitoring: bool = True
+        # Optional email address subscribed to the alarm topic
+        self.alarm_email: str = None
+        # Time each worker boot phase (user data start, Deadline config, mounts, worker launch,
+        # registration and first task) and publish it as RenderFarm/WorkerBoot metrics per fleet and instance type
+        self.worker_boot_timing: bool = True
+        # Overrides for the default alarm thresholds: render_queue_response_time (seconds),
+        # render_queue_5xx (per 5 minutes), render_queue_cpu, database_cpu,
+        # efs_throughput_utilization and zfs_throughput_utilization (%)
+        self.alarm_thresholds: dict = {}
+
+        # Burst regions, each gets a worker VPC peered with the primary VPC. Fleets opt in with
+        # 'burst_regions'. 'mount_storage' mounts the primary shared storage over the peering
+        # connection, cached on local NVMe when worker_local_storage is enabled.
+        # e.g. {'us-west-2': {'vpc_cidr': '10.1.0.0/16', 'mount_storage': True}}
+        self.burst_regions: dict = {}
+
+        # Spot Event Plugin settings
+        # 'aggressive_burst' ramps up fastest, 'steady' matches the plugin defaults and
+        # 'cost_saver' ramps up slowly, shuts idle workers down quickly and enforces max_capacity
+        self.spot_plugin_preset: str = 'steady'
+        # Overrides applied on top of the preset: maximum_instances_started_per_cycle,
+        # idle_shutdown_minutes, pre_job_task_mode ('conservative', 'ignore' or 'normal'),
+        # strict_hard_cap, delete_sep_terminated_workers, delete_ec2_spot_interrupted_workers
+        # and logging_level ('standard', 'verbose', 'debug' or 'off')
+        self.spot_plugin_settings: dict = {}
 
         # Spot Fleet settings
         deadline_client_linux_ami: Mapping[str, str] = {self.aws_region: 'ami-05befe44e4981eab4'}
@@ -45,13 +166,96 @@ class AppConfig:
                 'deadline_groups': ['blender-cloud'],
                 'deadline_pools': ['blender'],
                 'instance_types': instance_types['medium'],
+                # Instead of instance_types, instance_requirements picks a ranked list of types across
+                # families from the bundled instance catalog (package/lib/instance_catalog.json) at synth
+                # time. Keys are min_vcpus, max_vcpus, memory_per_vcpu_gib, gpus, gpu_memory_gib (per GPU),
+                # local_nvme, network_gbps, families and max_types (default 10). max_capacity counts
+                # instances of any size, so keep min_vcpus and max_vcpus close together.
+                # 'instance_requirements': {'min_vcpus': 16, 'max_vcpus': 16, 'memory_per_vcpu_gib': 2, 'local_nvme': True},
+                # Optional AZs the fleet launches workers in, all AZs of the VPC by default. Pinning a fleet
+                # narrows its Spot pools but keeps its NFS traffic in-AZ with storage_placement 'fleet_az'.
+                # Burst region fleets ignore it.
+                # 'availability_zones': ['ap-southeast-2a'],
+                # One of 'capacity_optimized', 'lowest_price' or 'diversified'
+                'allocation_strategy': 'capacity_optimized',
                 'worker_image': deadline_client_linux_ami,
+                # Render application baked into the worker AMI when build_worker_ami is enabled
+                'render_app': {'name': 'blender', 'version': '4.2.3'},
+                # Number of Deadline workers started on each instance, sized at boot from its vCPUs and
+                # memory and capped at max_workers. 'workers' mode runs that many workers pinned to their
+                # own cores, 'tasks' mode runs one worker with that many concurrent tasks.
+                'worker_policy': {
+                    'mode': 'workers',
+                    'vcpus_per_worker': 16,
+                    'memory_per_worker_gib': 32,
+                    'max_workers': 4,
+                },
+                # Spot Auto Scaling groups in burst regions by region, e.g.
+                # {'us-west-2': {'max_capacity': 10, 'desired_capacity': 0}}. The Spot Event Plugin only
+                # starts fleets in the primary region and nothing scales burst fleets out, set the desired
+                # capacity to burst. They are scaled back to zero once every worker was idle for
+                # 'idle_shutdown_minutes' (a multiple of 5, default 30, 0 keeps them running until the
+                # desired capacity is changed by hand).
+                'burst_regions': {},
+                # 'render_queue' connects the workers through the Render Queue, 'direct' mounts the
+                # Repository file system and connects them straight to the database, keeping the RCS
+                # off the hot path of large fleets. Direct connections are only supported on Linux.
+                'repository_connection': 'render_queue',
                 'max_capacity': 5,
                 'tags': {
                     'Name': 'Blender-Deadline-Worker',
                     'fleet': 'blender',
                 }
-            }
+            },
+            # GPU fleets set gpu_workers, 'per_gpu' runs one worker per GPU pinned to it and 'shared'
+            # runs one worker using every GPU. They need the NVIDIA driver, which is baked in when
+            # build_worker_ami is enabled. Otherwise every worker compiles it at boot, which is slow,
+            # so give the fleet a worker_image with the driver installed. bootstrap_commands are
+            # optional commands run on each worker after the shared storage is mounted, e.g.
+            # 'gpu': {
+            #     'name': 'gpu',
+            #     'is_linux': True,
+            #     'deadline_groups': ['gpu-cloud'],
+            #     'deadline_pools': ['gpu'],
+            #     'instance_types': instance_types['gpu'],
+            #     'allocation_strategy': 'capacity_optimized',
+            #     'worker_image': deadline_client_linux_ami,
+            #     'render_app': {'name': 'blender', 'version': '4.2.3'},
+            #     'gpu_workers': 'per_gpu',
+            #     'bootstrap_commands': [],
+            #     'repository_connection': 'render_queue',
+            #     'max_capacity': 2,
+            #     'tags': {
+            #         'Name': 'GPU-Deadline-Worker',
+            #         'fleet': 'gpu',
+            #     }
+            # }
         }
 
+        # On-demand baseline fleets, RFDK WorkerInstanceFleet Auto Scaling groups with one instance
+        # type each. Fleet keys are as for the Spot fleets (deadline_groups, deadline_pools,
+        # worker_image, worker_policy, gpu_workers, bootstrap_commands, repository_connection, tags)
+        # plus min_capacity, desired_capacity, a warm pool of stopped pre-initialized instances that
+        # start in place of cold launches (Linux only, no instance store scratch) and scheduled
+        # capacity changes. Cron fields are minute, hour, day of month, month and day of week in
+        # time_zone, e.g.
+        # 'dailies': {
+        #     'name': 'dailies',
+        #     'is_linux': True,
+        #     'deadline_groups': ['blender-cloud'],
+        #     'deadline_pools': ['blender'],
+        #     'instance_type': 'c6i.4xlarge',
+        #     'worker_image': deadline_client_linux_ami,
+        #     'min_capacity': 0,
+        #     'max_capacity': 4,
+        #     'warm_pool': {'min_size': 4, 'max_prepared_capacity': 4, 'reuse_on_scale_in': True},
+        #     'time_zone': 'Australia/Sydney',
+        #     'schedules': [
+        #         {'name': 'DailiesStart', 'cron': '30 7 * * MON-FRI', 'min_capacity': 4},
+        #         {'name': 'DailiesEnd', 'cron': '0 20 * * MON-FRI', 'min_capacity': 0},
+        #     ],
+        #     'tags': {'Name': 'Dailies-Deadline-Worker'},
+        # }
+        self.baseline_fleet_configs: dict = {}
+
 config: AppConfig = AppConfig()
\ No newline at end of file
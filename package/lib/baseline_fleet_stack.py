@@ -0,0 +1,216 @@
+import aws_cdk as cdk
+from dataclasses import dataclass
+from aws_cdk import (
+    Stack,
+    CfnOutput,
+    aws_autoscaling as autoscaling,
+    aws_ec2 as ec2,
+    aws_iam as iam,
+    aws_logs as logs,
+)
+from constructs import Construct
+from aws_rfdk import deadline
+from aws_rfdk.deadline import RenderQueue, WorkerInstanceFleet
+from typing import List, Mapping, Optional
+from .spot_fleet_stack import is_direct_connection
+from .storage_stack import worker_mount_read_statements
+from .worker_user_data import (
+    WorkerUserDataProvider,
+    boot_timing_metrics_statement,
+    nvidia_driver_read_statement,
+    validate_worker_policy,
+    warm_pool_lifecycle_statements,
+)
+
+
+WARM_POOL_KEYS = ('min_size', 'max_prepared_capacity', 'reuse_on_scale_in')
+SCHEDULE_KEYS = ('name', 'cron', 'min_capacity', 'max_capacity', 'desired_capacity')
+
+# Completed by the workers once their user data has finished, see warm_pool_lifecycle_commands
+WARM_POOL_LIFECYCLE_HOOK = 'WorkerInitialized'
+WARM_POOL_LIFECYCLE_TIMEOUT = cdk.Duration.minutes(30)
+
+
+@dataclass
+class BaselineFleetStackProps(cdk.StackProps):
+    vpc: ec2.IVpc = None
+    baseline_fleet_configs: dict = None
+    render_queue: RenderQueue = None
+    repository: Optional[deadline.IRepository] = None
+    security_group_id: str = None
+    use_traffic_encryption: bool = True
+    worker_mounts: Optional[list] = None
+    worker_local_storage: bool = True
+    worker_boot_timing: bool = True
+
+
+class BaselineFleetStack(Stack):
+    """
+    On-demand Deadline worker fleets (RFDK WorkerInstanceFleet Auto Scaling groups) that hold
+    baseline capacity next to the Spot Event Plugin fleets.
+
+    A warm pool keeps stopped, already initialized instances that are started instead of
+    launching new ones, and scheduled actions raise the capacity ahead of predictable peaks.
+    """
+    def __init__(self, scope: Construct, construct_id: str, props: BaselineFleetStackProps, **kwargs) -> None:
+        super().__init__(scope, construct_id, **kwargs)
+
+        # RFDK creates the Auto Scaling groups without a launch template, have CDK generate one instead
+        # of a launch configuration, which new accounts can no longer create
+        self.node.set_context('@aws-cdk/aws-autoscaling:generateLaunchTemplateInsteadOfLaunchConfig', True)
+
+        worker_role = iam.Role(self, 'BaselineWorkerRole',
+            assumed_by=iam.ServicePrincipal('ec2.amazonaws.com'),
+            managed_policies=[
+                iam.ManagedPolicy.from_aws_managed_policy_name('AmazonSSMManagedInstanceCore')
+            ],
+        )
+        fleets = props.baseline_fleet_configs.values()
+        if any(fleet.get('gpu_workers') for fleet in fleets):
+            worker_role.add_to_policy(nvidia_driver_read_statement(self.partition))
+        for statement in worker_mount_read_statements(props.worker_mounts or []):
+            worker_role.add_to_policy(statement)
+        if any(fleet.get('warm_pool') for fleet in fleets):
+            # Auto Scaling group names generated by CloudFormation start with the stack name
+            for statement in warm_pool_lifecycle_statements(self.partition, self.region, self.account,
+                                                            f'{self.stack_name}-'):
+                worker_role.add_to_policy(statement)
+
+        boot_timing_log_group = None
+        if props.worker_boot_timing:
+            boot_timing_log_group = logs.LogGroup(self, 'WorkerBootTiming',
+                retention=logs.RetentionDays.ONE_MONTH,
+                removal_policy=cdk.RemovalPolicy.DESTROY
+            )
+            boot_timing_log_group.grant_write(worker_role)
+            worker_role.add_to_policy(boot_timing_metrics_statement())
+
+        security_group = ec2.SecurityGroup.from_security_group_id(
+            self, 'render_sg', security_group_id=props.security_group_id)
+
+        render_queue_address = (
+            f'{props.render_queue.endpoint.hostname}:{props.render_queue.endpoint.port_as_string()}')
+
+        self.fleets: List[WorkerInstanceFleet] = []
+        for fleet in fleets:
+            validate_baseline_fleet(fleet)
+            direct_connection = is_direct_connection(fleet)
+            if direct_connection and props.repository is None:
+                raise ValueError(f"Fleet '{fleet['name']}' connects directly to the Repository, which was not given")
+            warm_pool = fleet.get('warm_pool')
+
+            if fleet['is_linux']:
+                if fleet.get('worker_policy'):
+                    validate_worker_policy(fleet['name'], fleet['worker_policy'])
+                ami = ec2.MachineImage.generic_linux(fleet['worker_image'])
+                # Warm pool instances are stopped after they are initialized, which wipes the
+                # instance store and ends the boot timing script, so neither is used for them
+                user_data_provider = WorkerUserDataProvider(self, f'{fleet["name"]}UserDataProvider',
+                    render_queue_address=render_queue_address,
+                    use_traffic_encryption=props.use_traffic_encryption,
+                    mounts=props.worker_mounts,
+                    local_storage=props.worker_local_storage and not warm_pool,
+                    boot_timing_log_group=(
+                        boot_timing_log_group.log_group_name if boot_timing_log_group and not warm_pool else None),
+                    fleet_name=fleet['name'],
+                    bootstrap_commands=fleet.get('bootstrap_commands'),
+                    gpu_workers=fleet.get('gpu_workers'),
+                    worker_policy=fleet.get('worker_policy'),
+                    repository=props.repository if direct_connection else None,
+                    warm_pool_lifecycle_hook=WARM_POOL_LIFECYCLE_HOOK if warm_pool else None
+                )
+            else:
+                if (fleet.get('gpu_workers') or fleet.get('bootstrap_commands') or fleet.get('worker_policy')
+                        or direct_connection or warm_pool):
+                    raise ValueError(
+                        f"Fleet '{fleet['name']}' is a Windows fleet, gpu_workers, bootstrap_commands, "
+                        "worker_policy, direct repository connections and warm pools are only supported on Linux")
+                ami = ec2.MachineImage.generic_windows(fleet['worker_image'])
+                user_data_provider = None
+
+            worker_fleet = WorkerInstanceFleet(self, fleet['name'],
+                vpc=props.vpc,
+                vpc_subnets=ec2.SubnetSelection(subnet_type=ec2.SubnetType.PRIVATE_WITH_EGRESS),
+                render_queue=props.render_queue,
+                worker_machine_image=ami,
+                instance_type=ec2.InstanceType(fleet['instance_type']),
+                min_capacity=fleet.get('min_capacity', 0),
+                max_capacity=fleet['max_capacity'],
+                desired_capacity=fleet.get('desired_capacity'),
+                groups=fleet['deadline_groups'],
+                pools=fleet['deadline_pools'],
+                security_group=security_group,
+                role=worker_role,
+                user_data_provider=user_data_provider
+            )
+            asg = worker_fleet.fleet
+
+            if warm_pool:
+                asg.add_lifecycle_hook('WorkerInitialized',
+                    lifecycle_hook_name=WARM_POOL_LIFECYCLE_HOOK,
+                    lifecycle_transition=autoscaling.LifecycleTransition.INSTANCE_LAUNCHING,
+                    heartbeat_timeout=WARM_POOL_LIFECYCLE_TIMEOUT,
+                    default_result=autoscaling.DefaultResult.ABANDON
+                )
+                asg.add_warm_pool(
+                    min_size=warm_pool.get('min_size', 0),
+                    max_group_prepared_capacity=warm_pool.get('max_prepared_capacity'),
+                    pool_state=autoscaling.PoolState.STOPPED,
+                    reuse_on_scale_in=warm_pool.get('reuse_on_scale_in', True)
+                )
+
+            for schedule in fleet.get('schedules') or []:
+                asg.scale_on_schedule(schedule['name'],
+                    schedule=autoscaling.Schedule.expression(schedule['cron']),
+                    time_zone=fleet.get('time_zone'),
+                    min_capacity=schedule.get('min_capacity'),
+                    max_capacity=schedule.get('max_capacity'),
+                    desired_capacity=schedule.get('desired_capacity')
+                )
+
+            for key, value in (fleet.get('tags') or {}).items():
+                cdk.Tags.of(worker_fleet).add(key, value)
+            self.fleets.append(worker_fleet)
+
+            CfnOutput(
+                self,
+                f'{fleet["name"]}FleetName',
+                value=asg.auto_scaling_group_name,
+                description=f'Auto Scaling group of the {fleet["name"]} baseline fleet'
+            )
+
+
+def validate_baseline_fleet(fleet: Mapping[str, object]) -> None:
+    """
+    Checks the capacity, warm pool and schedules of a baseline fleet config
+    """
+    name = fleet['name']
+    min_capacity = fleet.get('min_capacity', 0)
+    if not 0 <= min_capacity <= fleet['max_capacity']:
+        raise ValueError(f"Fleet '{name}' min_capacity must be between 0 and max_capacity")
+
+    warm_pool = fleet.get('warm_pool') or {}
+    unknown_keys = [key for key in warm_pool if key not in WARM_POOL_KEYS]
+    if unknown_keys:
+        raise ValueError(
+            f"Fleet '{name}' warm_pool has unknown keys {', '.join(unknown_keys)}, "
+            f"expected any of {', '.join(WARM_POOL_KEYS)}")
+    max_prepared_capacity = warm_pool.get('max_prepared_capacity')
+    if max_prepared_capacity is not None and max_prepared_capacity < warm_pool.get('min_size', 0):
+        raise ValueError(f"Fleet '{name}' warm_pool max_prepared_capacity must be at least min_size")
+
+    for schedule in fleet.get('schedules') or []:
+        unknown_keys = [key for key in schedule if key not in SCHEDULE_KEYS]
+        if unknown_keys:
+            raise ValueError(
+                f"Fleet '{name}' schedule has unknown keys {', '.join(unknown_keys)}, "
+                f"expected any of {', '.join(SCHEDULE_KEYS)}")
+        if 'name' not in schedule or 'cron' not in schedule:
+            raise ValueError(f"Fleet '{name}' schedules need a name and a cron expression")
+        # Minute, hour, day of month, month and day of week, as Auto Scaling scheduled actions take them
+        if len(schedule['cron'].split()) != 5:
+            raise ValueError(
+                f"Fleet '{name}' schedule {schedule['name']} cron must have 5 fields, got '{schedule['cron']}'")
+        if all(schedule.get(key) is None for key in SCHEDULE_KEYS[2:]):
+            raise ValueError(
+                f"Fleet '{name}' schedule {schedule['name']} must set any of {', '.join(SCHEDULE_KEYS[2:])}")
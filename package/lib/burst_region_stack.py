@@ -0,0 +1,318 @@
+import ipaddress
+import aws_cdk as cdk
+from dataclasses import dataclass
+from aws_cdk import (
+    Stack,
+    CfnOutput,
+    aws_autoscaling as autoscaling,
+    aws_cloudwatch as cloudwatch,
+    aws_cloudwatch_actions as cloudwatch_actions,
+    aws_ec2 as ec2,
+    aws_iam as iam,
+    aws_logs as logs,
+    aws_route53 as route53,
+    custom_resources as cr,
+)
+from constructs import Construct
+from typing import List, Mapping, Optional
+from .storage_stack import worker_mount_read_statements
+from .vpc_stack import add_vpc_endpoints, get_nat_gateway_count
+from .worker_user_data import (
+    WorkerUserDataProvider,
+    boot_timing_metrics_statement,
+    configure_worker_commands,
+    nvidia_driver_read_statement,
+    render_queue_ca_commands,
+    validate_worker_policy,
+)
+
+
+RENDER_QUEUE_CA_PATH = '/var/lib/Thinkbox/Deadline10/certs/render-queue-ca.crt'
+
+# Burst fleets are scaled to zero once the CPU of every worker stayed below IDLE_CPU_PERCENT for
+# a fleet's idle_shutdown_minutes, a multiple of IDLE_PERIOD. Nothing else scales them in.
+DEFAULT_IDLE_SHUTDOWN_MINUTES = 30
+IDLE_CPU_PERCENT = 5
+IDLE_PERIOD = cdk.Duration.minutes(5)
+
+
+@dataclass
+class BurstRegionStackProps(cdk.StackProps):
+    primary_region: str = None
+    primary_vpc: ec2.IVpc = None
+    vpc_cidr: str = None
+    spot_fleet_configs: dict = None
+    render_queue_address: str = None
+    render_queue_ca_secret_arn: Optional[str] = None
+    use_traffic_encryption: bool = True
+    worker_mounts: Optional[list] = None
+    worker_local_storage: bool = True
+    worker_boot_timing: bool = True
+    nat_gateway_mode: str = 'single'
+    vpc_endpoints: Optional[List[str]] = None
+
+
+class BurstRegionStack(Stack):
+    """
+    Worker VPC and Spot worker fleets in a burst region, peered with the primary VPC.
+
+    The Spot Event Plugin only starts fleets in the Repository's region, so burst fleets are
+    Spot Auto Scaling groups whose workers connect to the primary Render Queue over the
+    peering connection and resolve it through the primary private hosted zone.
+    """
+    def __init__(self, scope: Construct, construct_id: str, props: BurstRegionStackProps, **kwargs) -> None:
+        super().__init__(scope, construct_id, cross_region_references=True, **kwargs)
+
+        self.vpc = ec2.Vpc(
+            self,
+            "Burst-VPC",
+            ip_addresses=ec2.IpAddresses.cidr(props.vpc_cidr),
+            max_azs=99,
+            nat_gateways=get_nat_gateway_count(props.nat_gateway_mode),
+            subnet_configuration=[
+                ec2.SubnetConfiguration(
+                    name="Private",
+                    subnet_type=ec2.SubnetType.PRIVATE_WITH_EGRESS,
+                    cidr_mask=20,
+                ),
+                ec2.SubnetConfiguration(
+                    name="Public",
+                    subnet_type=ec2.SubnetType.PUBLIC,
+                    cidr_mask=24,
+                ),
+            ],
+        )
+
+        add_vpc_endpoints(self.vpc, props.vpc_endpoints or [])
+
+        # Peering within an account is accepted by CloudFormation
+        peering = ec2.CfnVPCPeeringConnection(self, 'PrimaryPeering',
+            vpc_id=self.vpc.vpc_id,
+            peer_vpc_id=props.primary_vpc.vpc_id,
+            peer_region=props.primary_region
+        )
+        self.peering_connection_id = peering.ref
+        for i, subnet in enumerate(self.vpc.private_subnets):
+            ec2.CfnRoute(self, f'PrimaryRoute{i}',
+                route_table_id=subnet.route_table.route_table_id,
+                destination_cidr_block=props.primary_vpc.vpc_cidr_block,
+                vpc_peering_connection_id=peering.ref
+            )
+
+        worker_role = iam.Role(self, 'BurstWorkerRole',
+            assumed_by=iam.ServicePrincipal('ec2.amazonaws.com'),
+            managed_policies=[
+                iam.ManagedPolicy.from_aws_managed_policy_name('AmazonSSMManagedInstanceCore')
+            ],
+        )
+        if props.render_queue_ca_secret_arn:
+            worker_role.add_to_policy(iam.PolicyStatement(
+                actions=['secretsmanager:GetSecretValue'],
+                resources=[props.render_queue_ca_secret_arn]
+            ))
+        if any(mount.efs_file_system_id for mount in props.worker_mounts or []):
+            worker_role.add_to_policy(iam.PolicyStatement(
+                actions=['elasticfilesystem:DescribeMountTargets'],
+                resources=['*']
+            ))
+        for statement in worker_mount_read_statements(props.worker_mounts or []):
+            worker_role.add_to_policy(statement)
+        if any(fleet.get('gpu_workers') for fleet in props.spot_fleet_configs.values()):
+            worker_role.add_to_policy(nvidia_driver_read_statement(self.partition))
+
+        boot_timing_log_group = None
+        if props.worker_boot_timing:
+            boot_timing_log_group = logs.LogGroup(self, 'WorkerBootTiming',
+                retention=logs.RetentionDays.ONE_MONTH,
+                removal_policy=cdk.RemovalPolicy.DESTROY
+            )
+            boot_timing_log_group.grant_write(worker_role)
+            worker_role.add_to_policy(boot_timing_metrics_statement())
+
+        worker_sg = ec2.SecurityGroup(self, 'BurstWorkerSG',
+            vpc=self.vpc,
+            description='Burst region render workers',
+            allow_all_outbound=True
+        )
+
+        self.fleets: List[autoscaling.AutoScalingGroup] = []
+        for fleet in props.spot_fleet_configs.values():
+            capacity = fleet['burst_regions'][self.region]
+            if self.region not in fleet['worker_image']:
+                raise ValueError(f"Fleet '{fleet['name']}' has no worker_image for burst region {self.region}")
+            if fleet.get('worker_policy'):
+                validate_worker_policy(fleet['name'], fleet['worker_policy'])
+
+            user_data_provider = WorkerUserDataProvider(self, f'{fleet["name"]}UserDataProvider',
+                render_queue_address=props.render_queue_address,
+                use_traffic_encryption=props.use_traffic_encryption,
+                mounts=props.worker_mounts,
+                local_storage=props.worker_local_storage,
+                boot_timing_log_group=boot_timing_log_group.log_group_name if boot_timing_log_group else None,
+                fleet_name=fleet['name'],
+                bootstrap_commands=fleet.get('bootstrap_commands'),
+                gpu_workers=fleet.get('gpu_workers'),
+                worker_policy=fleet.get('worker_policy'),
+                render_queue_ca_path=RENDER_QUEUE_CA_PATH if props.render_queue_ca_secret_arn else None,
+                efs_region=props.primary_region
+            )
+            user_data = ec2.UserData.for_linux()
+            user_data.add_commands(*user_data_provider.pre_cloud_watch_agent_commands())
+            if props.render_queue_ca_secret_arn:
+                user_data.add_commands(*render_queue_ca_commands(
+                    props.render_queue_ca_secret_arn, props.primary_region, RENDER_QUEUE_CA_PATH))
+            user_data.add_commands(*user_data_provider.pre_worker_configuration_commands())
+            user_data.add_commands(*configure_worker_commands(fleet['deadline_groups'], fleet['deadline_pools']))
+            user_data.add_commands(*user_data_provider.post_worker_launch_commands())
+
+            launch_template = ec2.LaunchTemplate(self, f'{fleet["name"]}LaunchTemplate',
+                machine_image=ec2.MachineImage.generic_linux(fleet['worker_image']),
+                role=worker_role,
+                security_group=worker_sg,
+                user_data=user_data,
+                require_imdsv2=True
+            )
+            asg = autoscaling.AutoScalingGroup(self, f'{fleet["name"]}Fleet',
+                vpc=self.vpc,
+                vpc_subnets=ec2.SubnetSelection(subnet_type=ec2.SubnetType.PRIVATE_WITH_EGRESS),
+                mixed_instances_policy=autoscaling.MixedInstancesPolicy(
+                    launch_template=launch_template,
+                    instances_distribution=autoscaling.InstancesDistribution(
+                        on_demand_base_capacity=0,
+                        on_demand_percentage_above_base_capacity=0,
+                        spot_allocation_strategy=autoscaling.SpotAllocationStrategy.PRICE_CAPACITY_OPTIMIZED
+                    ),
+                    launch_template_overrides=[
+                        autoscaling.LaunchTemplateOverrides(instance_type=ec2.InstanceType(name))
+                        for name in fleet['instance_types']
+                    ]
+                ),
+                min_capacity=capacity.get('min_capacity', 0),
+                max_capacity=capacity['max_capacity'],
+                desired_capacity=capacity.get('desired_capacity')
+            )
+            for key, value in (fleet.get('tags') or {}).items():
+                cdk.Tags.of(asg).add(key, value)
+            idle_shutdown_minutes = capacity.get('idle_shutdown_minutes', DEFAULT_IDLE_SHUTDOWN_MINUTES)
+            if idle_shutdown_minutes:
+                self.add_idle_scale_in(asg, fleet['name'], idle_shutdown_minutes)
+            self.fleets.append(asg)
+
+            CfnOutput(
+                self,
+                f'{fleet["name"]}FleetName',
+                value=asg.auto_scaling_group_name,
+                description=f'Auto Scaling group of the {fleet["name"]} fleet in {self.region}, '
+                            'set its desired capacity to burst'
+            )
+
+    def add_idle_scale_in(self, asg: autoscaling.AutoScalingGroup, fleet_name: str,
+                          idle_shutdown_minutes: int) -> cloudwatch.Alarm:
+        """
+        Scales a fleet to zero once all of its workers were idle for idle_shutdown_minutes
+        """
+        if idle_shutdown_minutes < 0 or idle_shutdown_minutes % IDLE_PERIOD.to_minutes():
+            raise ValueError(
+                f"Fleet '{fleet_name}' idle_shutdown_minutes in {self.region} must be a multiple of "
+                f"{IDLE_PERIOD.to_minutes()}")
+        scale_in = autoscaling.StepScalingAction(self, f'{fleet_name}IdleScaleIn',
+            auto_scaling_group=asg,
+            adjustment_type=autoscaling.AdjustmentType.EXACT_CAPACITY
+        )
+        scale_in.add_adjustment(adjustment=0, upper_bound=0)
+        # The busiest worker of the fleet, so that no rendering worker is terminated
+        busiest_worker_cpu = cloudwatch.Metric(
+            namespace='AWS/EC2',
+            metric_name='CPUUtilization',
+            dimensions_map={'AutoScalingGroupName': asg.auto_scaling_group_name},
+            statistic='Maximum',
+            period=IDLE_PERIOD
+        )
+        alarm = busiest_worker_cpu.create_alarm(self, f'{fleet_name}IdleAlarm',
+            threshold=IDLE_CPU_PERCENT,
+            evaluation_periods=idle_shutdown_minutes // IDLE_PERIOD.to_minutes(),
+            comparison_operator=cloudwatch.ComparisonOperator.LESS_THAN_THRESHOLD,
+            # A fleet without instances reports no data
+            treat_missing_data=cloudwatch.TreatMissingData.NOT_BREACHING,
+            alarm_description=f'All {fleet_name} workers in {self.region} are idle'
+        )
+        alarm.add_alarm_action(cloudwatch_actions.AutoScalingAction(scale_in))
+        return alarm
+
+
+@dataclass
+class BurstPeeringStackProps(cdk.StackProps):
+    burst_region: str = None
+    burst_vpc: ec2.IVpc = None
+    vpc_cidr: str = None
+    peering_connection_id: str = None
+    primary_vpc: ec2.IVpc = None
+    dns_zone: route53.IHostedZone = None
+
+
+class BurstPeeringStack(Stack):
+    """
+    The primary region side of a burst region: routes to the burst VPC over the peering
+    connection and the burst VPC's association with the Render Queue's private hosted zone.
+    """
+    def __init__(self, scope: Construct, construct_id: str, props: BurstPeeringStackProps, **kwargs) -> None:
+        super().__init__(scope, construct_id, cross_region_references=True, **kwargs)
+
+        for i, subnet in enumerate(props.primary_vpc.private_subnets):
+            ec2.CfnRoute(self, f'BurstRoute{i}',
+                route_table_id=subnet.route_table.route_table_id,
+                destination_cidr_block=props.vpc_cidr,
+                vpc_peering_connection_id=props.peering_connection_id
+            )
+
+        # Private hosted zones can be associated with VPCs in other regions through the API only
+        vpc_parameters = {
+            'HostedZoneId': props.dns_zone.hosted_zone_id,
+            'VPC': {'VPCId': props.burst_vpc.vpc_id, 'VPCRegion': props.burst_region},
+        }
+        cr.AwsCustomResource(self, 'BurstZoneAssociation',
+            on_create=cr.AwsSdkCall(
+                service='Route53',
+                action='associateVPCWithHostedZone',
+                parameters=vpc_parameters,
+                physical_resource_id=cr.PhysicalResourceId.of(f'{props.burst_region}-zone-association')
+            ),
+            on_delete=cr.AwsSdkCall(
+                service='Route53',
+                action='disassociateVPCFromHostedZone',
+                parameters=vpc_parameters
+            ),
+            policy=cr.AwsCustomResourcePolicy.from_statements([
+                iam.PolicyStatement(
+                    actions=['route53:AssociateVPCWithHostedZone', 'route53:DisassociateVPCFromHostedZone',
+                             'ec2:DescribeVpcs'],
+                    resources=['*']
+                )
+            ]),
+            install_latest_aws_sdk=False
+        )
+
+
+def validate_burst_regions(primary_region: str, primary_cidr: Optional[str],
+                           burst_regions: Mapping[str, Mapping[str, object]], spot_fleet_configs: dict) -> None:
+    """
+    Checks that burst regions differ from the primary region, that their VPC CIDRs do not overlap
+    and that every region named by a fleet is configured
+    """
+    networks = {}
+    if primary_cidr and not cdk.Token.is_unresolved(primary_cidr):
+        networks[primary_region] = ipaddress.ip_network(primary_cidr)
+    for region, settings in burst_regions.items():
+        if region == primary_region:
+            raise ValueError(f"Burst region {region} is the primary region")
+        network = ipaddress.ip_network(settings['vpc_cidr'])
+        for other_region, other_network in networks.items():
+            if network.overlaps(other_network):
+                raise ValueError(f"VPC CIDR of burst region {region} overlaps the VPC of {other_region}")
+        networks[region] = network
+    for fleet in spot_fleet_configs.values():
+        for region in fleet.get('burst_regions') or {}:
+            if region not in burst_regions:
+                raise ValueError(f"Fleet '{fleet['name']}' bursts to {region}, which is not in burst_regions")
+            if not fleet['is_linux']:
+                raise ValueError(f"Fleet '{fleet['name']}' is a Windows fleet, burst regions are only supported on Linux")
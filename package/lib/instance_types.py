@@ -0,0 +1,188 @@
+import argparse
+import functools
+import json
+import os
+import re
+import subprocess
+from dataclasses import asdict, dataclass
+from typing import List, Mapping, Optional
+
+
+# EC2 instance specs bundled with the app so that fleets can be sized offline at synth time.
+# Refresh with `python -m package.lib.instance_types --region us-east-1`, which needs the AWS CLI.
+CATALOG_PATH = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'instance_catalog.json')
+
+# Keys of a fleet's instance_requirements
+REQUIREMENT_KEYS = (
+    'min_vcpus', 'max_vcpus', 'memory_per_vcpu_gib', 'gpus', 'gpu_memory_gib', 'local_nvme', 'network_gbps',
+    'families', 'max_types',
+)
+# Each type becomes one Spot pool per subnet, more types add little once several families are covered
+DEFAULT_MAX_TYPES = 10
+
+
+@dataclass(frozen=True)
+class InstanceSpec:
+    """
+    Specs of an EC2 instance type. GPU memory is the total across its GPUs, local storage is
+    instance store NVMe and network bandwidth is the advertised peak.
+    """
+    vcpus: int
+    memory_gib: float
+    gpus: int = 0
+    gpu_memory_gib: float = 0
+    local_storage_gb: int = 0
+    network_gbps: float = 0
+
+
+@functools.lru_cache(maxsize=None)
+def load_catalog(path: str = CATALOG_PATH) -> Mapping[str, InstanceSpec]:
+    """
+    Returns the instance catalog by instance type name
+    """
+    with open(path) as catalog_file:
+        return {name: InstanceSpec(**spec) for name, spec in json.load(catalog_file).items()}
+
+
+def save_catalog(catalog: Mapping[str, InstanceSpec], path: str = CATALOG_PATH) -> None:
+    """
+    Writes the catalog with one instance type per line, ordered by family and size, to keep refreshes reviewable
+    """
+    names = sorted(catalog, key=lambda name: (name.split('.')[0], catalog[name].vcpus, name))
+    lines = [f' {json.dumps(name)}: {json.dumps(asdict(catalog[name]))}' for name in names]
+    with open(path, 'w') as catalog_file:
+        catalog_file.write('{\n' + ',\n'.join(lines) + '\n}\n')
+
+
+def get_fleet_max_instances(fleet: dict) -> int:
+    """
+    Returns the largest number of instances a fleet config can launch
+    """
+    return fleet['max_capacity']
+
+
+def get_family_generation(family: str) -> int:
+    """
+    Returns the generation of an instance family, e.g. c6i -> 6
+    """
+    match = re.search(r'[0-9]+', family)
+    return int(match.group()) if match else 0
+
+
+def meets_requirements(spec: InstanceSpec, requirements: Mapping[str, object]) -> bool:
+    if spec.vcpus < requirements.get('min_vcpus', 1) or spec.vcpus > requirements.get('max_vcpus', spec.vcpus):
+        return False
+    if spec.memory_gib < spec.vcpus * requirements.get('memory_per_vcpu_gib', 0):
+        return False
+    gpus = requirements.get('gpus') or 0
+    # GPU instances are only used by fleets that ask for GPUs
+    if (spec.gpus == 0) != (gpus == 0) or spec.gpus < gpus:
+        return False
+    if gpus and spec.gpu_memory_gib / spec.gpus < requirements.get('gpu_memory_gib', 0):
+        return False
+    if requirements.get('local_nvme') and not spec.local_storage_gb:
+        return False
+    return spec.network_gbps >= requirements.get('network_gbps', 0)
+
+
+def select_instance_types(requirements: Mapping[str, object],
+                          catalog: Optional[Mapping[str, InstanceSpec]] = None) -> List[str]:
+    """
+    Returns the catalog instance types that meet the requirements, ranked for Spot diversity.
+    Families are taken in turn, leanest memory per vCPU and newest generation first, and each
+    contributes its smallest remaining type, so the first types span as many families,
+    and Spot pools, as possible.
+    """
+    unknown_keys = [key for key in requirements if key not in REQUIREMENT_KEYS]
+    if unknown_keys:
+        raise ValueError(
+            f"Unknown instance requirements {', '.join(unknown_keys)}, expected any of {', '.join(REQUIREMENT_KEYS)}")
+    catalog = catalog if catalog is not None else load_catalog()
+
+    families = {}
+    for name, spec in catalog.items():
+        family = name.split('.')[0]
+        if requirements.get('families') and family not in requirements['families']:
+            continue
+        if meets_requirements(spec, requirements):
+            families.setdefault(family, []).append(name)
+    if not families:
+        raise ValueError(f"No instance type in the catalog meets the instance requirements {dict(requirements)}")
+
+    for names in families.values():
+        names.sort(key=lambda name: (catalog[name].vcpus, name))
+    # Families with the least memory per vCPU beyond the requirement are usually the cheapest
+    family_order = sorted(families, key=lambda family: (
+        catalog[families[family][0]].memory_gib / catalog[families[family][0]].vcpus,
+        -get_family_generation(family),
+        family
+    ))
+
+    ranked = []
+    for size_index in range(max(len(names) for names in families.values())):
+        ranked += [families[family][size_index] for family in family_order if size_index < len(families[family])]
+    return ranked[:requirements.get('max_types', DEFAULT_MAX_TYPES)]
+
+
+def resolve_instance_requirements(spot_fleet_configs: Mapping[str, dict]) -> dict:
+    """
+    Returns the fleet configs with the instance_types of fleets that state instance_requirements
+    filled in from the catalog
+    """
+    resolved = {}
+    for key, fleet in spot_fleet_configs.items():
+        if fleet.get('instance_requirements') is not None:
+            if fleet.get('instance_types'):
+                raise ValueError(f"Fleet '{fleet['name']}' sets both instance_types and instance_requirements")
+            fleet = {**fleet, 'instance_types': select_instance_types(fleet['instance_requirements'])}
+        resolved[key] = fleet
+    return resolved
+
+
+def parse_network_gbps(network_performance: str) -> float:
+    """
+    Returns the bandwidth of an EC2 network performance description, e.g. 'Up to 12.5 Gigabit' -> 12.5
+    """
+    match = re.search(r'([0-9.]+) Gigabit', network_performance)
+    return float(match.group(1)) if match else 0
+
+
+def describe_instance_types(region: str) -> Mapping[str, InstanceSpec]:
+    """
+    Returns the current generation x86_64 virtualized instance types offered in region, using the AWS CLI.
+    Burstable types and types with accelerators the workers cannot use (non NVIDIA GPUs,
+    FPGAs, Inferentia and Trainium) are left out.
+    """
+    output = subprocess.run([
+        'aws', 'ec2', 'describe-instance-types', '--region', region, '--output', 'json',
+        '--filters', 'Name=current-generation,Values=true', 'Name=bare-metal,Values=false',
+        'Name=burstable-performance-supported,Values=false',
+        'Name=processor-info.supported-architecture,Values=x86_64',
+    ], check=True, capture_output=True, text=True).stdout
+
+    catalog = {}
+    for instance_type in json.loads(output)['InstanceTypes']:
+        gpu_info = instance_type.get('GpuInfo') or {}
+        if any(gpu['Manufacturer'] != 'NVIDIA' for gpu in gpu_info.get('Gpus', [])) or any(
+                instance_type.get(info) for info in ('FpgaInfo', 'InferenceAcceleratorInfo', 'NeuronInfo')):
+            continue
+        storage_info = instance_type.get('InstanceStorageInfo') or {}
+        has_nvme = storage_info.get('NvmeSupport', 'unsupported') != 'unsupported'
+        memory_gib = instance_type['MemoryInfo']['SizeInMiB'] / 1024
+        network_gbps = parse_network_gbps(instance_type['NetworkInfo']['NetworkPerformance'])
+        catalog[instance_type['InstanceType']] = InstanceSpec(
+            vcpus=instance_type['VCpuInfo']['DefaultVCpus'],
+            memory_gib=int(memory_gib) if memory_gib.is_integer() else memory_gib,
+            gpus=sum(gpu['Count'] for gpu in gpu_info.get('Gpus', [])),
+            gpu_memory_gib=gpu_info.get('TotalGpuMemoryInMiB', 0) // 1024,
+            local_storage_gb=storage_info.get('TotalSizeInGB', 0) if has_nvme else 0,
+            network_gbps=int(network_gbps) if network_gbps.is_integer() else network_gbps
+        )
+    return catalog
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Refresh the bundled EC2 instance catalog')
+    parser.add_argument('--region', required=True, help='region whose instance types are listed')
+    args = parser.parse_args()
+    save_catalog(describe_instance_types(args.region))
@@ -0,0 +1,307 @@
+import json
+import os
+
+import aws_cdk as cdk
+from dataclasses import dataclass
+from aws_cdk import (
+    Stack,
+    CfnOutput,
+    aws_cloudwatch as cloudwatch,
+    aws_cloudwatch_actions as cloudwatch_actions,
+    aws_docdb as docdb,
+    aws_ecs as ecs,
+    aws_elasticloadbalancingv2 as elb2,
+    aws_events as events,
+    aws_events_targets as targets,
+    aws_iam as iam,
+    aws_lambda as lambda_,
+    aws_logs as logs,
+    aws_sns as sns,
+    aws_sns_subscriptions as subscriptions,
+)
+from constructs import Construct
+from aws_rfdk.deadline import RenderQueue
+from typing import List, Mapping, Optional
+
+
+# Alarm thresholds, the alarm_thresholds in the config are applied on top
+DEFAULT_ALARM_THRESHOLDS: Mapping[str, float] = {
+    # p95 ALB target response time of the RCS in seconds
+    'render_queue_response_time': 1,
+    # ALB and RCS 5xx responses per 5 minutes
+    'render_queue_5xx': 10,
+    # Average RCS service CPU %
+    'render_queue_cpu': 85,
+    # Average DocumentDB CPU %
+    'database_cpu': 80,
+    # EFS throughput used as a % of the permitted throughput
+    'efs_throughput_utilization': 80,
+    # FSx OpenZFS network throughput utilization %
+    'zfs_throughput_utilization': 80,
+}
+
+PERIOD = cdk.Duration.minutes(5)
+
+# CloudWatch namespace of the Spot fleet capacity metrics, published by the script below
+SPOT_FLEET_NAMESPACE = 'RenderFarm/SpotFleet'
+SPOT_FLEET_METRICS_SCRIPT = os.path.join(
+    os.path.dirname(os.path.realpath(__file__)), 'scripts', 'spot_fleet_metrics.py')
+
+
+@dataclass
+class MonitoringStackProps(cdk.StackProps):
+    render_queue: RenderQueue = None
+    render_queue_service: ecs.BaseService = None
+    database: docdb.DatabaseCluster = None
+    efs_file_system_id: Optional[str] = None
+    zfs_file_system_id: Optional[str] = None
+    lustre_file_system_id: Optional[str] = None
+    spot_fleet_configs: dict = None
+    alarm_thresholds: Optional[dict] = None
+    alarm_email: Optional[str] = None
+    worker_boot_timing: bool = True
+
+
+class MonitoringStack(Stack):
+    """
+    CloudWatch dashboard and alarms covering the Render Queue, the Repository
+    database, shared storage and the Spot fleets.
+    """
+    def __init__(self, scope: Construct, construct_id: str, props: MonitoringStackProps, **kwargs) -> None:
+        super().__init__(scope, construct_id, **kwargs)
+
+        thresholds = get_alarm_thresholds(props.alarm_thresholds)
+
+        alarm_topic = sns.Topic(self, 'RenderFarmAlarms', display_name='Render farm alarms')
+        if props.alarm_email:
+            alarm_topic.add_subscription(subscriptions.EmailSubscription(props.alarm_email))
+        self.alarms: List[cloudwatch.Alarm] = []
+
+        dashboard = cloudwatch.Dashboard(self, 'RenderFarmDashboard',
+            dashboard_name=f'{construct_id}-RenderFarm',
+            default_interval=cdk.Duration.hours(3)
+        )
+
+        #
+        # Render Queue
+        #
+        load_balancer: elb2.ApplicationLoadBalancer = props.render_queue.load_balancer
+        response_time = load_balancer.metrics.target_response_time(statistic='p95', period=PERIOD)
+        elb_5xx = load_balancer.metrics.http_code_elb(elb2.HttpCodeElb.ELB_5XX_COUNT, period=PERIOD)
+        target_5xx = load_balancer.metrics.http_code_target(elb2.HttpCodeTarget.TARGET_5XX_COUNT, period=PERIOD)
+        total_5xx = cloudwatch.MathExpression(
+            expression='FILL(elb, 0) + FILL(target, 0)',
+            using_metrics={'elb': elb_5xx, 'target': target_5xx},
+            label='5xx responses',
+            period=PERIOD
+        )
+        requests = load_balancer.metrics.request_count(period=PERIOD)
+        service_cpu = props.render_queue_service.metric_cpu_utilization(period=PERIOD)
+        service_memory = props.render_queue_service.metric_memory_utilization(period=PERIOD)
+
+        self.add_alarm('RenderQueueResponseTime', response_time, thresholds['render_queue_response_time'],
+            'Render Queue p95 response time is high', alarm_topic)
+        self.add_alarm('RenderQueue5xx', total_5xx, thresholds['render_queue_5xx'],
+            'Render Queue is returning 5xx responses', alarm_topic)
+        self.add_alarm('RenderQueueCpu', service_cpu, thresholds['render_queue_cpu'],
+            'Render Queue RCS CPU is high', alarm_topic)
+
+        dashboard.add_widgets(
+            cloudwatch.GraphWidget(title='Render Queue response time (p95)', left=[response_time], width=8,
+                left_annotations=[cloudwatch.HorizontalAnnotation(value=thresholds['render_queue_response_time'])]),
+            cloudwatch.GraphWidget(title='Render Queue requests and 5xx', left=[requests], right=[elb_5xx, target_5xx],
+                width=8),
+            cloudwatch.GraphWidget(title='RCS service utilization', left=[service_cpu, service_memory], width=8,
+                left_y_axis=cloudwatch.YAxisProps(min=0, max=100)),
+        )
+
+        #
+        # Repository database
+        #
+        database_cpu = self.database_metric(props.database, 'CPUUtilization', 'Average')
+        database_connections = self.database_metric(props.database, 'DatabaseConnections', 'Sum')
+        read_latency = self.database_metric(props.database, 'ReadLatency', 'Average')
+        write_latency = self.database_metric(props.database, 'WriteLatency', 'Average')
+
+        self.add_alarm('DatabaseCpu', database_cpu, thresholds['database_cpu'],
+            'DocumentDB CPU is high', alarm_topic)
+
+        dashboard.add_widgets(
+            cloudwatch.GraphWidget(title='DocumentDB CPU', left=[database_cpu], right=[database_connections], width=8,
+                left_annotations=[cloudwatch.HorizontalAnnotation(value=thresholds['database_cpu'])]),
+            cloudwatch.GraphWidget(title='DocumentDB latency', left=[read_latency, write_latency], width=8),
+        )
+
+        #
+        # Storage
+        #
+        storage_widgets = []
+        if props.efs_file_system_id:
+            efs_io = self.storage_metric('AWS/EFS', props.efs_file_system_id, 'MeteredIOBytes', 'Sum')
+            efs_permitted = self.storage_metric('AWS/EFS', props.efs_file_system_id, 'PermittedThroughput', 'Average')
+            efs_utilization = cloudwatch.MathExpression(
+                expression='100 * (io / PERIOD(io)) / permitted',
+                using_metrics={'io': efs_io, 'permitted': efs_permitted},
+                label='EFS throughput utilization %',
+                period=PERIOD
+            )
+            self.add_alarm('EfsThroughputUtilization', efs_utilization, thresholds['efs_throughput_utilization'],
+                'EFS is close to its permitted throughput', alarm_topic)
+            storage_widgets.append(cloudwatch.GraphWidget(title='EFS throughput utilization %',
+                left=[efs_utilization], width=8, left_y_axis=cloudwatch.YAxisProps(min=0, max=100)))
+
+        if props.zfs_file_system_id:
+            zfs_utilization = self.storage_metric(
+                'AWS/FSx', props.zfs_file_system_id, 'NetworkThroughputUtilization', 'Average')
+            zfs_read = self.storage_metric('AWS/FSx', props.zfs_file_system_id, 'DataReadBytes', 'Sum')
+            zfs_write = self.storage_metric('AWS/FSx', props.zfs_file_system_id, 'DataWriteBytes', 'Sum')
+            self.add_alarm('ZfsThroughputUtilization', zfs_utilization, thresholds['zfs_throughput_utilization'],
+                'FSx for OpenZFS is close to its throughput capacity', alarm_topic)
+            storage_widgets.append(cloudwatch.GraphWidget(title='FSx OpenZFS throughput',
+                left=[zfs_utilization], right=[zfs_read, zfs_write], width=8))
+
+        if props.lustre_file_system_id:
+            lustre_read = self.storage_metric('AWS/FSx', props.lustre_file_system_id, 'DataReadBytes', 'Sum')
+            lustre_write = self.storage_metric('AWS/FSx', props.lustre_file_system_id, 'DataWriteBytes', 'Sum')
+            storage_widgets.append(cloudwatch.GraphWidget(title='FSx Lustre throughput',
+                left=[lustre_read, lustre_write], width=8))
+
+        if storage_widgets:
+            dashboard.add_widgets(*storage_widgets)
+
+        #
+        # Spot fleets
+        #
+        # The Spot Event Plugin creates the Spot Fleet requests at run time, so a scheduled function
+        # publishes the capacity of the requests tagged with this farm's fleet names
+        fleet_names = [fleet['name'] for fleet in (props.spot_fleet_configs or {}).values()]
+        if fleet_names:
+            self.create_spot_fleet_metrics_function(fleet_names)
+        max_capacity = sum(fleet['max_capacity'] for fleet in (props.spot_fleet_configs or {}).values())
+        dashboard.add_widgets(
+            cloudwatch.GraphWidget(title='Spot fleet fulfilled vs target capacity', width=24,
+                left=[
+                    cloudwatch.MathExpression(
+                        expression=f"SEARCH('{{{SPOT_FLEET_NAMESPACE},Fleet}} MetricName=\"{metric_name}\"', "
+                                   f"'Maximum', {PERIOD.to_seconds()})",
+                        label=metric_name,
+                        period=PERIOD
+                    )
+                    for metric_name in ('FulfilledCapacity', 'TargetCapacity')
+                ],
+                left_annotations=[cloudwatch.HorizontalAnnotation(value=max_capacity, label='max_capacity')]
+            ),
+        )
+
+        # Published by the workers' boot timing script, see worker_user_data.py
+        if props.worker_boot_timing:
+            dashboard.add_widgets(
+                cloudwatch.GraphWidget(title='Worker boot phases (seconds since boot)', width=24,
+                    left=[
+                        cloudwatch.MathExpression(
+                            expression=f"SEARCH('{{RenderFarm/WorkerBoot,Fleet}} MetricName=\"{metric_name}\"', "
+                                       f"'Average', {PERIOD.to_seconds()})",
+                            label=metric_name,
+                            period=PERIOD
+                        )
+                        for metric_name in ('MountsReady', 'WorkerLaunched', 'WorkerRegistered', 'FirstTask')
+                    ]
+                ),
+            )
+
+        CfnOutput(
+            self,
+            "DashboardName",
+            value=dashboard.dashboard_name,
+            description="CloudWatch dashboard for the render farm"
+        )
+
+        CfnOutput(
+            self,
+            "AlarmTopicArn",
+            value=alarm_topic.topic_arn,
+            description="SNS topic the render farm alarms notify"
+        )
+
+    def create_spot_fleet_metrics_function(self, fleet_names: List[str]) -> lambda_.Function:
+        """
+        Creates the function that publishes the capacity of the fleets' Spot Fleet requests every period
+        """
+        with open(SPOT_FLEET_METRICS_SCRIPT) as f:
+            script = f.read()
+        function = lambda_.Function(self, 'SpotFleetMetrics',
+            runtime=lambda_.Runtime.PYTHON_3_12,
+            handler='index.handler',
+            code=lambda_.Code.from_inline(script),
+            timeout=cdk.Duration.minutes(1),
+            environment={'FLEETS': json.dumps(fleet_names)},
+            log_group=logs.LogGroup(self, 'SpotFleetMetricsLogs',
+                retention=logs.RetentionDays.ONE_MONTH,
+                removal_policy=cdk.RemovalPolicy.DESTROY
+            )
+        )
+        function.add_to_role_policy(iam.PolicyStatement(
+            actions=['ec2:DescribeSpotFleetRequests'],
+            resources=['*']
+        ))
+        function.add_to_role_policy(iam.PolicyStatement(
+            actions=['cloudwatch:PutMetricData'],
+            resources=['*'],
+            conditions={'StringEquals': {'cloudwatch:namespace': SPOT_FLEET_NAMESPACE}}
+        ))
+        events.Rule(self, 'SpotFleetMetricsSchedule',
+            schedule=events.Schedule.rate(PERIOD),
+            targets=[targets.LambdaFunction(function)]
+        )
+        return function
+
+    def add_alarm(self, id: str, metric: cloudwatch.IMetric, threshold: float, description: str,
+                  topic: sns.ITopic) -> cloudwatch.Alarm:
+        """
+        Creates an alarm that fires when metric is above threshold for 3 consecutive periods
+        """
+        alarm = metric.create_alarm(self, f'{id}Alarm',
+            threshold=threshold,
+            evaluation_periods=3,
+            comparison_operator=cloudwatch.ComparisonOperator.GREATER_THAN_THRESHOLD,
+            treat_missing_data=cloudwatch.TreatMissingData.NOT_BREACHING,
+            alarm_description=description
+        )
+        alarm.add_alarm_action(cloudwatch_actions.SnsAction(topic))
+        self.alarms.append(alarm)
+        return alarm
+
+    def database_metric(self, database: docdb.DatabaseCluster, metric_name: str, statistic: str) -> cloudwatch.Metric:
+        return cloudwatch.Metric(
+            namespace='AWS/DocDB',
+            metric_name=metric_name,
+            dimensions_map={'DBClusterIdentifier': database.cluster_identifier},
+            statistic=statistic,
+            period=PERIOD
+        )
+
+    def storage_metric(self, namespace: str, file_system_id: str, metric_name: str, statistic: str) -> cloudwatch.Metric:
+        return cloudwatch.Metric(
+            namespace=namespace,
+            metric_name=metric_name,
+            dimensions_map={'FileSystemId': file_system_id},
+            statistic=statistic,
+            period=PERIOD
+        )
+
+
+def get_alarm_thresholds(overrides: Optional[Mapping[str, float]] = None) -> Mapping[str, float]:
+    """
+    Returns the alarm thresholds with overrides from the config applied
+    """
+    overrides = overrides or {}
+    unknown_thresholds = [key for key in overrides if key not in DEFAULT_ALARM_THRESHOLDS]
+    if unknown_thresholds:
+        raise ValueError(
+            f"Unknown alarm thresholds {', '.join(unknown_thresholds)}, "
+            f"expected any of {', '.join(DEFAULT_ALARM_THRESHOLDS)}")
+    thresholds = {**DEFAULT_ALARM_THRESHOLDS, **overrides}
+    for key, value in thresholds.items():
+        if value <= 0:
+            raise ValueError(f"Alarm threshold {key} must be positive")
+    return thresholds
@@ -3,13 +3,71 @@ import aws_rfdk as rfdk
 from dataclasses import dataclass
 from aws_cdk import (
     Stack,
+    CfnOutput,
+    aws_docdb as docdb,
     aws_ec2 as ec2,
+    aws_ecs as ecs,
+    aws_ecs_patterns as ecs_patterns,
     aws_route53 as route53,
     aws_elasticloadbalancingv2 as elb2
 )
 from constructs import Construct
 from aws_rfdk import deadline, SessionManagerHelper
-from typing import Mapping, Optional
+from typing import List, Mapping, Optional
+from .instance_types import get_fleet_max_instances
+
+
+@dataclass
+class RenderQueueSizing:
+    """
+    Render Queue (RCS) instance type, capacity and autoscaling target
+    """
+    instance_type: str
+    min_capacity: int
+    max_capacity: int
+    desired_capacity: Optional[int] = None
+    scaling_metric: str = 'cpu'
+    scaling_target: Optional[int] = None
+
+
+# Render Queue presets by the maximum number of workers across all fleets,
+# as (max workers, instance type, min capacity, max capacity)
+RENDER_QUEUE_PRESETS: List[tuple] = [
+    (100, 'c5.large', 1, 1),
+    (500, 'c5.xlarge', 1, 3),
+    (1000, 'c5.2xlarge', 2, 5),
+    (None, 'c5.2xlarge', 3, 10),
+]
+
+@dataclass
+class DatabaseSizing:
+    """
+    DocumentDB instance class and count, the first instance is the writer and the rest are read replicas
+    """
+    instance_type: str
+    instance_count: int
+    parameters: Mapping[str, str]
+
+
+# DocumentDB presets by the maximum number of workers across all fleets,
+# as (max workers, instance type, instance count)
+DATABASE_PRESETS: List[tuple] = [
+    (100, 'r5.large', 1),
+    (500, 'r5.xlarge', 2),
+    (1000, 'r5.2xlarge', 2),
+    (None, 'r5.4xlarge', 3),
+]
+
+# DocumentDB cluster parameters applied before any configured overrides, as RFDK's Repository sets them
+DATABASE_DEFAULT_PARAMETERS: Mapping[str, str] = {
+    'audit_logs': 'enabled',
+}
+
+# Default autoscaling targets, average CPU % or ALB requests per RCS per minute
+RENDER_QUEUE_SCALING_TARGETS: Mapping[str, int] = {
+    'cpu': 60,
+    'requests': 1000,
+}
 
 
 @dataclass
@@ -23,6 +81,18 @@ class DeadlineStackProps(cdk.StackProps):
     use_traffic_encryption: bool = None
     docker_recipes_stage_path: str = None
     spot_fleet_configs: dict = None
+    baseline_fleet_configs: Optional[dict] = None
+    render_queue_instance_type: Optional[str] = None
+    render_queue_min_capacity: Optional[int] = None
+    render_queue_max_capacity: Optional[int] = None
+    render_queue_desired_capacity: Optional[int] = None
+    render_queue_scaling_metric: str = 'cpu'
+    render_queue_scaling_target: Optional[int] = None
+    database_instance_type: Optional[str] = None
+    database_instance_count: Optional[int] = None
+    database_parameters: Optional[dict] = None
+    # VPC CIDRs of the burst regions by region, their workers reach the Render Queue over peering
+    burst_client_cidrs: Optional[Mapping[str, str]] = None
 
 
 class RfdkDeadlineTemplateStack(Stack):
@@ -83,9 +153,20 @@ class RfdkDeadlineTemplateStack(Stack):
                 deadline.AwsCustomerAgreementAndIpLicenseAcceptance.USER_ACCEPTS_AWS_CUSTOMER_AGREEMENT_AND_IP_LICENSE
         )
 
+        fleets = [*(props.spot_fleet_configs or {}).values(), *(props.baseline_fleet_configs or {}).values()]
+        worker_count = sum(get_fleet_max_instances(fleet) for fleet in fleets)
+
+        database_sizing = get_database_sizing(
+            worker_count,
+            instance_type=props.database_instance_type,
+            instance_count=props.database_instance_count,
+            parameters=props.database_parameters
+        )
+
         repository = deadline.Repository(self, 'Repository',
             vpc=vpc,
             version=version,
+            document_db_instance_count=database_sizing.instance_count,
             repository_installation_timeout=cdk.Duration.minutes(20),
             removal_policy=deadline.RepositoryRemovalPolicies(
                 database=cdk.RemovalPolicy.DESTROY,
@@ -94,6 +175,7 @@ class RfdkDeadlineTemplateStack(Stack):
             # Use private subnets
             vpc_subnets=ec2.SubnetSelection(subnet_type=ec2.SubnetType.PRIVATE_WITH_EGRESS)
         )
+        database = configure_repository_database(repository, database_sizing)
 
         if props.use_traffic_encryption:
             traffic_encryption=deadline.RenderQueueTrafficEncryptionProps(
@@ -110,12 +192,28 @@ class RfdkDeadlineTemplateStack(Stack):
                 internal_protocol=elb2.ApplicationProtocol.HTTPS
             )
 
+        render_queue_sizing = get_render_queue_sizing(
+            worker_count,
+            instance_type=props.render_queue_instance_type,
+            min_capacity=props.render_queue_min_capacity,
+            max_capacity=props.render_queue_max_capacity,
+            desired_capacity=props.render_queue_desired_capacity,
+            scaling_metric=props.render_queue_scaling_metric,
+            scaling_target=props.render_queue_scaling_target
+        )
+
         # Use the container images to create a RenderQueue
         render_queue = deadline.RenderQueue(self, 'RenderQueue',
             vpc=vpc,
             repository=repository,
             version=version,
             images=images.for_render_queue(),
+            instance_type=ec2.InstanceType(render_queue_sizing.instance_type),
+            render_queue_size=deadline.RenderQueueSizeConstraints(
+                min=render_queue_sizing.min_capacity,
+                max=render_queue_sizing.max_capacity,
+                desired=render_queue_sizing.desired_capacity
+            ),
             deletion_protection=False,
             hostname=deadline.RenderQueueHostNameProps(
                 hostname=props.renderqueue_name,
@@ -129,6 +227,38 @@ class RfdkDeadlineTemplateStack(Stack):
         SessionManagerHelper.grant_permissions_to(render_queue.asg)
 
         render_queue.connections.allow_default_port_from(ec2.Peer.ipv4(vpc.vpc_cidr_block))
+        for cidr in (props.burst_client_cidrs or {}).values():
+            render_queue.connections.allow_default_port_from(ec2.Peer.ipv4(cidr))
+
+        CfnOutput(
+            self,
+            "DatabaseSizing",
+            value=(
+                f"{database_sizing.instance_type} x {database_sizing.instance_count} "
+                f"(1 writer, {database_sizing.instance_count - 1} read replicas) for up to {worker_count} workers"
+            ),
+            description="DocumentDB instance class and count chosen for the configured fleet size"
+        )
+
+        CfnOutput(
+            self,
+            "DatabaseParameters",
+            value=', '.join(f'{key}={value}' for key, value in sorted(database_sizing.parameters.items())),
+            description="DocumentDB cluster parameters"
+        )
+
+        if render_queue_sizing.max_capacity > render_queue_sizing.min_capacity:
+            self.add_render_queue_autoscaling(render_queue, render_queue_sizing)
+
+        CfnOutput(
+            self,
+            "RenderQueueSizing",
+            value=(
+                f"{render_queue_sizing.instance_type} x {render_queue_sizing.min_capacity}-"
+                f"{render_queue_sizing.max_capacity} for up to {worker_count} workers"
+            ),
+            description="Render Queue instance type and capacity chosen for the configured fleet size"
+        )
 
         # Security group for render workers
         render_worker_sg = ec2.SecurityGroup(self, 'Deadline-Render-Worker-SG',
@@ -138,5 +268,152 @@ class RfdkDeadlineTemplateStack(Stack):
         )
 
         # Expose for other stacks
+        self.vpc = vpc
+        self.dns_zone = dns_zone
         self.render_queue = render_queue
+        self.repository = repository
+        self.render_queue_service = get_render_queue_pattern(render_queue).service
+        self.database = database
         self.render_worker_sg = render_worker_sg
+
+    def add_render_queue_autoscaling(self, render_queue: deadline.RenderQueue, sizing: RenderQueueSizing):
+        """
+        Scales the RCS service with target tracking, and lets ECS scale the Render Queue
+        ASG to fit the RCS tasks through a capacity provider.
+
+        RFDK keeps the service at a fixed task count with one task per instance, so scaling
+        the ASG alone would add instances without RCS tasks. Moving an existing service from
+        the EC2 launch type to the capacity provider replaces it on the next deploy.
+        """
+        pattern = get_render_queue_pattern(render_queue)
+
+        capacity_provider = ecs.AsgCapacityProvider(self, 'RenderQueueCapacityProvider',
+            auto_scaling_group=render_queue.asg,
+            enable_managed_scaling=True,
+            enable_managed_termination_protection=False,
+            target_capacity_percent=100
+        )
+        association = ecs.CfnClusterCapacityProviderAssociations(self, 'RenderQueueCapacityProviderAssociation',
+            cluster=render_queue.cluster.cluster_name,
+            capacity_providers=[capacity_provider.capacity_provider_name],
+            default_capacity_provider_strategy=[
+                ecs.CfnClusterCapacityProviderAssociations.CapacityProviderStrategyProperty(
+                    capacity_provider=capacity_provider.capacity_provider_name,
+                    weight=1
+                )
+            ]
+        )
+
+        # Place RCS tasks through the capacity provider instead of the EC2 launch type
+        cfn_service = pattern.service.node.default_child
+        if cfn_service.launch_type != 'EC2':
+            raise RuntimeError(
+                "Expected RFDK to run the Render Queue service on the EC2 launch type, "
+                f"found {cfn_service.launch_type}")
+        cfn_service.add_property_deletion_override('LaunchType')
+        cfn_service.add_property_override('CapacityProviderStrategy', [{
+            'CapacityProvider': capacity_provider.capacity_provider_name,
+            'Weight': 1,
+        }])
+        pattern.service.node.add_dependency(association)
+
+        scaling = pattern.service.auto_scale_task_count(
+            min_capacity=sizing.min_capacity,
+            max_capacity=sizing.max_capacity
+        )
+        if sizing.scaling_metric == 'cpu':
+            scaling.scale_on_cpu_utilization('RenderQueueCpuScaling',
+                target_utilization_percent=sizing.scaling_target
+            )
+        else:
+            scaling.scale_on_request_count('RenderQueueRequestScaling',
+                requests_per_target=sizing.scaling_target,
+                target_group=pattern.target_group
+            )
+
+
+def get_render_queue_pattern(render_queue: deadline.RenderQueue) -> ecs_patterns.ApplicationLoadBalancedEc2Service:
+    """
+    Returns the load balanced RCS service of a Render Queue, which RFDK does not expose
+    """
+    pattern = render_queue.node.try_find_child('AlbEc2ServicePattern')
+    if not isinstance(pattern, ecs_patterns.ApplicationLoadBalancedEc2Service):
+        raise RuntimeError(
+            "RFDK's RenderQueue no longer has an AlbEc2ServicePattern child, update get_render_queue_pattern")
+    return pattern
+
+
+def configure_repository_database(repository: deadline.Repository, sizing: DatabaseSizing) -> docdb.DatabaseCluster:
+    """
+    Applies the instance class and parameters of the database sizing to the DocumentDB cluster
+    that RFDK's Repository creates, which only takes an instance count. Keeping RFDK's cluster
+    keeps its logical IDs, so existing farms have the cluster modified in place.
+    """
+    database = repository.node.try_find_child('DocumentDatabase')
+    parameter_group = repository.node.try_find_child('ParameterGroup')
+    if not isinstance(database, docdb.DatabaseCluster) or not isinstance(parameter_group, docdb.ClusterParameterGroup):
+        raise RuntimeError(
+            "RFDK's Repository no longer has DocumentDatabase and ParameterGroup children, "
+            "update configure_repository_database")
+
+    for index in range(1, sizing.instance_count + 1):
+        database.node.find_child(f'Instance{index}').db_instance_class = f'db.{sizing.instance_type}'
+    parameter_group.node.default_child.parameters = dict(sizing.parameters)
+    database.node.default_child.enable_cloudwatch_logs_exports = [
+        log for log, parameter in (('audit', 'audit_logs'), ('profiler', 'profiler'))
+        if sizing.parameters.get(parameter) == 'enabled'
+    ] or None
+    return database
+
+
+def get_database_sizing(worker_count: int,
+                        instance_type: Optional[str] = None,
+                        instance_count: Optional[int] = None,
+                        parameters: Optional[Mapping[str, str]] = None) -> DatabaseSizing:
+    """
+    Returns DocumentDB sizing for the number of workers, explicit values override the presets
+    """
+    preset = next(preset for preset in DATABASE_PRESETS if preset[0] is None or worker_count <= preset[0])
+    sizing = DatabaseSizing(
+        instance_type=instance_type or preset[1],
+        instance_count=instance_count or preset[2],
+        parameters={**DATABASE_DEFAULT_PARAMETERS, **(parameters or {})}
+    )
+
+    # A DocumentDB cluster has one writer and up to 15 read replicas
+    if not 1 <= sizing.instance_count <= 16:
+        raise ValueError("database_instance_count must be between 1 and 16")
+    return sizing
+
+
+def get_render_queue_sizing(worker_count: int,
+                            instance_type: Optional[str] = None,
+                            min_capacity: Optional[int] = None,
+                            max_capacity: Optional[int] = None,
+                            desired_capacity: Optional[int] = None,
+                            scaling_metric: str = 'cpu',
+                            scaling_target: Optional[int] = None) -> RenderQueueSizing:
+    """
+    Returns Render Queue sizing for the number of workers, explicit values override the presets
+    """
+    if scaling_metric not in RENDER_QUEUE_SCALING_TARGETS:
+        raise ValueError(
+            f"Unknown Render Queue scaling metric '{scaling_metric}', "
+            f"expected one of {', '.join(RENDER_QUEUE_SCALING_TARGETS)}")
+
+    preset = next(preset for preset in RENDER_QUEUE_PRESETS if preset[0] is None or worker_count <= preset[0])
+    sizing = RenderQueueSizing(
+        instance_type=instance_type or preset[1],
+        min_capacity=min_capacity or preset[2],
+        max_capacity=max_capacity or max(preset[3], min_capacity or 0),
+        desired_capacity=desired_capacity,
+        scaling_metric=scaling_metric,
+        scaling_target=scaling_target or RENDER_QUEUE_SCALING_TARGETS[scaling_metric]
+    )
+
+    if not 1 <= sizing.min_capacity <= sizing.max_capacity:
+        raise ValueError("Render Queue capacity must satisfy 1 <= min_capacity <= max_capacity")
+    if sizing.desired_capacity is not None \
+            and not sizing.min_capacity <= sizing.desired_capacity <= sizing.max_capacity:
+        raise ValueError("render_queue_desired_capacity must be between the min and max capacity")
+    return sizing
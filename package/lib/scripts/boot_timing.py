@@ -0,0 +1,134 @@
+# Publishes the boot phase timings of a render worker as CloudWatch metrics and to a CloudWatch Logs stream.
+# Started in the background at the end of the worker user data:
+#   python3 boot_timing.py --log-group <name> --region <region> --fleet <fleet name>
+# Each phase is reported in seconds since the instance booted, first the phases recorded by the user data,
+# then WorkerRegistered and FirstTask once the worker shows up in the Repository and dequeues a task.
+import argparse
+import glob
+import json
+import os
+import socket
+import subprocess
+import time
+import urllib.request
+
+PHASES_FILE = '/var/lib/render-boot/phases'
+NAMESPACE = 'RenderFarm/WorkerBoot'
+WORKER_LOGS = ['/var/log/Thinkbox/Deadline10/deadlineslave*.log', '/var/log/Thinkbox/Deadline10/deadlineworker*.log']
+# Written to the worker log when a render thread dequeues a task
+FIRST_TASK_LOG_MARKER = 'Got task!'
+REGISTRATION_TIMEOUT = 900
+FIRST_TASK_TIMEOUT = 3600
+POLL_INTERVAL = 10
+
+
+def uptime():
+    with open('/proc/uptime') as f:
+        return float(f.read().split()[0])
+
+
+def instance_metadata(path):
+    token_request = urllib.request.Request('http://169.254.169.254/latest/api/token', method='PUT',
+        headers={'X-aws-ec2-metadata-token-ttl-seconds': '60'})
+    token = urllib.request.urlopen(token_request, timeout=5).read().decode()
+    request = urllib.request.Request(f'http://169.254.169.254/latest/meta-data/{path}',
+        headers={'X-aws-ec2-metadata-token': token})
+    return urllib.request.urlopen(request, timeout=5).read().decode()
+
+
+def read_phases():
+    phases = {}
+    with open(PHASES_FILE) as f:
+        for line in f:
+            name, seconds = line.split()
+            phases[name] = round(float(seconds), 1)
+    return phases
+
+
+def metric_data(fleet, instance_type, values):
+    """
+    Returns the put-metric-data datums of the boot phases, per fleet and per fleet and instance type
+    """
+    timestamp = time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
+    dimension_sets = [
+        [{'Name': 'Fleet', 'Value': fleet}],
+        [{'Name': 'Fleet', 'Value': fleet}, {'Name': 'InstanceType', 'Value': instance_type}],
+    ]
+    return [
+        {'MetricName': name, 'Dimensions': dimensions, 'Timestamp': timestamp, 'Value': value, 'Unit': 'Seconds'}
+        for name, value in values.items() for dimensions in dimension_sets
+    ]
+
+
+def put_metric_data_command(region, data):
+    return [
+        'aws', 'cloudwatch', 'put-metric-data', '--region', region,
+        '--namespace', NAMESPACE, '--metric-data', json.dumps(data),
+    ]
+
+
+def put_metrics(args, instance_id, instance_type, values):
+    subprocess.run(put_metric_data_command(args.region, metric_data(args.fleet, instance_type, values)),
+        check=True, stdout=subprocess.DEVNULL)
+    # The log stream keeps each instance's timings for Logs Insights queries
+    record = {'Fleet': args.fleet, 'InstanceType': instance_type, 'InstanceId': instance_id, **values}
+    subprocess.run([
+        'aws', 'logs', 'put-log-events', '--region', args.region,
+        '--log-group-name', args.log_group, '--log-stream-name', instance_id,
+        '--log-events', json.dumps([{'timestamp': int(time.time() * 1000), 'message': json.dumps(record)}]),
+    ], check=True, stdout=subprocess.DEVNULL)
+
+
+def wait_for(check, timeout):
+    """
+    Returns the uptime at which check first returned True, or None after timeout seconds
+    """
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if check():
+            return round(uptime(), 1)
+        time.sleep(POLL_INTERVAL)
+    return None
+
+
+def is_worker_registered(worker_name):
+    deadline_command = os.path.join(os.environ['DEADLINE_PATH'], 'deadlinecommand')
+    result = subprocess.run([deadline_command, '-GetSlaveNames'], capture_output=True, text=True)
+    return worker_name.lower() in result.stdout.lower().split()
+
+
+def has_dequeued_task():
+    for pattern in WORKER_LOGS:
+        for path in glob.glob(pattern):
+            with open(path, errors='replace') as f:
+                if FIRST_TASK_LOG_MARKER in f.read():
+                    return True
+    return False
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Publishes worker boot phase timings as CloudWatch metrics")
+    parser.add_argument('--log-group', required=True)
+    parser.add_argument('--region', required=True)
+    parser.add_argument('--fleet', required=True)
+    args = parser.parse_args()
+
+    instance_id = instance_metadata('instance-id')
+    instance_type = instance_metadata('instance-type')
+    subprocess.run(['aws', 'logs', 'create-log-stream', '--region', args.region,
+        '--log-group-name', args.log_group, '--log-stream-name', instance_id], stderr=subprocess.DEVNULL)
+
+    put_metrics(args, instance_id, instance_type, read_phases())
+
+    registered = wait_for(lambda: is_worker_registered(socket.gethostname().split('.')[0]), REGISTRATION_TIMEOUT)
+    if registered is None:
+        return
+    put_metrics(args, instance_id, instance_type, {'WorkerRegistered': registered})
+
+    first_task = wait_for(has_dequeued_task, FIRST_TASK_TIMEOUT)
+    if first_task is not None:
+        put_metrics(args, instance_id, instance_type, {'FirstTask': first_task})
+
+
+if __name__ == '__main__':
+    main()
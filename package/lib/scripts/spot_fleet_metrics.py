@@ -0,0 +1,50 @@
+# Publishes the target and fulfilled capacity of this farm's Spot fleets as CloudWatch metrics.
+# Runs as a scheduled Lambda function of the monitoring stack, with the fleet names in the FLEETS
+# environment variable as a JSON list. The Spot Event Plugin creates the Spot Fleet requests at run
+# time, they are found by the fleet name tag the SpotFleetStack adds to every fleet. AWS/EC2Spot
+# metrics only have the request ID as dimension, so they cannot be told apart from other fleets.
+import json
+import os
+
+NAMESPACE = 'RenderFarm/SpotFleet'
+FLEET_TAG = 'RenderFarmFleet'
+# Requests in these states still hold or are changing capacity
+ACTIVE_STATES = ('submitted', 'active', 'modifying')
+
+
+def get_fleet_capacity(requests, fleets):
+    """
+    Returns the summed target and fulfilled capacity of the active requests of each fleet,
+    zero for fleets without one
+    """
+    capacity = {fleet: {'TargetCapacity': 0, 'FulfilledCapacity': 0} for fleet in fleets}
+    for request in requests:
+        tags = {tag['Key']: tag['Value'] for tag in request.get('Tags', [])}
+        fleet = tags.get(FLEET_TAG)
+        if fleet not in capacity or request['SpotFleetRequestState'] not in ACTIVE_STATES:
+            continue
+        config = request['SpotFleetRequestConfig']
+        capacity[fleet]['TargetCapacity'] += config['TargetCapacity']
+        capacity[fleet]['FulfilledCapacity'] += config.get('FulfilledCapacity', 0)
+    return capacity
+
+
+def metric_data(capacity):
+    return [
+        {'MetricName': name, 'Dimensions': [{'Name': 'Fleet', 'Value': fleet}], 'Value': value, 'Unit': 'Count'}
+        for fleet, values in capacity.items() for name, value in values.items()
+    ]
+
+
+def handler(event, context):
+    # Part of the Lambda runtime
+    import boto3
+
+    requests = []
+    for page in boto3.client('ec2').get_paginator('describe_spot_fleet_requests').paginate():
+        requests += page['SpotFleetRequestConfigs']
+    data = metric_data(get_fleet_capacity(requests, json.loads(os.environ['FLEETS'])))
+    cloudwatch = boto3.client('cloudwatch')
+    # put_metric_data takes at most 1000 datums per call
+    for start in range(0, len(data), 1000):
+        cloudwatch.put_metric_data(Namespace=NAMESPACE, MetricData=data[start:start + 1000])
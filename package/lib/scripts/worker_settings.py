@@ -0,0 +1,35 @@
+# Deadline script that pins a worker to CPUs and GPUs and sets its concurrent task limit.
+# Run with: deadlinecommand -ExecuteScriptNoGui worker_settings.py -n <worker name> [-c <cpu ids>] [-g <gpu ids>] [-t <tasks>]
+import argparse
+import Deadline
+
+
+def __main__(*args):
+    parser = argparse.ArgumentParser(description="Configures the affinity and concurrent tasks of a Deadline worker")
+    parser.add_argument('-n', dest="worker_name", required=True, type=str, help="The worker's name")
+    parser.add_argument('-c', dest="cpus", type=str, help="Comma separated CPU ids")
+    parser.add_argument('-g', dest="gpus", type=str, help="Comma separated GPU ids")
+    parser.add_argument('-t', dest="tasks", type=int, help="Concurrent task limit")
+    args = parser.parse_args(args)
+
+    try:
+        worker_settings = Deadline.Scripting.RepositoryUtils.GetSlaveSettings(args.worker_name, True)
+    except:
+        raise Exception("Failed to get settings for worker: {}".format(args.worker_name))
+
+    if args.cpus:
+        worker_settings.SlaveCpuAffinity = [int(cpu) for cpu in args.cpus.split(',')]
+        worker_settings.SlaveOverrideCpuAffinity = True
+    if args.gpus:
+        worker_settings.SlaveGpuAffinity = [int(gpu) for gpu in args.gpus.split(',')]
+        worker_settings.SlaveOverrideGpuAffinity = True
+    if args.tasks:
+        worker_settings.SlaveConcurrentTaskLimit = args.tasks
+
+    try:
+        Deadline.Scripting.RepositoryUtils.SaveSlaveSettings(worker_settings)
+    except:
+        raise Exception("Failed to save settings for {}".format(args.worker_name))
+
+    print("Successfully configured {} (cpus: {}, gpus: {}, tasks: {})".format(
+        args.worker_name, args.cpus, args.gpus, args.tasks))
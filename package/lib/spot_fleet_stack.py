@@ -5,23 +5,51 @@ from aws_cdk import (
     Stack,
     aws_ec2 as ec2,
     aws_iam as iam,
+    aws_logs as logs,
 )
 from constructs import Construct
 from aws_rfdk import deadline
-from aws_rfdk.deadline import RenderQueue, SpotEventPluginFleet, ConfigureSpotEventPlugin, SpotEventPluginSettings
-from typing import Mapping, Optional
+from aws_rfdk.deadline import (
+    RenderQueue,
+    SpotEventPluginFleet,
+    ConfigureSpotEventPlugin,
+    SpotEventPluginLoggingLevel,
+    SpotEventPluginPreJobTaskMode,
+    SpotEventPluginSettings,
+    SpotFleetAllocationStrategy,
+)
+from typing import List, Mapping, Optional
+from .storage_stack import worker_mount_read_statements
+from .worker_user_data import (
+    REPOSITORY_CONNECTIONS,
+    WorkerUserDataProvider,
+    boot_timing_metrics_statement,
+    nvidia_driver_read_statement,
+    validate_worker_policy,
+)
+
+
+# Tag of the Spot Fleet requests and workers of each fleet, holding the fleet name,
+# see scripts/spot_fleet_metrics.py
+FLEET_NAME_TAG = 'RenderFarmFleet'
 
 
 @dataclass
 class SpotFleetStackProps(cdk.StackProps):
-    vpc: Optional[ec2.IVpc] = None
-    vpc_id: Optional[str] = None
+    vpc: ec2.IVpc = None
     aws_region: str = None
     spot_fleet_configs: dict = None
     render_queue: RenderQueue = None
+    repository: Optional[deadline.IRepository] = None
     security_group_ids: list = None
     create_resource_tracker_role: Optional[bool] = None
     fleet_instance_role: Optional[iam.Role] = None
+    use_traffic_encryption: bool = True
+    worker_mounts: Optional[list] = None
+    worker_local_storage: bool = True
+    worker_boot_timing: bool = True
+    spot_plugin_preset: str = 'steady'
+    spot_plugin_settings: Optional[dict] = None
 
 
 class SpotFleetStack(Stack):
@@ -38,16 +66,6 @@ class SpotFleetStack(Stack):
                 role_name='DeadlineResourceTrackerAccessRole'
             )
 
-        # Create IAM role for spot fleet worker
-        fleet_instance_role = iam.Role(self, 'DeadlineWorkerEC2Role',
-            role_name='DeadlineWorkerEC2Role',
-            assumed_by=iam.ServicePrincipal('ec2.amazonaws.com'),
-            managed_policies=[
-                iam.ManagedPolicy.from_aws_managed_policy_name('AWSThinkboxDeadlineSpotEventPluginWorkerPolicy'),
-                iam.ManagedPolicy.from_aws_managed_policy_name('AmazonSSMManagedInstanceCore')
-            ],
-        )
-
         # Create IAM user for Deadline Spot Event Plugin Admin
         # deadline_spot_admin_user = iam.User(self, 'DeadlineSpotEventPluginAdmin',
         #     user_name='DeadlineSpotEventPluginAdmin',
@@ -59,65 +77,183 @@ class SpotFleetStack(Stack):
         #     ]
         # )
 
-        # Get render worker security group
-        security_groups = []
-        for i, sg_id in enumerate(props.security_group_ids):
-            sg = ec2.SecurityGroup.from_security_group_id(
-                self, f'render_sg_{i}', security_group_id=sg_id)
-            security_groups.append(sg)
-
-        userData = ec2.UserData.for_linux()
-        userData.add_commands(
-            "#!/bin/bash",
-            "sudo mkdir -p /mnt/production",
-            "fs-0ee858807f35f47e5.efs.ap-southeast-2.amazonaws.com:/ /mnt/production nfs nfsvers=4.1,rsize=1048576,wsize=1048576,hard,timeo=600,retrans=2,noresvport",
-            "sudo mount /mnt/production",
-            "export DEADLINE_PATH=/opt/Thinkbox/Deadline10/bin",
-            "sudo sed -i 's/^ConnectionType=.*/ConnectionType=Remote/' /var/lib/Thinkbox/Deadline10/deadline.ini",
-            "sudo sed -i 's/^ProxyRoot=.*/ProxyRoot=renderqueue.deadline.internal:4433/' /var/lib/Thinkbox/Deadline10/deadline.ini",
-            "sudo sed -i 's/^ProxyUseSSL=.*/ProxyUseSSL=True/' /var/lib/Thinkbox/Deadline10/deadline.ini",
-            "sudo sed -i 's/^ProxySSLCA=.*/ProxySSLCA=/mnt/production/ca.crt/' /var/lib/Thinkbox/Deadline10/deadline.ini",
-            "sudo sed -i 's/^ClientSSLAuthentication=.*/ClientSSLAuthentication=NotRequired/' /var/lib/Thinkbox/Deadline10/deadline.ini",
-            "sudo sed -i 's/^ProxyRoot0=.*/renderqueue.deadline.internal:4433%/mnt/production/ca.crt/' /var/lib/Thinkbox/Deadline10/deadline.ini",
-            "$DEADLINE_PATH/deadlineworker -shutdown",
-            "$DEADLINE_PATH/deadlineworker -nogui"
-        )
+        # Boot phase timings of the workers, one log stream per instance, metrics go to RenderFarm/WorkerBoot
+        boot_timing_log_group = None
+        if props.worker_boot_timing:
+            boot_timing_log_group = logs.LogGroup(self, 'WorkerBootTiming',
+                retention=logs.RetentionDays.ONE_MONTH,
+                removal_policy=cdk.RemovalPolicy.DESTROY
+            )
 
         spot_fleets = []
+        fleet_configs = []
+        fleet_subnet_ids = []
+
+        # Fleets are spread across all private subnets, or those of their availability_zones,
+        # so each instance type becomes one Spot pool per AZ
+        subnet_ids = props.vpc.select_subnets(subnet_type=ec2.SubnetType.PRIVATE_WITH_EGRESS).subnet_ids
 
-        for i, fleet in props.spot_fleet_configs.items():
-            if fleet["is_linux"]:
-                ami = ec2.MachineImage.generic_linux(fleet['worker_image'])
-            else:
-                ami = ec2.MachineImage.generic_windows(fleet['worker_image'])
-            spot_fleet_config = deadline.SpotEventPluginFleet(self,
-                fleet['name'],
-                vpc=props.vpc,
-                render_queue=props.render_queue,
-                deadline_groups=fleet['deadline_groups'],
-                deadline_pools=fleet['deadline_pools'],
-                security_groups=security_groups,
-                # instance_types=self.instanceListFormatter(fleet['instance_types']),
-                instance_types=[ec2.InstanceType('c5a.4xlarge')],
-                fleet_instance_role=fleet_instance_role,
-                max_capacity=fleet['max_capacity'],
-                worker_machine_image=ami,
-                track_instances_with_resource_tracker=True,
-                user_data=userData
+        # Fleets stay in this stack while they fit its CloudFormation budget and are packed into
+        # nested stacks otherwise, the Spot Event Plugin configuration always stays here
+        shards = pack_fleet_shards(props.spot_fleet_configs, len(subnet_ids))
+        if len(shards) == 1:
+            shard_scopes = [self]
+        else:
+            shard_scopes = [cdk.NestedStack(self, f'FleetShard{index + 1}') for index in range(len(shards))]
+
+        render_queue_address = (
+            f'{props.render_queue.endpoint.hostname}:{props.render_queue.endpoint.port_as_string()}')
+
+        for scope, shard in zip(shard_scopes, shards):
+            shard_fleets = [props.spot_fleet_configs[key] for key in shard]
+            # RFDK needs the fleet instance role in the same stack as the fleets
+            fleet_instance_role = self.create_fleet_instance_role(scope, shard_fleets, props.worker_mounts,
+                # The role keeps its name when the fleets are not sharded
+                role_name='DeadlineWorkerEC2Role' if scope is self else None)
+            if boot_timing_log_group:
+                boot_timing_log_group.grant_write(fleet_instance_role)
+                fleet_instance_role.add_to_policy(boot_timing_metrics_statement())
+            # The fleets of a shard share one Spot Fleet role, so the Render Queue's iam:PassRole
+            # policy lists two roles per shard rather than one per fleet
+            fleet_role = iam.Role(scope, 'SpotFleetRole',
+                assumed_by=iam.ServicePrincipal('spotfleet.amazonaws.com'),
+                managed_policies=[
+                    iam.ManagedPolicy.from_aws_managed_policy_name('service-role/AmazonEC2SpotFleetTaggingRole')
+                ]
             )
-            if fleet['tags']:
-                for key, value in fleet['tags'].items():
-                    cdk.Tags.of(spot_fleet_config).add(key, value)
-            spot_fleets.append(spot_fleet_config)
 
-        ConfigureSpotEventPlugin(self, 'SpotEventPluginConfig',
+            # Get render worker security group
+            security_groups = []
+            for i, sg_id in enumerate(props.security_group_ids):
+                sg = ec2.SecurityGroup.from_security_group_id(
+                    scope, f'render_sg_{i}', security_group_id=sg_id)
+                security_groups.append(sg)
+
+            for fleet in shard_fleets:
+                if fleet.get('weight_by_vcpu'):
+                    raise ValueError(
+                        f"Fleet '{fleet['name']}' sets weight_by_vcpu, which RFDK's Spot Event Plugin "
+                        "configuration cannot deploy. Remove it, max_capacity counts instances")
+                direct_connection = is_direct_connection(fleet)
+                if direct_connection and props.repository is None:
+                    raise ValueError(
+                        f"Fleet '{fleet['name']}' connects directly to the Repository, which was not given")
+                if fleet["is_linux"]:
+                    ami = ec2.MachineImage.generic_linux(fleet['worker_image'])
+                    # Each fleet gets its own user data, RFDK appends fleet specific commands to it
+                    user_data = ec2.UserData.for_linux()
+                    user_data_provider = WorkerUserDataProvider(scope, f'{fleet["name"]}UserDataProvider',
+                        render_queue_address=render_queue_address,
+                        use_traffic_encryption=props.use_traffic_encryption,
+                        mounts=props.worker_mounts,
+                        local_storage=props.worker_local_storage,
+                        boot_timing_log_group=(
+                            boot_timing_log_group.log_group_name if boot_timing_log_group else None),
+                        fleet_name=fleet['name'],
+                        bootstrap_commands=fleet.get('bootstrap_commands'),
+                        gpu_workers=fleet.get('gpu_workers'),
+                        worker_policy=fleet.get('worker_policy'),
+                        repository=props.repository if direct_connection else None
+                    )
+                    if fleet.get('worker_policy'):
+                        validate_worker_policy(fleet['name'], fleet['worker_policy'])
+                else:
+                    if (fleet.get('gpu_workers') or fleet.get('bootstrap_commands') or fleet.get('worker_policy')
+                            or direct_connection):
+                        raise ValueError(
+                            f"Fleet '{fleet['name']}' is a Windows fleet, gpu_workers, bootstrap_commands, "
+                            "worker_policy and direct repository connections are only supported on Linux")
+                    ami = ec2.MachineImage.generic_windows(fleet['worker_image'])
+                    user_data = ec2.UserData.for_windows()
+                    user_data_provider = None
+                worker_subnets = get_fleet_subnet_selection(props.vpc, fleet)
+                spot_fleet_config = deadline.SpotEventPluginFleet(scope,
+                    fleet['name'],
+                    vpc=props.vpc,
+                    vpc_subnets=worker_subnets,
+                    render_queue=props.render_queue,
+                    deadline_groups=fleet['deadline_groups'],
+                    deadline_pools=fleet['deadline_pools'],
+                    security_groups=security_groups,
+                    instance_types=self.instanceListFormatter(fleet['instance_types']),
+                    allocation_strategy=get_allocation_strategy(fleet.get('allocation_strategy')),
+                    fleet_instance_role=fleet_instance_role,
+                    fleet_role=fleet_role,
+                    max_capacity=fleet['max_capacity'],
+                    worker_machine_image=ami,
+                    track_instances_with_resource_tracker=True,
+                    user_data=user_data,
+                    user_data_provider=user_data_provider
+                )
+                if fleet['tags']:
+                    for key, value in fleet['tags'].items():
+                        cdk.Tags.of(spot_fleet_config).add(key, value)
+                # Finds the fleet's Spot Fleet requests for the monitoring stack's metrics
+                cdk.Tags.of(spot_fleet_config).add(FLEET_NAME_TAG, fleet['name'])
+                spot_fleets.append(spot_fleet_config)
+                fleet_configs.append(fleet)
+                fleet_subnet_ids.append(props.vpc.select_subnets(
+                    subnet_type=worker_subnets.subnet_type,
+                    availability_zones=worker_subnets.availability_zones
+                ).subnet_ids)
+
+        spot_event_plugin_config = ConfigureSpotEventPlugin(self, 'SpotEventPluginConfig',
             vpc=props.vpc,
             render_queue=props.render_queue,
             spot_fleets=spot_fleets,
-            configuration=SpotEventPluginSettings(
-                enable_resource_tracker=True
-            )
+            configuration=get_spot_plugin_settings(props.spot_plugin_preset, props.spot_plugin_settings)
+        )
+
+        for spot_fleet, fleet, subnet_ids in zip(spot_fleets, fleet_configs, fleet_subnet_ids):
+            self.merge_launch_template_configs(spot_event_plugin_config, spot_fleet, fleet, subnet_ids)
+
+    def create_fleet_instance_role(self, scope: Construct, fleets: list, worker_mounts: Optional[list],
+                                   role_name: Optional[str] = None) -> iam.Role:
+        """
+        Creates the instance role of the Spot fleet workers in scope
+        """
+        fleet_instance_role = iam.Role(scope, 'DeadlineWorkerEC2Role',
+            role_name=role_name,
+            assumed_by=iam.ServicePrincipal('ec2.amazonaws.com'),
+            managed_policies=[
+                iam.ManagedPolicy.from_aws_managed_policy_name('AWSThinkboxDeadlineSpotEventPluginWorkerPolicy'),
+                iam.ManagedPolicy.from_aws_managed_policy_name('AmazonSSMManagedInstanceCore')
+            ],
         )
+        if any(fleet.get('gpu_workers') for fleet in fleets):
+            # GPU workers install the NVIDIA driver at boot when the AMI does not have it
+            fleet_instance_role.add_to_policy(nvidia_driver_read_statement(self.partition))
+        # Read-only access to the S3 buckets mounted on the workers
+        for statement in worker_mount_read_statements(worker_mounts or []):
+            fleet_instance_role.add_to_policy(statement)
+        return fleet_instance_role
+
+    def merge_launch_template_configs(self, plugin_config: ConfigureSpotEventPlugin,
+                                      spot_fleet: SpotEventPluginFleet, fleet: dict, subnet_ids: List[str]) -> None:
+        """
+        Replaces the launch template configs RFDK renders for a fleet, one per instance type and subnet
+        pair, with a single config holding every pair as an override. This keeps the Spot Event
+        Plugin configuration of large farms under the CloudFormation template size limit.
+        Overrides only hold strings, CloudFormation passes custom resource properties to RFDK's
+        lambda as strings and it rejects numeric fields such as WeightedCapacity given as one.
+        """
+        # ConfigureSpotEventPlugin -> CustomResource -> CfnResource
+        cfn_resource = plugin_config.node.default_child.node.default_child
+
+        overrides = [
+            {'InstanceType': name, 'SubnetId': subnet_id}
+            for name in fleet['instance_types'] for subnet_id in subnet_ids
+        ]
+        launch_template_configs = [{
+            'LaunchTemplateSpecification': {
+                'LaunchTemplateId': spot_fleet.launch_template.launch_template_id,
+                'Version': spot_fleet.launch_template.latest_version_number,
+            },
+            'Overrides': overrides,
+        }]
+        for group in fleet['deadline_groups']:
+            cfn_resource.add_property_override(
+                f'spotFleetRequestConfigurations.{group.lower()}.LaunchTemplateConfigs', launch_template_configs)
 
     def instanceListFormatter(self, instance_list: list) -> list:
         """
@@ -129,4 +265,192 @@ class SpotFleetStack(Stack):
             instance_type_format= ec2.InstanceType(name)
             instance_type_format_list.append(instance_type_format)
 
-        return instance_type_format_list
\ No newline at end of file
+        return instance_type_format_list
+
+
+ALLOCATION_STRATEGIES: Mapping[str, SpotFleetAllocationStrategy] = {
+    'capacity_optimized': SpotFleetAllocationStrategy.CAPACITY_OPTIMIZED,
+    'lowest_price': SpotFleetAllocationStrategy.LOWEST_PRICE,
+    'diversified': SpotFleetAllocationStrategy.DIVERSIFIED,
+}
+
+
+def get_allocation_strategy(name: Optional[str]) -> SpotFleetAllocationStrategy:
+    """
+    Returns the Spot Fleet allocation strategy for a config name, defaulting to capacity optimized
+    """
+    if name is None:
+        return SpotFleetAllocationStrategy.CAPACITY_OPTIMIZED
+    if name not in ALLOCATION_STRATEGIES:
+        raise ValueError(
+            f"Unknown allocation strategy '{name}', expected one of {', '.join(ALLOCATION_STRATEGIES)}")
+    return ALLOCATION_STRATEGIES[name]
+
+
+def get_fleet_subnet_selection(vpc: ec2.IVpc, fleet: Mapping[str, object]) -> ec2.SubnetSelection:
+    """
+    Returns the private subnets a fleet launches workers in, those of its availability_zones if set
+    """
+    availability_zones = fleet.get('availability_zones')
+    if availability_zones:
+        unknown_azs = [az for az in availability_zones if az not in vpc.availability_zones]
+        if unknown_azs:
+            raise ValueError(
+                f"Fleet '{fleet['name']}' availability zones {', '.join(unknown_azs)} are not in the VPC, "
+                f"expected any of {', '.join(vpc.availability_zones)}")
+    return ec2.SubnetSelection(
+        subnet_type=ec2.SubnetType.PRIVATE_WITH_EGRESS,
+        availability_zones=availability_zones or None
+    )
+
+
+# CloudFormation allows 500 resources and a 1 MB template per stack. Fleets are packed into
+# nested stacks within these budgets, which leave headroom for the estimates below.
+FLEET_SHARD_RESOURCE_BUDGET = 400
+FLEET_SHARD_TEMPLATE_BUDGET = 800_000
+# Resources of each fleet: launch template, two instance profiles, CloudWatch agent
+# configuration parameter and log group retention
+FLEET_RESOURCES = 5
+# Template bytes of each fleet, mostly the launch template user data
+LINUX_FLEET_TEMPLATE_BYTES = 24_000
+WINDOWS_FLEET_TEMPLATE_BYTES = 8_000
+# Bytes each Deadline group of a fleet adds to the Spot Event Plugin configuration and its
+# iam:PassRole policy, including the nested stack outputs of a sharded fleet's launch template,
+# and for each instance type and subnet pair of the fleet. An override holds the instance type
+# and the imported subnet ID, about 140 bytes.
+SPOT_PLUGIN_CONFIG_BYTES = 1_500
+SPOT_PLUGIN_CONFIG_BYTES_PER_OVERRIDE = 160
+
+
+def pack_fleet_shards(spot_fleet_configs: Mapping[str, dict], subnet_count: int = 3) -> List[List[str]]:
+    """
+    Returns the fleet keys of each shard, a single shard when every fleet fits one stack next
+    to the Spot Event Plugin configuration. Fleets are packed in config order, so adding a
+    fleet at the end only changes the last shard and the others are skipped on deploy.
+    """
+    def get_template_bytes(fleet):
+        return LINUX_FLEET_TEMPLATE_BYTES if fleet['is_linux'] else WINDOWS_FLEET_TEMPLATE_BYTES
+
+    plugin_config_bytes = sum(
+        len(fleet['deadline_groups'])
+        * (SPOT_PLUGIN_CONFIG_BYTES + SPOT_PLUGIN_CONFIG_BYTES_PER_OVERRIDE * len(fleet['instance_types']) * subnet_count)
+        for fleet in spot_fleet_configs.values())
+    if plugin_config_bytes > FLEET_SHARD_TEMPLATE_BUDGET:
+        raise ValueError(
+            f"The Spot Event Plugin configuration of {len(spot_fleet_configs)} fleets does not fit a "
+            "CloudFormation template, use fewer fleets, Deadline groups or instance types")
+
+    fleets = list(spot_fleet_configs)
+    if (len(fleets) * FLEET_RESOURCES <= FLEET_SHARD_RESOURCE_BUDGET
+            and plugin_config_bytes + sum(get_template_bytes(spot_fleet_configs[key]) for key in fleets)
+            <= FLEET_SHARD_TEMPLATE_BUDGET):
+        return [fleets]
+
+    shards = [[]]
+    shard_resources = shard_bytes = 0
+    for key in fleets:
+        fleet_bytes = get_template_bytes(spot_fleet_configs[key])
+        if shards[-1] and (shard_resources + FLEET_RESOURCES > FLEET_SHARD_RESOURCE_BUDGET
+                           or shard_bytes + fleet_bytes > FLEET_SHARD_TEMPLATE_BUDGET):
+            shards.append([])
+            shard_resources = shard_bytes = 0
+        shards[-1].append(key)
+        shard_resources += FLEET_RESOURCES
+        shard_bytes += fleet_bytes
+    return shards
+
+
+def is_direct_connection(fleet: Mapping[str, object]) -> bool:
+    """
+    Returns True when a fleet's workers connect directly to the Repository instead of the Render Queue
+    """
+    connection = fleet.get('repository_connection') or 'render_queue'
+    if connection not in REPOSITORY_CONNECTIONS:
+        raise ValueError(
+            f"Fleet '{fleet['name']}' has unknown repository_connection '{connection}', "
+            f"expected one of {', '.join(REPOSITORY_CONNECTIONS)}")
+    return connection == 'direct'
+
+
+PRE_JOB_TASK_MODES: Mapping[str, SpotEventPluginPreJobTaskMode] = {
+    'conservative': SpotEventPluginPreJobTaskMode.CONSERVATIVE,
+    'ignore': SpotEventPluginPreJobTaskMode.IGNORE,
+    'normal': SpotEventPluginPreJobTaskMode.NORMAL,
+}
+
+SPOT_PLUGIN_LOGGING_LEVELS: Mapping[str, SpotEventPluginLoggingLevel] = {
+    'standard': SpotEventPluginLoggingLevel.STANDARD,
+    'verbose': SpotEventPluginLoggingLevel.VERBOSE,
+    'debug': SpotEventPluginLoggingLevel.DEBUG,
+    'off': SpotEventPluginLoggingLevel.OFF,
+}
+
+# Spot Event Plugin presets, the settings in spot_plugin_settings are applied on top.
+# 'aggressive_burst' starts many instances per cycle and lets pre job tasks request capacity,
+# 'cost_saver' ramps up slowly, shuts idle workers down quickly and never exceeds max_capacity.
+SPOT_PLUGIN_PRESETS: Mapping[str, Mapping[str, object]] = {
+    'aggressive_burst': {
+        'maximum_instances_started_per_cycle': 250,
+        'idle_shutdown_minutes': 10,
+        'pre_job_task_mode': 'normal',
+        'strict_hard_cap': False,
+        'delete_sep_terminated_workers': True,
+        'delete_ec2_spot_interrupted_workers': True,
+        'logging_level': 'standard',
+    },
+    'steady': {
+        'maximum_instances_started_per_cycle': 50,
+        'idle_shutdown_minutes': 10,
+        'pre_job_task_mode': 'conservative',
+        'strict_hard_cap': False,
+        'delete_sep_terminated_workers': False,
+        'delete_ec2_spot_interrupted_workers': False,
+        'logging_level': 'standard',
+    },
+    'cost_saver': {
+        'maximum_instances_started_per_cycle': 20,
+        'idle_shutdown_minutes': 2,
+        'pre_job_task_mode': 'conservative',
+        'strict_hard_cap': True,
+        'delete_sep_terminated_workers': True,
+        'delete_ec2_spot_interrupted_workers': True,
+        'logging_level': 'standard',
+    },
+}
+
+
+def get_spot_plugin_settings(preset: str, overrides: Optional[Mapping[str, object]] = None) -> SpotEventPluginSettings:
+    """
+    Returns the Spot Event Plugin settings of a preset with overrides applied
+    """
+    if preset not in SPOT_PLUGIN_PRESETS:
+        raise ValueError(
+            f"Unknown Spot Event Plugin preset '{preset}', expected one of {', '.join(SPOT_PLUGIN_PRESETS)}")
+    overrides = overrides or {}
+    unknown_settings = [key for key in overrides if key not in SPOT_PLUGIN_PRESETS[preset]]
+    if unknown_settings:
+        raise ValueError(
+            f"Unknown Spot Event Plugin settings {', '.join(unknown_settings)}, "
+            f"expected any of {', '.join(SPOT_PLUGIN_PRESETS[preset])}")
+    settings = {**SPOT_PLUGIN_PRESETS[preset], **overrides}
+
+    if not 1 <= settings['maximum_instances_started_per_cycle'] <= 1000:
+        raise ValueError("maximum_instances_started_per_cycle must be between 1 and 1000")
+    # The plugin checks for idle workers in whole minutes
+    if not 1 <= settings['idle_shutdown_minutes'] <= 10080:
+        raise ValueError("idle_shutdown_minutes must be between 1 and 10080 (one week)")
+    if settings['pre_job_task_mode'] not in PRE_JOB_TASK_MODES:
+        raise ValueError(f"pre_job_task_mode must be one of {', '.join(PRE_JOB_TASK_MODES)}")
+    if settings['logging_level'] not in SPOT_PLUGIN_LOGGING_LEVELS:
+        raise ValueError(f"logging_level must be one of {', '.join(SPOT_PLUGIN_LOGGING_LEVELS)}")
+
+    return SpotEventPluginSettings(
+        enable_resource_tracker=True,
+        maximum_instances_started_per_cycle=settings['maximum_instances_started_per_cycle'],
+        idle_shutdown=cdk.Duration.minutes(settings['idle_shutdown_minutes']),
+        pre_job_task_mode=PRE_JOB_TASK_MODES[settings['pre_job_task_mode']],
+        strict_hard_cap=settings['strict_hard_cap'],
+        delete_sep_terminated_workers=settings['delete_sep_terminated_workers'],
+        delete_ec2_spot_interrupted_workers=settings['delete_ec2_spot_interrupted_workers'],
+        logging_level=SPOT_PLUGIN_LOGGING_LEVELS[settings['logging_level']],
+    )
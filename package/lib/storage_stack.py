@@ -1,15 +1,104 @@
 import aws_cdk as cdk
-import random
 from dataclasses import dataclass
-from typing import Mapping, Optional
+from typing import Dict, List, Mapping, Optional
 from aws_cdk import (
     Stack,
     CfnOutput,
     aws_efs as efs,
     aws_fsx as fsx,
     aws_ec2 as ec2,
+    aws_iam as iam,
+    aws_s3 as s3,
 )
 from constructs import Construct
+from .instance_types import get_fleet_max_instances
+
+
+# Recommended NFS client options for each production storage backend. Both keep close-to-open
+# consistency, workers must see scene files and task outputs that other hosts just rewrote.
+EFS_MOUNT_OPTIONS = 'nfsvers=4.1,rsize=1048576,wsize=1048576,hard,timeo=600,retrans=2,noresvport,_netdev'
+ZFS_MOUNT_OPTIONS = 'nfsvers=4.1,rsize=1048576,wsize=1048576,hard,timeo=600,retrans=2,_netdev'
+
+# Upper bound of NFS connections per mount, workers open one per 4 vCPUs up to this limit
+EFS_MAX_NCONNECT = 16
+ZFS_MAX_NCONNECT = 16
+
+# NFS read-ahead per mount in KiB, large sequential reads of scene assets benefit from more
+EFS_READ_AHEAD_KB = 15360
+ZFS_READ_AHEAD_KB = 8192
+
+EFS_THROUGHPUT_MODES: Mapping[str, efs.ThroughputMode] = {
+    'elastic': efs.ThroughputMode.ELASTIC,
+    'provisioned': efs.ThroughputMode.PROVISIONED,
+    'bursting': efs.ThroughputMode.BURSTING,
+}
+
+EFS_PERFORMANCE_MODES: Mapping[str, efs.PerformanceMode] = {
+    'general_purpose': efs.PerformanceMode.GENERAL_PURPOSE,
+    'max_io': efs.PerformanceMode.MAX_IO,
+}
+
+# Lustre client options used by workers to mount the FSx for Lustre file system
+LUSTRE_MOUNT_OPTIONS = 'defaults,noatime,flock,_netdev'
+
+# Mountpoint for S3 options of the asset library, metadata is cached for ASSET_METADATA_TTL seconds.
+# Workers add a local data cache, see mount_commands.
+ASSET_MOUNT_OPTIONS = '_netdev,nosuid,nodev,read-only,allow-other'
+ASSET_METADATA_TTL = 300
+
+PRODUCTION_MOUNT_PATH = '/mnt/production'
+LUSTRE_MOUNT_PATH = '/mnt/lustre'
+ASSET_MOUNT_PATH = '/mnt/assets'
+
+# 'first_az' places single-AZ storage and the preferred OpenZFS file server in the VPC's first private
+# subnet, 'fleet_az' places them in the AZ that can run the most workers so NFS traffic stays in-AZ
+STORAGE_PLACEMENTS = ('first_az', 'fleet_az')
+
+# Valid throughput capacities (MB/s) of a MULTI_AZ_1 OpenZFS file system
+ZFS_THROUGHPUT_TIERS = [160, 320, 640, 1280, 2560, 3840, 5120, 7680, 10240]
+ZFS_MIN_STORAGE_CAPACITY = 64  # GiB
+ZFS_MAX_STORAGE_CAPACITY = 524288  # GiB
+ZFS_MAX_IOPS = 400000
+# OpenZFS includes 3 SSD IOPS per GiB of storage
+ZFS_IOPS_PER_GIB = 3
+
+# Valid per-TiB throughput (MB/s) for each persistent Lustre deployment type
+LUSTRE_THROUGHPUT_PER_TIB: Mapping[str, list] = {
+    'PERSISTENT_1': [50, 100, 200],
+    'PERSISTENT_2': [125, 250, 500, 1000],
+}
+
+
+@dataclass
+class WorkerMount:
+    """
+    A shared file system mounted on render workers
+    """
+    source: str
+    path: str
+    fs_type: str
+    options: str
+    # NFS connections are scaled with the instance's vCPU count up to this limit
+    max_nconnect: int = 1
+    # Read-ahead in KiB applied after mounting, 0 keeps the kernel default
+    read_ahead_kb: int = 0
+    # Cache reads on the worker's local NVMe with FS-Cache (NFS only)
+    fs_cache: bool = False
+    # Set for EFS, whose DNS name does not resolve from peered VPCs
+    efs_file_system_id: Optional[str] = None
+    # Set for S3 buckets mounted with Mountpoint, workers are granted read access to it
+    s3_bucket_arn: Optional[str] = None
+
+
+@dataclass
+class ZfsSizing:
+    """
+    OpenZFS capacity, throughput and IOPS for a render farm size
+    """
+    worker_count: int
+    storage_capacity: int
+    throughput_capacity: int
+    iops: int
 
 
 @dataclass 
@@ -18,13 +107,41 @@ class StorageStackProps(cdk.StackProps):
     vpc_id: Optional[str] = None
     enable_fsx_zfs: bool = True
     enable_efs: bool = False
+    efs_throughput_mode: str = 'elastic'
+    efs_provisioned_throughput: Optional[int] = None
+    efs_performance_mode: str = 'general_purpose'
+    production_storage: str = 'efs'
+    enable_fsx_lustre: bool = False
+    lustre_deployment_type: str = 'SCRATCH_2'
+    lustre_storage_capacity: int = 1200
+    lustre_throughput_per_tib: Optional[int] = None
+    lustre_s3_bucket_name: Optional[str] = None
+    enable_asset_bucket: bool = False
+    asset_bucket_name: Optional[str] = None
+    spot_fleet_configs: dict = None
+    baseline_fleet_configs: Optional[dict] = None
+    zfs_throughput_per_worker: int = 50
+    zfs_iops_per_worker: int = 500
+    zfs_capacity_per_worker: int = 16
+    zfs_storage_capacity: Optional[int] = None
+    zfs_throughput_capacity: Optional[int] = None
+    zfs_iops: Optional[int] = None
+    storage_placement: str = 'first_az'
+    # Subnets of an existing OpenZFS file system, preferred subnet first, instead of storage_placement
+    zfs_subnet_ids: Optional[List[str]] = None
+    # VPC CIDRs of the burst regions whose workers mount the file systems, by region
+    burst_client_cidrs: Optional[Mapping[str, str]] = None
 
 
 class StorageStack(Stack):
     def __init__(self, scope: Construct, construct_id: str, props: StorageStackProps, **kwargs) -> None:
         super().__init__(scope, construct_id, **kwargs)
 
-        self.vpc = props.vpc
+        # Use VPC object directly if provided, otherwise lookup by ID
+        if props.vpc:
+            self.vpc = props.vpc
+        else:
+            self.vpc = ec2.Vpc.from_lookup(self, 'Storage-VPC', vpc_id=props.vpc_id)
 
         # Create storage security group
         self.nfs_sg = ec2.SecurityGroup(
@@ -70,32 +187,88 @@ class StorageStack(Stack):
             description="FSx ZFS NFS auxiliary UDP ports"
         )
 
+        fleets = [*(props.spot_fleet_configs or {}).values(), *(props.baseline_fleet_configs or {}).values()]
+        # Private subnets ordered by placement preference
+        self.storage_subnets = get_storage_subnets(self.vpc, props.storage_placement, fleets)
+
         if props.enable_fsx_zfs:
-            self.deploy_zfs()
+            worker_count = sum(get_fleet_max_instances(fleet) for fleet in fleets)
+            sizing = size_zfs(
+                worker_count,
+                props.zfs_throughput_per_worker,
+                props.zfs_iops_per_worker,
+                props.zfs_capacity_per_worker,
+                storage_capacity=props.zfs_storage_capacity,
+                throughput_capacity=props.zfs_throughput_capacity,
+                iops=props.zfs_iops
+            )
+            required_throughput = worker_count * props.zfs_throughput_per_worker
+            if sizing.throughput_capacity < required_throughput:
+                cdk.Annotations.of(self).add_warning(
+                    f"FSx ZFS throughput of {sizing.throughput_capacity} MB/s is below the "
+                    f"{required_throughput} MB/s needed for {worker_count} workers")
+            self.deploy_zfs(sizing, [self.vpc.vpc_cidr_block, *(props.burst_client_cidrs or {}).values()],
+                            props.zfs_subnet_ids)
 
         if props.enable_efs:
-            self.deploy_efs()
+            self.deploy_efs(
+                props.efs_throughput_mode,
+                props.efs_provisioned_throughput,
+                props.efs_performance_mode
+            )
+
+        # Mounts for render workers, filled in as file systems are selected
+        self.worker_mounts = []
+
+        self.set_production_mount(props.production_storage)
+
+        if props.enable_fsx_lustre:
+            self.deploy_lustre(
+                props.lustre_deployment_type,
+                props.lustre_storage_capacity,
+                props.lustre_throughput_per_tib,
+                props.lustre_s3_bucket_name
+            )
+
+        if props.enable_asset_bucket:
+            self.deploy_asset_bucket(props.asset_bucket_name)
+
+        for region, cidr in (props.burst_client_cidrs or {}).items():
+            self.allow_clients_from(cidr, f"Burst region {region} workers")
+
+    def deploy_zfs(self, sizing: ZfsSizing, client_cidrs: List[str], subnet_ids: Optional[List[str]] = None):
+        # File systems deployed before storage_placement keep the two random subnets they were
+        # created in, changing them replaces the file system
+        if subnet_ids is None:
+            subnet_ids = [subnet.subnet_id for subnet in self.storage_subnets[:2]]
+        elif len(subnet_ids) != 2:
+            raise ValueError("zfs_subnet_ids must list the preferred and the standby subnet of the file system")
 
-    def deploy_zfs(self):
         # FSx ZFS File System
         self.fsx_zfs = fsx.CfnFileSystem(
             self,
             "ZfsFileSystem",
             file_system_type="OPENZFS",
-            subnet_ids=get_random_subnet_ids(self.vpc, 2),
-            storage_capacity=128,
+            subnet_ids=subnet_ids,
+            storage_capacity=sizing.storage_capacity,
             open_zfs_configuration=fsx.CfnFileSystem.OpenZFSConfigurationProperty(
                 deployment_type="MULTI_AZ_1",
-                throughput_capacity=160,  # MB/s
-                preferred_subnet_id=self.vpc.private_subnets[0].subnet_id,
+                throughput_capacity=sizing.throughput_capacity,  # MB/s
+                disk_iops_configuration=fsx.CfnFileSystem.DiskIopsConfigurationProperty(
+                    mode="USER_PROVISIONED",
+                    iops=sizing.iops
+                ),
+                preferred_subnet_id=subnet_ids[0],
                 root_volume_configuration=fsx.CfnFileSystem.RootVolumeConfigurationProperty(
                     nfs_exports=[
                         fsx.CfnFileSystem.NfsExportsProperty(
+                            # The root volume is only exported to these networks
                             client_configurations=[
                                 fsx.CfnFileSystem.ClientConfigurationsProperty(
-                                    clients=self.vpc.vpc_cidr_block,
+                                    clients=cidr,
                                     options=["rw", "no_root_squash"]
                                 )
+                                for cidr in client_cidrs
                             ]
                         )
                     ]
@@ -123,7 +296,225 @@ class StorageStack(Stack):
             description="FSx ZFS DNS Name for mounting"
         )
 
-    def deploy_efs(self):
+        CfnOutput(
+            self,
+            "FsxSizing",
+            value=(
+                f"{sizing.throughput_capacity} MB/s, {sizing.iops} IOPS, {sizing.storage_capacity} GiB "
+                f"for up to {sizing.worker_count} workers"
+            ),
+            description="FSx ZFS throughput, IOPS and capacity chosen for the configured fleet size"
+        )
+
+    def set_production_mount(self, production_storage: str):
+        """
+        Selects the file system workers mount as /mnt/production and exposes its mount source
+        """
+        if production_storage == 'efs' and hasattr(self, 'efs_file_system_id'):
+            production_mount = WorkerMount(
+                source=f'{self.efs_file_system_id}.efs.{self.region}.{self.url_suffix}:/',
+                path=PRODUCTION_MOUNT_PATH,
+                fs_type='nfs',
+                options=EFS_MOUNT_OPTIONS,
+                max_nconnect=EFS_MAX_NCONNECT,
+                read_ahead_kb=EFS_READ_AHEAD_KB,
+                fs_cache=True,
+                efs_file_system_id=self.efs_file_system_id
+            )
+        elif production_storage == 'zfs' and hasattr(self, 'fsx_dns_name'):
+            production_mount = WorkerMount(
+                source=f'{self.fsx_dns_name}:/fsx',
+                path=PRODUCTION_MOUNT_PATH,
+                fs_type='nfs',
+                options=ZFS_MOUNT_OPTIONS,
+                max_nconnect=ZFS_MAX_NCONNECT,
+                read_ahead_kb=ZFS_READ_AHEAD_KB,
+                fs_cache=True
+            )
+        else:
+            raise ValueError(
+                f"Production storage '{production_storage}' is not deployed, enable it in the storage settings")
+
+        self.worker_mounts.append(production_mount)
+        mount_source = production_mount.source
+
+        CfnOutput(
+            self,
+            "ProductionMountSource",
+            value=mount_source,
+            description=f"NFS mount source for {PRODUCTION_MOUNT_PATH} on render workers"
+        )
+
+    def allow_clients_from(self, cidr: str, description: str):
+        """
+        Allows NFS, and Lustre when deployed, from clients in another network such as a peered VPC
+        """
+        ports = [ec2.Port.tcp(2049), ec2.Port.tcp(111), ec2.Port.tcp_range(20001, 20003)]
+        if hasattr(self, 'fsx_lustre'):
+            lustre_ports = [ec2.Port.tcp(988), ec2.Port.tcp_range(1018, 1023)]
+            ports += lustre_ports
+            # Lustre file servers also connect to their clients
+            for port in lustre_ports:
+                self.nfs_sg.add_egress_rule(peer=ec2.Peer.ipv4(cidr), connection=port, description=description)
+        for port in ports:
+            self.nfs_sg.add_ingress_rule(peer=ec2.Peer.ipv4(cidr), connection=port, description=description)
+
+    def deploy_lustre(self, deployment_type: str, storage_capacity: int,
+                      throughput_per_tib: Optional[int], s3_bucket_name: Optional[str]):
+        """
+        Deploys an FSx for Lustre file system as a high-throughput read path for render assets,
+        optionally linked to an S3 bucket
+        """
+        validate_lustre_settings(deployment_type, storage_capacity, throughput_per_tib)
+
+        # Lustre uses its own ports between clients and file servers
+        self.nfs_sg.add_ingress_rule(
+            peer=ec2.Peer.ipv4(self.vpc.vpc_cidr_block),
+            connection=ec2.Port.tcp(988),
+            description="FSx Lustre"
+        )
+        self.nfs_sg.add_ingress_rule(
+            peer=ec2.Peer.ipv4(self.vpc.vpc_cidr_block),
+            connection=ec2.Port.tcp_range(1018, 1023),
+            description="FSx Lustre auxiliary ports"
+        )
+        self.nfs_sg.add_ingress_rule(
+            peer=self.nfs_sg,
+            connection=ec2.Port.tcp(988),
+            description="FSx Lustre file server traffic"
+        )
+        self.nfs_sg.add_ingress_rule(
+            peer=self.nfs_sg,
+            connection=ec2.Port.tcp_range(1018, 1023),
+            description="FSx Lustre file server auxiliary traffic"
+        )
+        # The file servers also connect to each other, the group allows no other egress. Rules to
+        # the group itself would be separate resources, which leaves EC2's default allow-all egress
+        # in place, the file servers are within the VPC CIDR.
+        self.nfs_sg.add_egress_rule(
+            peer=ec2.Peer.ipv4(self.vpc.vpc_cidr_block),
+            connection=ec2.Port.tcp(988),
+            description="FSx Lustre file server traffic"
+        )
+        self.nfs_sg.add_egress_rule(
+            peer=ec2.Peer.ipv4(self.vpc.vpc_cidr_block),
+            connection=ec2.Port.tcp_range(1018, 1023),
+            description="FSx Lustre file server auxiliary traffic"
+        )
+
+        is_persistent_2 = deployment_type == 'PERSISTENT_2'
+
+        # PERSISTENT_2 links to S3 through a data repository association,
+        # the older deployment types use import/export paths on the file system
+        lustre_configuration = fsx.CfnFileSystem.LustreConfigurationProperty(
+            deployment_type=deployment_type,
+            per_unit_storage_throughput=throughput_per_tib,
+            data_compression_type="LZ4",
+            import_path=f"s3://{s3_bucket_name}" if s3_bucket_name and not is_persistent_2 else None,
+            export_path=f"s3://{s3_bucket_name}" if s3_bucket_name and not is_persistent_2 else None,
+            auto_import_policy="NEW_CHANGED_DELETED" if s3_bucket_name and not is_persistent_2 else None
+        )
+
+        self.fsx_lustre = fsx.CfnFileSystem(
+            self,
+            "LustreFileSystem",
+            file_system_type="LUSTRE",
+            file_system_type_version="2.15" if is_persistent_2 else None,
+            subnet_ids=[self.storage_subnets[0].subnet_id],
+            storage_capacity=storage_capacity,
+            lustre_configuration=lustre_configuration,
+            security_group_ids=[self.nfs_sg.security_group_id]
+        )
+
+        if s3_bucket_name and is_persistent_2:
+            fsx.CfnDataRepositoryAssociation(
+                self,
+                "LustreDataRepositoryAssociation",
+                file_system_id=self.fsx_lustre.ref,
+                file_system_path="/",
+                data_repository_path=f"s3://{s3_bucket_name}",
+                batch_import_meta_data_on_create=True,
+                s3=fsx.CfnDataRepositoryAssociation.S3Property(
+                    auto_import_policy=fsx.CfnDataRepositoryAssociation.AutoImportPolicyProperty(
+                        events=["NEW", "CHANGED", "DELETED"]
+                    ),
+                    auto_export_policy=fsx.CfnDataRepositoryAssociation.AutoExportPolicyProperty(
+                        events=["NEW", "CHANGED", "DELETED"]
+                    )
+                )
+            )
+
+        # Public properties for cross-stack reference
+        self.lustre_file_system_id = self.fsx_lustre.ref
+        self.lustre_dns_name = self.fsx_lustre.attr_dns_name
+        self.lustre_mount_name = self.fsx_lustre.attr_lustre_mount_name
+
+        self.worker_mounts.append(WorkerMount(
+            source=f'{self.lustre_dns_name}@tcp:/{self.lustre_mount_name}',
+            path=LUSTRE_MOUNT_PATH,
+            fs_type='lustre',
+            options=LUSTRE_MOUNT_OPTIONS
+        ))
+
+        # Output Lustre connection details
+        CfnOutput(
+            self,
+            "LustreFileSystemId",
+            value=self.lustre_file_system_id,
+            description="FSx Lustre File System ID"
+        )
+
+        CfnOutput(
+            self,
+            "LustreMountSource",
+            value=f'{self.lustre_dns_name}@tcp:/{self.lustre_mount_name}',
+            description=f"FSx Lustre mount source for {LUSTRE_MOUNT_PATH} on render workers"
+        )
+
+    def deploy_asset_bucket(self, bucket_name: Optional[str]):
+        """
+        Creates the S3 bucket of the read-mostly asset library (HDRIs, textures, add-ons),
+        mounted read-only on workers with Mountpoint for S3 so its reads stay off the NFS tier
+        """
+        self.asset_bucket = s3.Bucket(
+            self,
+            "AssetBucket",
+            bucket_name=bucket_name,
+            block_public_access=s3.BlockPublicAccess.BLOCK_ALL,
+            encryption=s3.BucketEncryption.S3_MANAGED,
+            enforce_ssl=True,
+            versioned=True,
+            removal_policy=cdk.RemovalPolicy.RETAIN
+        )
+
+        self.worker_mounts.append(WorkerMount(
+            source=f's3://{self.asset_bucket.bucket_name}/',
+            path=ASSET_MOUNT_PATH,
+            fs_type='mount-s3',
+            options=f'{ASSET_MOUNT_OPTIONS},region={self.region},metadata-ttl={ASSET_METADATA_TTL}',
+            s3_bucket_arn=self.asset_bucket.bucket_arn
+        ))
+
+        CfnOutput(
+            self,
+            "AssetBucketName",
+            value=self.asset_bucket.bucket_name,
+            description=f"S3 bucket of the asset library, mounted read-only at {ASSET_MOUNT_PATH} on render workers"
+        )
+
+    def deploy_efs(self, throughput_mode: str, provisioned_throughput: Optional[int], performance_mode: str):
+        if throughput_mode not in EFS_THROUGHPUT_MODES:
+            raise ValueError(
+                f"Unknown EFS throughput mode '{throughput_mode}', expected one of {', '.join(EFS_THROUGHPUT_MODES)}")
+        if performance_mode not in EFS_PERFORMANCE_MODES:
+            raise ValueError(
+                f"Unknown EFS performance mode '{performance_mode}', "
+                f"expected one of {', '.join(EFS_PERFORMANCE_MODES)}")
+        if (throughput_mode == 'provisioned') != (provisioned_throughput is not None):
+            raise ValueError("efs_provisioned_throughput must be set only for the provisioned throughput mode")
+        if throughput_mode == 'elastic' and performance_mode == 'max_io':
+            raise ValueError("Elastic throughput requires the general_purpose EFS performance mode")
+
         # EFS File System
         self.efs_filesystem = efs.FileSystem(
             self,
@@ -133,7 +524,11 @@ class StorageStack(Stack):
                 subnet_type=ec2.SubnetType.PRIVATE_WITH_EGRESS
             ),
             security_group=self.nfs_sg,
-            enable_automatic_backups=False
+            enable_automatic_backups=False,
+            throughput_mode=EFS_THROUGHPUT_MODES[throughput_mode],
+            provisioned_throughput_per_second=(
+                cdk.Size.mebibytes(provisioned_throughput) if provisioned_throughput else None),
+            performance_mode=EFS_PERFORMANCE_MODES[performance_mode]
         )
 
         # Public properties for cross-stack reference
@@ -148,5 +543,114 @@ class StorageStack(Stack):
         )
 
 
-def get_random_subnet_ids(vpc: ec2.IVpc, count: int = 2) -> list[str]:
-    return [subnet.subnet_id for subnet in random.sample(vpc.private_subnets, min(count, len(vpc.private_subnets)))]
+def size_zfs(worker_count: int,
+             throughput_per_worker: int,
+             iops_per_worker: int,
+             capacity_per_worker: int,
+             storage_capacity: Optional[int] = None,
+             throughput_capacity: Optional[int] = None,
+             iops: Optional[int] = None) -> ZfsSizing:
+    """
+    Sizes an OpenZFS file system for the number of workers that can run at once.
+    Per-worker budgets are rounded up to valid FSx values, explicit values override the model.
+    """
+    if storage_capacity is None:
+        storage_capacity = max(ZFS_MIN_STORAGE_CAPACITY * 2, worker_count * capacity_per_worker)
+        # Round up to a multiple of 64 GiB
+        storage_capacity = -(-storage_capacity // ZFS_MIN_STORAGE_CAPACITY) * ZFS_MIN_STORAGE_CAPACITY
+    if not ZFS_MIN_STORAGE_CAPACITY <= storage_capacity <= ZFS_MAX_STORAGE_CAPACITY:
+        raise ValueError(
+            f"zfs_storage_capacity must be between {ZFS_MIN_STORAGE_CAPACITY} and {ZFS_MAX_STORAGE_CAPACITY} GiB")
+
+    if throughput_capacity is None:
+        required = worker_count * throughput_per_worker
+        throughput_capacity = next(
+            (tier for tier in ZFS_THROUGHPUT_TIERS if tier >= required), ZFS_THROUGHPUT_TIERS[-1])
+    if throughput_capacity not in ZFS_THROUGHPUT_TIERS:
+        raise ValueError(f"zfs_throughput_capacity must be one of {ZFS_THROUGHPUT_TIERS}")
+
+    included_iops = storage_capacity * ZFS_IOPS_PER_GIB
+    if iops is None:
+        iops = min(max(included_iops, worker_count * iops_per_worker), ZFS_MAX_IOPS)
+    if not included_iops <= iops <= ZFS_MAX_IOPS:
+        raise ValueError(f"zfs_iops must be between {included_iops} and {ZFS_MAX_IOPS}")
+
+    return ZfsSizing(
+        worker_count=worker_count,
+        storage_capacity=storage_capacity,
+        throughput_capacity=throughput_capacity,
+        iops=iops
+    )
+
+
+def validate_lustre_settings(deployment_type: str, storage_capacity: int, throughput_per_tib: Optional[int]) -> None:
+    """
+    Raises ValueError if the Lustre settings are not a valid FSx for Lustre configuration
+    """
+    if deployment_type == 'SCRATCH_2':
+        if throughput_per_tib is not None:
+            raise ValueError("SCRATCH_2 Lustre file systems have fixed throughput, unset lustre_throughput_per_tib")
+    elif deployment_type in LUSTRE_THROUGHPUT_PER_TIB:
+        if throughput_per_tib not in LUSTRE_THROUGHPUT_PER_TIB[deployment_type]:
+            raise ValueError(
+                f"lustre_throughput_per_tib must be one of {LUSTRE_THROUGHPUT_PER_TIB[deployment_type]} "
+                f"for {deployment_type}")
+    else:
+        raise ValueError(
+            f"Unknown Lustre deployment type '{deployment_type}', "
+            f"expected one of SCRATCH_2, {', '.join(LUSTRE_THROUGHPUT_PER_TIB)}")
+
+    if storage_capacity not in (1200, 2400) and storage_capacity % 2400 != 0:
+        raise ValueError("lustre_storage_capacity must be 1200, 2400 or a multiple of 2400 GiB")
+
+
+def get_az_worker_counts(fleets: List[dict], availability_zones: List[str]) -> Dict[str, float]:
+    """
+    Returns the number of workers the fleets can run in each AZ. Fleets without
+    availability_zones are spread evenly across all of them.
+    """
+    counts = {az: 0.0 for az in availability_zones}
+    for fleet in fleets:
+        fleet_azs = fleet.get('availability_zones') or availability_zones
+        unknown_azs = [az for az in fleet_azs if az not in counts]
+        if unknown_azs:
+            raise ValueError(
+                f"Fleet '{fleet['name']}' availability zones {', '.join(unknown_azs)} have no private subnet, "
+                f"expected any of {', '.join(availability_zones)}")
+        for az in fleet_azs:
+            counts[az] += get_fleet_max_instances(fleet) / len(fleet_azs)
+    return counts
+
+
+def get_storage_subnets(vpc: ec2.IVpc, placement: str, fleets: List[dict]) -> List[ec2.ISubnet]:
+    """
+    Returns the private subnets of vpc in the order storage is placed in them, the same on every synth.
+    'fleet_az' puts the subnets of AZs that can run more workers first, ties keep the VPC's order.
+    """
+    if placement not in STORAGE_PLACEMENTS:
+        raise ValueError(f"Unknown storage placement '{placement}', expected one of {', '.join(STORAGE_PLACEMENTS)}")
+    subnets = list(vpc.private_subnets)
+    if placement == 'fleet_az':
+        worker_counts = get_az_worker_counts(fleets, [subnet.availability_zone for subnet in subnets])
+        subnets.sort(key=lambda subnet: -worker_counts[subnet.availability_zone])
+    return subnets
+
+
+def worker_mount_read_statements(mounts: List[WorkerMount]) -> List[iam.PolicyStatement]:
+    """
+    Returns the statements that let workers read the S3 buckets in mounts, Mountpoint
+    only needs to list a read-only bucket and get its objects
+    """
+    bucket_arns = [mount.s3_bucket_arn for mount in mounts if mount.s3_bucket_arn]
+    if not bucket_arns:
+        return []
+    return [
+        iam.PolicyStatement(
+            actions=['s3:ListBucket'],
+            resources=bucket_arns
+        ),
+        iam.PolicyStatement(
+            actions=['s3:GetObject'],
+            resources=[f'{arn}/*' for arn in bucket_arns]
+        ),
+    ]
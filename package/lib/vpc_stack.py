@@ -1,22 +1,53 @@
 import aws_cdk as cdk
+from dataclasses import dataclass, field
 from aws_cdk import (
     Stack,
     aws_ec2 as ec2,
 )
 from constructs import Construct
+from typing import List, Mapping, Optional
+
+
+# 'single' puts one NAT gateway in the first AZ, 'per_az' gives every AZ its own so
+# private subnets never send internet traffic across AZs
+NAT_GATEWAY_MODES = ('single', 'per_az')
+
+# Interface endpoints by config name, 's3' is a gateway endpoint. ECR image layers
+# are pulled from S3, so 'ecr' should be used together with 's3'.
+INTERFACE_ENDPOINT_SERVICES: Mapping[str, List[ec2.InterfaceVpcEndpointAwsService]] = {
+    'ecr': [ec2.InterfaceVpcEndpointAwsService.ECR, ec2.InterfaceVpcEndpointAwsService.ECR_DOCKER],
+    'secrets_manager': [ec2.InterfaceVpcEndpointAwsService.SECRETS_MANAGER],
+    # Session Manager needs the ssmmessages and ec2messages endpoints as well
+    'ssm': [
+        ec2.InterfaceVpcEndpointAwsService.SSM,
+        ec2.InterfaceVpcEndpointAwsService.SSM_MESSAGES,
+        ec2.InterfaceVpcEndpointAwsService.EC2_MESSAGES,
+    ],
+    'logs': [ec2.InterfaceVpcEndpointAwsService.CLOUDWATCH_LOGS],
+    'ec2': [ec2.InterfaceVpcEndpointAwsService.EC2],
+}
+VPC_ENDPOINTS = ('s3', *INTERFACE_ENDPOINT_SERVICES)
+
+
+@dataclass
+class VpcStackProps(cdk.StackProps):
+    nat_gateway_mode: str = 'single'
+    vpc_endpoints: List[str] = field(default_factory=list)
 
 
 class VpcStack(Stack):
-    def __init__(self, scope: Construct, construct_id: str, **kwargs) -> None:
+    def __init__(self, scope: Construct, construct_id: str, props: Optional[VpcStackProps] = None, **kwargs) -> None:
         super().__init__(scope, construct_id, **kwargs)
 
+        props = props or VpcStackProps()
+
         # Use standard VPC construct - it handles AZ discovery automatically
         self.vpc = ec2.Vpc(
             self,
             "Render-Farm-VPC",
             ip_addresses=ec2.IpAddresses.cidr("10.0.0.0/16"),
             max_azs=99,  # Use all available AZs
-            nat_gateways=1,  # Only 1 NAT gateway for cost efficiency
+            nat_gateways=get_nat_gateway_count(props.nat_gateway_mode),
             subnet_configuration=[
                 # Private subnets in all AZs
                 ec2.SubnetConfiguration(
@@ -33,6 +64,8 @@ class VpcStack(Stack):
             ],
         )
 
+        add_vpc_endpoints(self.vpc, props.vpc_endpoints)
+
         # Export the VPC ID as a stack output
         self.vpc_id_output = cdk.CfnOutput(
             self,
@@ -44,4 +77,59 @@ class VpcStack(Stack):
 
     @property
     def vpc_id(self) -> str:
-        return self.vpc_id_output.value
\ No newline at end of file
+        return self.vpc_id_output.value
+
+
+@dataclass
+class VpcEndpointsStackProps(cdk.StackProps):
+    vpc_id: str = None
+    vpc_endpoints: List[str] = field(default_factory=list)
+
+
+class VpcEndpointsStack(Stack):
+    """
+    VPC endpoints for an imported VPC (vpc_id in the config), the VPC's NAT gateways are left as they are
+    """
+    def __init__(self, scope: Construct, construct_id: str, props: VpcEndpointsStackProps, **kwargs) -> None:
+        super().__init__(scope, construct_id, **kwargs)
+
+        vpc = ec2.Vpc.from_lookup(
+            self, 'Endpoints-VPC',
+            vpc_id=props.vpc_id
+        )
+        add_vpc_endpoints(vpc, props.vpc_endpoints)
+
+
+def get_nat_gateway_count(mode: str) -> Optional[int]:
+    """
+    Returns the nat_gateways value of a Vpc for a NAT gateway mode, None means one per AZ
+    """
+    if mode not in NAT_GATEWAY_MODES:
+        raise ValueError(f"Unknown NAT gateway mode '{mode}', expected one of {', '.join(NAT_GATEWAY_MODES)}")
+    return 1 if mode == 'single' else None
+
+
+def add_vpc_endpoints(vpc: ec2.IVpc, endpoints: List[str]) -> None:
+    """
+    Adds the named endpoints to the private subnets of vpc. Interface endpoints get one network
+    interface per AZ and private DNS, so clients reach the services without code changes.
+    """
+    unknown_endpoints = [name for name in endpoints if name not in VPC_ENDPOINTS]
+    if unknown_endpoints:
+        raise ValueError(
+            f"Unknown VPC endpoints {', '.join(unknown_endpoints)}, expected any of {', '.join(VPC_ENDPOINTS)}")
+
+    private_subnets = ec2.SubnetSelection(subnet_type=ec2.SubnetType.PRIVATE_WITH_EGRESS)
+    if 's3' in endpoints:
+        vpc.add_gateway_endpoint('S3Endpoint',
+            service=ec2.GatewayVpcEndpointAwsService.S3,
+            subnets=[private_subnets]
+        )
+    for name in endpoints:
+        for service in INTERFACE_ENDPOINT_SERVICES.get(name, []):
+            # The endpoint security group allows HTTPS from the VPC CIDR
+            vpc.add_interface_endpoint(f'{service.short_name.title().replace(".", "")}Endpoint',
+                service=service,
+                subnets=ec2.SubnetSelection(subnet_type=ec2.SubnetType.PRIVATE_WITH_EGRESS, one_per_az=True),
+                private_dns_enabled=True
+            )
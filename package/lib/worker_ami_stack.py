@@ -0,0 +1,248 @@
+import hashlib
+import json
+import aws_cdk as cdk
+from dataclasses import dataclass
+from aws_cdk import (
+    Stack,
+    CfnOutput,
+    aws_ec2 as ec2,
+    aws_iam as iam,
+    aws_imagebuilder as imagebuilder,
+)
+from constructs import Construct
+from aws_rfdk import deadline
+from typing import Callable, List, Mapping, Optional, Tuple
+from .worker_user_data import nvidia_driver_install_commands, nvidia_driver_read_statement
+
+
+# Image Builder managed Amazon Linux 2023 image used as the base of every worker AMI. Its glibc
+# (2.34) runs current render application builds, Blender 4.x needs at least 2.28.
+DEFAULT_PARENT_IMAGE = 'arn:{partition}:imagebuilder:{region}:aws:image/amazon-linux-2023-x86/x.x.x'
+
+
+def content_digest(content: object) -> str:
+    """
+    Returns a short digest of JSON serializable content, used to name immutable Image Builder resources
+    """
+    return hashlib.sha256(json.dumps(content, sort_keys=True).encode()).hexdigest()[:8]
+
+
+def blender_install_commands(version: str) -> List[str]:
+    """
+    Returns the commands that install a Blender release under /opt/blender
+    """
+    major_minor = '.'.join(version.split('.')[:2])
+    archive = f'blender-{version}-linux-x64'
+    return [
+        'dnf install -y libXi libXxf86vm libXfixes libXrender libSM libxkbcommon libglvnd-glx xz',
+        f'curl -fsSL -o /tmp/{archive}.tar.xz https://download.blender.org/release/Blender{major_minor}/{archive}.tar.xz',
+        f'tar -xf /tmp/{archive}.tar.xz -C /opt',
+        f'ln -sfn /opt/{archive} /opt/blender',
+        'ln -sfn /opt/blender/blender /usr/local/bin/blender',
+        f'rm -f /tmp/{archive}.tar.xz',
+    ]
+
+
+def blender_validate_commands(version: str) -> List[str]:
+    """
+    Returns the commands that fail the image build when the installed Blender does not start
+    """
+    return [f'blender --version | grep "^Blender {version}"']
+
+
+# Render applications that can be baked into a worker AMI, keyed by name, as
+# (install commands, validate commands)
+RENDER_APP_INSTALLERS: Mapping[str, Tuple[Callable[[str], List[str]], Callable[[str], List[str]]]] = {
+    'blender': (blender_install_commands, blender_validate_commands),
+}
+
+
+@dataclass
+class WorkerAmiStackProps(cdk.StackProps):
+    vpc: Optional[ec2.IVpc] = None
+    vpc_id: Optional[str] = None
+    deadline_version: str = None
+    spot_fleet_configs: dict = None
+    ami_version: str = '1.0.0'
+    parent_image: Optional[str] = None
+    build_instance_types: list = None
+
+
+class WorkerAmiStack(Stack):
+    """
+    Bakes the Deadline client, storage tooling and each fleet's render application
+    into a versioned worker AMI with EC2 Image Builder.
+
+    The resulting AMI IDs are exposed in image_ids, keyed by fleet name.
+    """
+    def __init__(self, scope: Construct, construct_id: str, props: WorkerAmiStackProps, **kwargs) -> None:
+        super().__init__(scope, construct_id, **kwargs)
+
+        # Use VPC object directly if provided, otherwise lookup by ID
+        if props.vpc:
+            vpc = props.vpc
+        else:
+            vpc = ec2.Vpc.from_lookup(
+                self, 'WorkerAmi-VPC',
+                vpc_id=props.vpc_id
+            )
+
+        version = deadline.VersionQuery(self, 'Version',
+            version=props.deadline_version,
+        )
+        client_installer = version.linux_installers.client
+
+        # Role and instance profile used by the Image Builder build instances
+        build_role = iam.Role(self, 'WorkerAmiBuildRole',
+            assumed_by=iam.ServicePrincipal('ec2.amazonaws.com'),
+            managed_policies=[
+                iam.ManagedPolicy.from_aws_managed_policy_name('EC2InstanceProfileForImageBuilder'),
+                iam.ManagedPolicy.from_aws_managed_policy_name('AmazonSSMManagedInstanceCore'),
+            ],
+        )
+        client_installer.s3_bucket.grant_read(build_role, client_installer.object_key)
+
+        instance_profile = iam.CfnInstanceProfile(self, 'WorkerAmiBuildInstanceProfile',
+            roles=[build_role.role_name]
+        )
+
+        build_sg = ec2.SecurityGroup(self, 'WorkerAmiBuildSG',
+            vpc=vpc,
+            description='Image Builder worker AMI build instances',
+            allow_all_outbound=True
+        )
+
+        infrastructure = imagebuilder.CfnInfrastructureConfiguration(self, 'WorkerAmiInfrastructure',
+            name=f'{construct_id}-infrastructure',
+            instance_profile_name=instance_profile.ref,
+            instance_types=props.build_instance_types or ['c5.xlarge'],
+            subnet_id=vpc.private_subnets[0].subnet_id,
+            security_group_ids=[build_sg.security_group_id],
+            terminate_instance_on_failure=True
+        )
+
+        # The installer's object key is only known at deploy time, the version in the
+        # description renames the component when it changes
+        deadline_client = self.create_component('DeadlineClient', props.ami_version,
+            f'Installs the Deadline client {props.deadline_version} and launcher service', [
+                f'aws s3 cp s3://{client_installer.s3_bucket.bucket_name}/{client_installer.object_key} '
+                '/tmp/deadline-client-installer.run',
+                'chmod +x /tmp/deadline-client-installer.run',
+                '/tmp/deadline-client-installer.run --mode unattended --prefix /opt/Thinkbox/Deadline10 '
+                '--connectiontype Remote --noguimode true --slavestartup false '
+                '--launcherdaemon true --daemonuser root',
+                'rm -f /tmp/deadline-client-installer.run',
+            ], validate_commands=[
+                'test -x /opt/Thinkbox/Deadline10/bin/deadlineworker',
+            ])
+
+        storage_tools = self.create_component('StorageTools', props.ami_version,
+            'Installs NFS and local cache tooling', [
+                'dnf install -y nfs-utils cachefilesd mdadm lustre-client',
+            ])
+
+        parent_image = props.parent_image or DEFAULT_PARENT_IMAGE.format(
+            partition=self.partition, region=self.region)
+
+        nvidia_driver = None
+        if any(fleet.get('gpu_workers') for fleet in props.spot_fleet_configs.values() if fleet['is_linux']):
+            build_role.add_to_policy(nvidia_driver_read_statement(self.partition))
+            nvidia_driver = self.create_component('NvidiaDriver', props.ami_version,
+                'Installs the NVIDIA GRID driver', nvidia_driver_install_commands())
+
+        self.image_ids = {}
+        render_app_components = {}
+
+        for fleet in props.spot_fleet_configs.values():
+            if not fleet['is_linux']:
+                continue
+
+            components = [deadline_client, storage_tools]
+            if fleet.get('gpu_workers'):
+                components.append(nvidia_driver)
+            render_app = fleet.get('render_app')
+            if render_app:
+                if render_app['name'] not in RENDER_APP_INSTALLERS:
+                    raise ValueError(
+                        f"Fleet '{fleet['name']}' uses render app '{render_app['name']}' which has no installer, "
+                        f"expected one of {', '.join(RENDER_APP_INSTALLERS)}")
+                app_key = f"{render_app['name']}-{render_app['version']}"
+                if app_key not in render_app_components:
+                    install_commands, validate_commands = RENDER_APP_INSTALLERS[render_app['name']]
+                    render_app_components[app_key] = self.create_component(
+                        f"{render_app['name'].capitalize()}{render_app['version'].replace('.', '')}",
+                        props.ami_version,
+                        f"Installs {render_app['name']} {render_app['version']}",
+                        install_commands(render_app['version']),
+                        validate_commands=validate_commands(render_app['version'])
+                    )
+                components.append(render_app_components[app_key])
+
+            recipe_content = [parent_image, [component.name for component in components]]
+            recipe = imagebuilder.CfnImageRecipe(self, f'{fleet["name"]}WorkerRecipe',
+                name=f'{construct_id}-{fleet["name"]}-{content_digest(self.resolve(recipe_content))}',
+                version=props.ami_version,
+                parent_image=parent_image,
+                components=[
+                    imagebuilder.CfnImageRecipe.ComponentConfigurationProperty(component_arn=component.attr_arn)
+                    for component in components
+                ]
+            )
+
+            image = imagebuilder.CfnImage(self, f'{fleet["name"]}WorkerImage',
+                image_recipe_arn=recipe.attr_arn,
+                infrastructure_configuration_arn=infrastructure.attr_arn,
+                tags={
+                    'fleet': fleet['name'],
+                    'deadline_version': props.deadline_version,
+                }
+            )
+
+            self.image_ids[fleet['name']] = image.attr_image_id
+
+            CfnOutput(
+                self,
+                f'{fleet["name"]}WorkerAmiId',
+                value=image.attr_image_id,
+                description=f'Worker AMI ID for the {fleet["name"]} fleet'
+            )
+
+    def create_component(self, name: str, version: str, description: str, commands: List[str],
+                         validate_commands: Optional[List[str]] = None) -> imagebuilder.CfnComponent:
+        """
+        Creates a Linux Image Builder component that runs commands in its build phase and
+        validate_commands in its validate phase, which fails the image build when they fail.
+        Components are immutable, so the name ends in a digest of the document and a changed
+        component is created alongside the old one rather than updated under the same version.
+        """
+        phases = [{
+            'name': 'build',
+            'steps': [{
+                'name': name,
+                'action': 'ExecuteBash',
+                'inputs': {'commands': ['set -euo pipefail'] + commands},
+            }],
+        }]
+        if validate_commands:
+            phases.append({
+                'name': 'validate',
+                'steps': [{
+                    'name': f'{name}Validate',
+                    'action': 'ExecuteBash',
+                    'inputs': {'commands': ['set -euo pipefail'] + validate_commands},
+                }],
+            })
+        document = {
+            'name': name,
+            'description': description,
+            'schemaVersion': 1.0,
+            'phases': phases,
+        }
+        return imagebuilder.CfnComponent(self, f'{name}Component',
+            name=f'{self.stack_name}-{name}-{content_digest(self.resolve(document))}',
+            version=version,
+            platform='Linux',
+            description=description,
+            # JSON is valid YAML, tokens in the commands are resolved by CloudFormation
+            data=json.dumps(document, indent=2)
+        )
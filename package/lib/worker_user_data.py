@@ -0,0 +1,576 @@
+import os
+from typing import List, Mapping, Optional
+from aws_cdk import Stack, aws_iam as iam
+from constructs import Construct
+from aws_rfdk.deadline import IHost, IRepository, InstanceUserDataProvider
+from .storage_stack import WorkerMount
+
+
+DEADLINE_INI_PATH = '/var/lib/Thinkbox/Deadline10/deadline.ini'
+
+# Each Deadline worker instance on a host has an ini file here, RFDK assigns groups and pools to all of them
+WORKER_INSTANCES_DIR = '/var/lib/Thinkbox/Deadline10/slaves'
+
+# Instance store NVMe is assembled (as RAID0 when there are several disks) and mounted here
+LOCAL_STORAGE_PATH = '/mnt/local'
+# Local scratch space for render jobs, on the root volume when the instance has no instance store
+LOCAL_SCRATCH_PATH = f'{LOCAL_STORAGE_PATH}/scratch'
+FS_CACHE_PATH = f'{LOCAL_STORAGE_PATH}/fscache'
+# Data cache of S3 buckets mounted with Mountpoint for S3
+MOUNTPOINT_CACHE_PATH = f'{LOCAL_STORAGE_PATH}/s3cache'
+MOUNTPOINT_RPM_URL = 'https://s3.amazonaws.com/mountpoint-s3-release/latest/$(uname -m)/mount-s3.rpm'
+
+# How workers connect to Deadline, 'direct' connects them to the Repository instead of the Render Queue
+REPOSITORY_CONNECTIONS = ('render_queue', 'direct')
+# The Repository file system is mounted here on directly connected workers
+REPOSITORY_MOUNT_PATH = '/mnt/repository'
+
+# Run by cloud-init on every boot of warm pool instances, see warm_pool_lifecycle_commands
+WARM_POOL_LIFECYCLE_SCRIPT = '/var/lib/cloud/scripts/per-boot/render-warm-pool-lifecycle.sh'
+
+# Seconds to wait for shared file systems before failing the boot
+MOUNT_TIMEOUT = 120
+
+# 'per_gpu' runs one worker per GPU pinned to it, 'shared' runs one worker pinned to every GPU
+GPU_WORKER_MODES = ('per_gpu', 'shared')
+
+# Per fleet rule for the number of Deadline workers on each instance, see worker_instance_commands
+WORKER_POLICY_MODES = ('workers', 'tasks')
+WORKER_POLICY_KEYS = ('mode', 'vcpus_per_worker', 'memory_per_worker_gib', 'max_workers')
+
+# Deadline limits a worker to 16 concurrent tasks
+MAX_CONCURRENT_TASKS = 16
+
+WORKER_SETTINGS_SCRIPT = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'scripts', 'worker_settings.py')
+
+# Boot phases are recorded here as '<phase> <seconds since boot>' and published by the boot timing script
+BOOT_PHASES_FILE = '/var/lib/render-boot/phases'
+# CloudWatch namespace of the boot phase metrics, see scripts/boot_timing.py
+BOOT_TIMING_NAMESPACE = 'RenderFarm/WorkerBoot'
+BOOT_TIMING_SCRIPT = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'scripts', 'boot_timing.py')
+
+
+def get_deadline_ini_settings(render_queue_address: str, use_traffic_encryption: bool,
+                              ca_path: Optional[str] = None) -> Mapping[str, str]:
+    """
+    Returns the deadline.ini settings a worker needs to connect to the Render Queue.
+    On RFDK hosts the Render Queue CA path and worker groups/pools are filled in later by RFDK.
+    """
+    settings = {
+        'ConnectionType': 'Remote',
+        'ProxyRoot': render_queue_address,
+        'ProxyUseSSL': str(use_traffic_encryption),
+        'ClientSSLAuthentication': 'NotRequired',
+        'LaunchSlaveAtStartup': 'True',
+        'AutoUpdateOverride': 'False',
+    }
+    if ca_path:
+        settings['ProxySSLCA'] = ca_path
+    return settings
+
+
+def write_deadline_ini_commands(settings: Mapping[str, str]) -> List[str]:
+    """
+    Returns shell commands that merge settings into deadline.ini in a single atomic write.
+    Existing keys not in settings are kept, the file is replaced with a rename.
+    """
+    keys = '|'.join(settings)
+    values = '\n'.join(f'{key}={value}' for key, value in settings.items())
+    return [
+        f"DEADLINE_INI='{DEADLINE_INI_PATH}'",
+        'DEADLINE_INI_TMP=$(mktemp "${DEADLINE_INI}.XXXXXX")',
+        f'{{ grep -v -E "^({keys})=" "$DEADLINE_INI" || true; cat <<\'EOF\'',
+        values,
+        'EOF',
+        '} > "$DEADLINE_INI_TMP"',
+        'chmod 644 "$DEADLINE_INI_TMP"',
+        'mv -f "$DEADLINE_INI_TMP" "$DEADLINE_INI"',
+    ]
+
+
+def boot_phase_command(phase: str) -> str:
+    """
+    Returns a shell command that records the time since boot at which a boot phase completed
+    """
+    return f'echo "{phase} $(cut -d " " -f 1 /proc/uptime)" >> {BOOT_PHASES_FILE}'
+
+
+def boot_timing_commands(log_group_name: str, region: str, fleet_name: str) -> List[str]:
+    """
+    Returns shell commands that start the boot timing script in the background, it publishes the
+    recorded phases and waits for the worker to register and dequeue its first task
+    """
+    with open(BOOT_TIMING_SCRIPT) as f:
+        script = f.read().rstrip('\n')
+    return [
+        "cat > /var/lib/render-boot/boot_timing.py <<'EOF'",
+        script,
+        'EOF',
+        'source /etc/profile.d/deadlineclient.sh',
+        f"DEADLINE_PATH=\"$DEADLINE_PATH\" setsid python3 /var/lib/render-boot/boot_timing.py "
+        f"--log-group '{log_group_name}' --region '{region}' --fleet '{fleet_name}' "
+        '>/var/log/render-boot-timing.log 2>&1 < /dev/null &',
+    ]
+
+
+def local_storage_commands() -> List[str]:
+    """
+    Returns shell commands that mount the instance store NVMe disks under LOCAL_STORAGE_PATH,
+    start cachefilesd on them and create the local scratch directory in the background.
+    The PID of the background job is LOCAL_STORAGE_PID. mdadm and cachefilesd are baked into
+    worker AMIs and only installed here when missing.
+    """
+    commands = [
+        "NVME_DEVICES=($(lsblk -dpno NAME,MODEL | awk '/Amazon EC2 NVMe Instance Storage/ {print $1}'))",
+        f"mkdir -p '{LOCAL_STORAGE_PATH}'",
+        'if [ "${#NVME_DEVICES[@]}" -gt 0 ]; then',
+        '  if [ "${#NVME_DEVICES[@]}" -gt 1 ]; then',
+        '    command -v mdadm >/dev/null || yum install -y mdadm',
+        '    mdadm --create /dev/md0 --run --level=0 --name=local '
+        '--raid-devices="${#NVME_DEVICES[@]}" "${NVME_DEVICES[@]}"',
+        '    LOCAL_DEVICE=/dev/md0',
+        '  else',
+        '    LOCAL_DEVICE="${NVME_DEVICES[0]}"',
+        '  fi',
+        '  mkfs.xfs -f "$LOCAL_DEVICE"',
+        f"  mount -o noatime \"$LOCAL_DEVICE\" '{LOCAL_STORAGE_PATH}'",
+        # The cache is culled by cachefilesd when the disk fills up
+        '  command -v cachefilesd >/dev/null || yum install -y cachefilesd',
+        f"  mkdir -p '{FS_CACHE_PATH}'",
+        f"  sed -i 's|^dir .*|dir {FS_CACHE_PATH}|' /etc/cachefilesd.conf",
+        '  systemctl enable --now cachefilesd',
+        'fi',
+        f"mkdir -p '{LOCAL_SCRATCH_PATH}'",
+        f"chmod 1777 '{LOCAL_SCRATCH_PATH}'",
+        f"echo 'RENDER_SCRATCH={LOCAL_SCRATCH_PATH}' >> /etc/environment",
+    ]
+    return [
+        '(',
+        *[f'  {command}' for command in commands],
+        ') &',
+        'LOCAL_STORAGE_PID=$!',
+    ]
+
+
+def wait_for_local_storage_commands() -> List[str]:
+    """
+    Returns shell commands for a background mount that wait for the local storage job, which is not
+    its child, and set FS_CACHE_OPTION to ',fsc' when the job started the FS-Cache and to '' otherwise
+    """
+    return [
+        'while [ -n "$LOCAL_STORAGE_PID" ] && kill -0 "$LOCAL_STORAGE_PID" 2>/dev/null; do sleep 0.2; done',
+        'FS_CACHE_OPTION=""',
+        '[ -n "$LOCAL_STORAGE_PID" ] && systemctl is-active --quiet cachefilesd && FS_CACHE_OPTION=",fsc"',
+    ]
+
+
+def mount_commands(mount: WorkerMount, efs_region: Optional[str] = None) -> List[str]:
+    """
+    Returns shell commands that add a shared file system to /etc/fstab and mount it in the background.
+    The PID of the background mount is appended to MOUNT_PIDS. S3 buckets are mounted with
+    Mountpoint for S3, caching object data on the local storage. Mounts cached on the local storage
+    install their client right away and wait for the local storage before mounting.
+    EFS DNS names only resolve inside their own VPC, with efs_region set (for workers in a peered
+    VPC) the name is pointed at one of the file system's mount targets in /etc/hosts instead.
+    """
+    commands = []
+    if efs_region and mount.efs_file_system_id:
+        commands.append(
+            f'grep -q "{mount.source.split(":")[0]}" /etc/hosts || '
+            f'echo "$(aws efs describe-mount-targets --region {efs_region} '
+            f'--file-system-id {mount.efs_file_system_id} --query "MountTargets[0].IpAddress" --output text) '
+            f'{mount.source.split(":")[0]}" >> /etc/hosts')
+    if mount.fs_type == 'lustre':
+        # The Lustre client is usually baked into the AMI, install it if missing
+        commands.append(
+            'command -v mount.lustre >/dev/null || '
+            'amazon-linux-extras install -y lustre || dnf install -y lustre-client')
+    options = mount.options
+    if mount.fs_type == 'mount-s3':
+        commands.append(f'command -v mount-s3 >/dev/null || yum install -y "{MOUNTPOINT_RPM_URL}"')
+    if mount.fs_cache or mount.fs_type == 'mount-s3':
+        commands += wait_for_local_storage_commands()
+    if mount.fs_type == 'mount-s3':
+        # Mountpoint evicts from its cache when the disk runs low on space
+        commands.append(f"mkdir -p '{MOUNTPOINT_CACHE_PATH}'")
+        options = f'{options},cache={MOUNTPOINT_CACHE_PATH}'
+    if mount.max_nconnect > 1:
+        # One NFS connection per 4 vCPUs, bounded by what the backend supports
+        commands.append(
+            f'NCONNECT=$(( $(nproc) / 4 )); '
+            f'NCONNECT=$(( NCONNECT < 1 ? 1 : (NCONNECT > {mount.max_nconnect} ? {mount.max_nconnect} : NCONNECT) ))')
+        options = f'{options},nconnect=$NCONNECT'
+    if mount.fs_cache:
+        options = f'{options}$FS_CACHE_OPTION'
+    commands += [
+        f"mkdir -p '{mount.path}'",
+        f"grep -q ' {mount.path} ' /etc/fstab || "
+        f'echo "{mount.source} {mount.path} {mount.fs_type} {options} 0 0" >> /etc/fstab',
+    ]
+    # Run the client install (if any) and the mount together in the background
+    return [
+        '(',
+        *[f'  {command}' for command in commands],
+        f"  timeout {MOUNT_TIMEOUT} mount '{mount.path}'",
+        *([f"  echo {mount.read_ahead_kb} > /sys/class/bdi/$(mountpoint -d '{mount.path}')/read_ahead_kb"]
+          if mount.read_ahead_kb else []),
+        ') &',
+        'MOUNT_PIDS+=($!)',
+    ]
+
+
+def wait_for_mounts_commands(mounts: List[WorkerMount]) -> List[str]:
+    """
+    Returns shell commands that wait for the background mounts and fail the boot if any did not succeed
+    """
+    commands = [
+        'for MOUNT_PID in "${MOUNT_PIDS[@]}"; do',
+        '  wait "$MOUNT_PID" || { echo "ERROR: Failed to mount shared storage" >&2; exit 1; }',
+        'done',
+    ]
+    for mount in mounts:
+        commands.append(
+            f"mountpoint -q '{mount.path}' || {{ echo 'ERROR: {mount.path} is not mounted' >&2; exit 1; }}")
+    return commands
+
+
+def render_queue_ca_commands(ca_secret_arn: str, region: str, ca_path: str) -> List[str]:
+    """
+    Returns shell commands that fetch the Render Queue CA certificate from Secrets Manager
+    """
+    return [
+        f"mkdir -p '{os.path.dirname(ca_path)}'",
+        f'aws secretsmanager get-secret-value --region {region} --secret-id {ca_secret_arn} '
+        f"--query SecretString --output text > '{ca_path}'",
+        f"chmod 644 '{ca_path}'",
+    ]
+
+
+def configure_worker_commands(groups: List[str], pools: List[str]) -> List[str]:
+    """
+    Returns shell commands that assign groups and pools to every worker instance on the host and
+    restart the launcher, as RFDK does for the hosts it configures
+    """
+    return [
+        'source /etc/profile.d/deadlineclient.sh',
+        'DEADLINE_COMMAND="$DEADLINE_PATH/deadlinecommand"',
+        '"$DEADLINE_COMMAND" -SetIniFileSetting KeepWorkerRunning True',
+        '"$DEADLINE_COMMAND" -SetIniFileSetting RestartStalledSlave True',
+        'WORKER_NAMES=()',
+        f'for WORKER_FILE in "{WORKER_INSTANCES_DIR}"/.ini "{WORKER_INSTANCES_DIR}"/*.ini; do',
+        '  [ -e "$WORKER_FILE" ] || continue',
+        '  WORKER_SUFFIX="${WORKER_FILE##*/}"',
+        '  WORKER_SUFFIX="${WORKER_SUFFIX%.ini}"',
+        '  WORKER_NAMES+=("$(hostname -s)${WORKER_SUFFIX:+-$WORKER_SUFFIX}")',
+        'done',
+        '[ "${#WORKER_NAMES[@]}" -gt 0 ] || WORKER_NAMES=("$(hostname -s)")',
+        f'for GROUP in {" ".join(groups)}; do',
+        '  "$DEADLINE_COMMAND" -GetGroupNames | grep -qx "$GROUP" || "$DEADLINE_COMMAND" -AddGroup "$GROUP"',
+        'done',
+        f'for POOL in {" ".join(pools)}; do',
+        '  "$DEADLINE_COMMAND" -GetPoolNames | grep -qx "$POOL" || "$DEADLINE_COMMAND" -AddPool "$POOL"',
+        'done',
+        f'"$DEADLINE_COMMAND" -SetGroupsForSlave "$(IFS=,; echo "${{WORKER_NAMES[*]}}")" {",".join(groups)}',
+        f'"$DEADLINE_COMMAND" -SetPoolsForSlave "$(IFS=,; echo "${{WORKER_NAMES[*]}}")" {",".join(pools)}',
+        'service deadline10launcher restart',
+    ]
+
+
+def nvidia_driver_install_commands() -> List[str]:
+    """
+    Returns the commands that install the NVIDIA GRID driver AWS publishes for G4dn and G5 instances
+    """
+    return [
+        'yum install -y gcc make "kernel-devel-$(uname -r)"',
+        'aws s3 cp --recursive s3://ec2-linux-nvidia-drivers/latest/ /tmp/nvidia-driver/',
+        'chmod +x /tmp/nvidia-driver/NVIDIA-Linux-x86_64*.run',
+        '/tmp/nvidia-driver/NVIDIA-Linux-x86_64*.run --silent',
+        'rm -rf /tmp/nvidia-driver',
+    ]
+
+
+def nvidia_driver_read_statement(partition: str) -> iam.PolicyStatement:
+    """
+    Returns a policy statement that allows downloading the NVIDIA GRID driver
+    """
+    return iam.PolicyStatement(
+        actions=['s3:GetObject', 's3:ListBucket'],
+        resources=[
+            f'arn:{partition}:s3:::ec2-linux-nvidia-drivers',
+            f'arn:{partition}:s3:::ec2-linux-nvidia-drivers/*',
+        ]
+    )
+
+
+def boot_timing_metrics_statement() -> iam.PolicyStatement:
+    """
+    Returns a policy statement that allows the boot timing script to publish its metrics
+    """
+    return iam.PolicyStatement(
+        actions=['cloudwatch:PutMetricData'],
+        resources=['*'],
+        conditions={'StringEquals': {'cloudwatch:namespace': BOOT_TIMING_NAMESPACE}}
+    )
+
+
+def warm_pool_lifecycle_commands(lifecycle_hook_name: str) -> List[str]:
+    """
+    Returns shell commands that install and run a per boot script completing the launch lifecycle
+    action of the instance's Auto Scaling group. User data only runs on the first boot, instances
+    started from the warm pool complete the action from the script. While the instance is being
+    prepared for the warm pool the Deadline launcher is stopped so the worker takes no tasks before
+    the instance is stopped, it starts with the instance when it leaves the warm pool.
+    """
+    return [
+        f"cat > '{WARM_POOL_LIFECYCLE_SCRIPT}' <<'EOF'",
+        '#!/bin/bash',
+        'set -eo pipefail',
+        'IMDS=http://169.254.169.254/latest',
+        'TOKEN=$(curl -sf -X PUT "$IMDS/api/token" -H "X-aws-ec2-metadata-token-ttl-seconds: 60")',
+        'metadata() { curl -sf -H "X-aws-ec2-metadata-token: $TOKEN" "$IMDS/meta-data/$1"; }',
+        'INSTANCE_ID=$(metadata instance-id)',
+        'REGION=$(metadata placement/region)',
+        'if [[ "$(metadata autoscaling/target-lifecycle-state || true)" == Warmed:* ]]; then',
+        '  service deadline10launcher stop',
+        'fi',
+        'ASG_NAME=$(aws ec2 describe-tags --region "$REGION" --query "Tags[0].Value" --output text '
+        '--filters "Name=resource-id,Values=$INSTANCE_ID" "Name=key,Values=aws:autoscaling:groupName")',
+        # Fails when no action is pending, e.g. on a reboot of an instance that is in service
+        'aws autoscaling complete-lifecycle-action --region "$REGION" --instance-id "$INSTANCE_ID" '
+        f'--auto-scaling-group-name "$ASG_NAME" --lifecycle-hook-name {lifecycle_hook_name} '
+        '--lifecycle-action-result CONTINUE || true',
+        'EOF',
+        f"chmod 755 '{WARM_POOL_LIFECYCLE_SCRIPT}'",
+        f"'{WARM_POOL_LIFECYCLE_SCRIPT}'",
+    ]
+
+
+def warm_pool_lifecycle_statements(partition: str, region: str, account: str,
+                                   group_name_prefix: str) -> List[iam.PolicyStatement]:
+    """
+    Returns the policy statements warm_pool_lifecycle_commands needs. The Auto Scaling groups are
+    matched by name prefix, their ARNs are not known before the instance role is created.
+    """
+    return [
+        iam.PolicyStatement(
+            actions=['ec2:DescribeTags'],
+            resources=['*']
+        ),
+        iam.PolicyStatement(
+            actions=['autoscaling:CompleteLifecycleAction'],
+            resources=[f'arn:{partition}:autoscaling:{region}:{account}:autoScalingGroup:*:'
+                       f'autoScalingGroupName/{group_name_prefix}*']
+        ),
+    ]
+
+
+def validate_worker_policy(fleet_name: str, worker_policy: Mapping[str, object]) -> None:
+    unknown_keys = [key for key in worker_policy if key not in WORKER_POLICY_KEYS]
+    if unknown_keys:
+        raise ValueError(
+            f"Fleet '{fleet_name}' worker_policy has unknown keys {', '.join(unknown_keys)}, "
+            f"expected any of {', '.join(WORKER_POLICY_KEYS)}")
+    if worker_policy.get('mode', 'workers') not in WORKER_POLICY_MODES:
+        raise ValueError(
+            f"Fleet '{fleet_name}' worker_policy mode must be one of {', '.join(WORKER_POLICY_MODES)}")
+    for key in WORKER_POLICY_KEYS[1:]:
+        value = worker_policy.get(key)
+        if value is not None and (not isinstance(value, int) or value < 1):
+            raise ValueError(f"Fleet '{fleet_name}' worker_policy {key} must be a positive integer")
+
+
+def worker_instance_commands(worker_policy: Optional[Mapping[str, object]], gpu_workers: Optional[str]) -> List[str]:
+    """
+    Returns shell commands that size the Deadline workers of an instance from its vCPUs, memory and GPUs.
+
+    The count is the smallest of what each per worker budget in worker_policy allows, one per GPU
+    with gpu_workers 'per_gpu', capped at max_workers. In 'workers' mode an extra worker instance is
+    created for each worker after the first, each pinned to its own CPUs and GPUs. In 'tasks' mode
+    the single worker runs that many concurrent tasks instead.
+    """
+    if gpu_workers and gpu_workers not in GPU_WORKER_MODES:
+        raise ValueError(f"Unknown gpu_workers '{gpu_workers}', expected one of {', '.join(GPU_WORKER_MODES)}")
+    worker_policy = worker_policy or {}
+    if not worker_policy and not gpu_workers:
+        return []
+    mode = worker_policy.get('mode', 'workers')
+    vcpus_per_worker = worker_policy.get('vcpus_per_worker')
+    memory_per_worker = worker_policy.get('memory_per_worker_gib')
+
+    with open(WORKER_SETTINGS_SCRIPT) as f:
+        script = f.read().rstrip('\n')
+
+    commands = []
+    if gpu_workers:
+        # The NVIDIA driver is usually baked into the AMI, install it if missing
+        commands += [
+            'command -v nvidia-smi >/dev/null || {',
+            *[f'  {command}' for command in nvidia_driver_install_commands()],
+            '}',
+            'GPU_COUNT=$(nvidia-smi -L | wc -l)',
+            '[ "$GPU_COUNT" -gt 0 ] || { echo "ERROR: No NVIDIA GPUs found" >&2; exit 1; }',
+        ]
+    commands += [
+        'VCPUS=$(nproc)',
+        # MemTotal excludes memory reserved by the kernel and firmware, allow for 10%
+        "MEMORY_GIB=$(( $(awk '/^MemTotal:/ {print $2}' /proc/meminfo) * 11 / 10 / 1048576 ))",
+        f'WORKER_COUNT={worker_policy.get("max_workers") or "$VCPUS"}',
+    ]
+    if vcpus_per_worker:
+        commands.append(
+            f'WORKER_COUNT=$(( VCPUS / {vcpus_per_worker} < WORKER_COUNT ? VCPUS / {vcpus_per_worker} : WORKER_COUNT ))')
+    if memory_per_worker:
+        commands.append(
+            f'WORKER_COUNT=$(( MEMORY_GIB / {memory_per_worker} < WORKER_COUNT '
+            f'? MEMORY_GIB / {memory_per_worker} : WORKER_COUNT ))')
+    if gpu_workers == 'per_gpu':
+        commands.append('WORKER_COUNT=$(( GPU_COUNT < WORKER_COUNT ? GPU_COUNT : WORKER_COUNT ))')
+    elif not worker_policy:
+        commands.append('WORKER_COUNT=1')
+    if mode == 'tasks':
+        commands.append(
+            f'WORKER_COUNT=$(( WORKER_COUNT > {MAX_CONCURRENT_TASKS} ? {MAX_CONCURRENT_TASKS} : WORKER_COUNT ))')
+    commands += [
+        'WORKER_COUNT=$(( WORKER_COUNT < 1 ? 1 : WORKER_COUNT ))',
+        f'echo "Sizing for $VCPUS vCPUs, $MEMORY_GIB GiB${{GPU_COUNT:+, $GPU_COUNT GPUs}}: '
+        f'$WORKER_COUNT {"concurrent tasks" if mode == "tasks" else "workers"}"',
+        'WORKER_SETTINGS_SCRIPT=$(mktemp --suffix .py)',
+        "cat > \"$WORKER_SETTINGS_SCRIPT\" <<'EOF'",
+        script,
+        'EOF',
+        'source /etc/profile.d/deadlineclient.sh',
+        'WORKER_NAME=$(hostname -s)',
+    ]
+
+    all_gpus = '"$(seq -s , 0 $(( GPU_COUNT - 1 )))"'
+    if mode == 'tasks':
+        settings = ['-n "$WORKER_NAME"', '-t "$WORKER_COUNT"'] + (['-g ' + all_gpus] if gpu_workers else [])
+        commands.append(f'"$DEADLINE_PATH/deadlinecommand" -ExecuteScriptNoGui "$WORKER_SETTINGS_SCRIPT" {" ".join(settings)}')
+    else:
+        commands += [
+            f"mkdir -p '{WORKER_INSTANCES_DIR}'",
+            f"touch '{WORKER_INSTANCES_DIR}/.ini'",
+            'for WORKER in $(seq 0 $(( WORKER_COUNT - 1 ))); do',
+            '  if [ "$WORKER" -eq 0 ]; then',
+            '    INSTANCE_NAME="$WORKER_NAME"',
+            '  else',
+            '    INSTANCE_NAME="$WORKER_NAME-worker$WORKER"',
+            f'    touch "{WORKER_INSTANCES_DIR}/worker$WORKER.ini"',
+            '  fi',
+            '  WORKER_SETTINGS=(-n "$INSTANCE_NAME")',
+        ]
+        if vcpus_per_worker:
+            commands.append(
+                f'  WORKER_SETTINGS+=(-c "$(seq -s , $(( WORKER * {vcpus_per_worker} )) '
+                f'$(( (WORKER + 1) * {vcpus_per_worker} - 1 )))")')
+        if gpu_workers == 'per_gpu':
+            commands.append('  WORKER_SETTINGS+=(-g "$WORKER")')
+        elif gpu_workers:
+            commands.append(f'  WORKER_SETTINGS+=(-g {all_gpus})')
+        commands += [
+            '  "$DEADLINE_PATH/deadlinecommand" -ExecuteScriptNoGui "$WORKER_SETTINGS_SCRIPT" "${WORKER_SETTINGS[@]}"',
+            'done',
+        ]
+    commands.append('rm -f "$WORKER_SETTINGS_SCRIPT"')
+    return commands
+
+
+class WorkerUserDataProvider(InstanceUserDataProvider):
+    """
+    Adds render farm specific steps to the user data RFDK generates for each worker.
+
+    Instance store NVMe is set up and shared file systems are mounted in the background while
+    RFDK fetches the Render Queue CA and configures the client. Mounts cached on the NVMe with
+    FS-Cache or Mountpoint wait for it, the others do not. The worker configuration step (which
+    starts the worker) only waits for the local storage and the mounts once everything else is done.
+    Fleet specific bootstrap commands and the worker instance setup run after the
+    mounts, before RFDK assigns groups and pools to the workers. With a boot timing log
+    group each phase is timed and published as metrics once the worker has launched. With a warm
+    pool lifecycle hook the launch lifecycle action is completed once the worker has launched.
+
+    With a repository the worker is switched to a direct Repository connection (file system
+    mount, database credentials and security group access through RFDK) once RFDK has
+    configured the Render Queue connection, before any Deadline settings are applied.
+
+    The *_commands methods return the commands of each step for hosts that are not set up by RFDK.
+    """
+    def __init__(self,
+        scope: Construct,
+        id: str,
+        render_queue_address: str,
+        use_traffic_encryption: bool,
+        mounts: Optional[List[WorkerMount]] = None,
+        local_storage: bool = True,
+        boot_timing_log_group: Optional[str] = None,
+        fleet_name: Optional[str] = None,
+        bootstrap_commands: Optional[List[str]] = None,
+        gpu_workers: Optional[str] = None,
+        worker_policy: Optional[Mapping[str, object]] = None,
+        render_queue_ca_path: Optional[str] = None,
+        efs_region: Optional[str] = None,
+        repository: Optional[IRepository] = None,
+        warm_pool_lifecycle_hook: Optional[str] = None
+    ) -> None:
+        super().__init__(scope, id)
+        self.render_queue_address = render_queue_address
+        self.use_traffic_encryption = use_traffic_encryption
+        self.mounts = mounts or []
+        self.local_storage = local_storage
+        self.boot_timing_log_group = boot_timing_log_group
+        self.fleet_name = fleet_name
+        self.bootstrap_commands = bootstrap_commands or []
+        self.gpu_workers = gpu_workers
+        self.worker_policy = worker_policy
+        self.render_queue_ca_path = render_queue_ca_path
+        self.efs_region = efs_region
+        self.repository = repository
+        self.warm_pool_lifecycle_hook = warm_pool_lifecycle_hook
+
+    def pre_cloud_watch_agent(self, host: IHost) -> None:
+        host.user_data.add_commands(*self.pre_cloud_watch_agent_commands())
+
+    def pre_worker_configuration(self, host: IHost) -> None:
+        if self.repository:
+            self.repository.configure_client_instance(host=host, mount_point=REPOSITORY_MOUNT_PATH)
+        host.user_data.add_commands(*self.pre_worker_configuration_commands())
+
+    def post_worker_launch(self, host: IHost) -> None:
+        host.user_data.add_commands(*self.post_worker_launch_commands())
+
+    def pre_cloud_watch_agent_commands(self) -> List[str]:
+        commands = ['set -eo pipefail', 'MOUNT_PIDS=()', 'LOCAL_STORAGE_PID=""']
+        if self.boot_timing_log_group:
+            commands += [f'mkdir -p {os.path.dirname(BOOT_PHASES_FILE)}', boot_phase_command('UserDataStarted')]
+        if self.local_storage:
+            commands += local_storage_commands()
+        for mount in self.mounts:
+            commands += mount_commands(mount, efs_region=self.efs_region)
+        commands += write_deadline_ini_commands(get_deadline_ini_settings(
+            self.render_queue_address, self.use_traffic_encryption, self.render_queue_ca_path))
+        if self.boot_timing_log_group:
+            commands.append(boot_phase_command('DeadlineIniWritten'))
+        return commands
+
+    def pre_worker_configuration_commands(self) -> List[str]:
+        commands = []
+        if self.local_storage:
+            commands.append(
+                'wait "$LOCAL_STORAGE_PID" || { echo "ERROR: Failed to set up local storage" >&2; exit 1; }')
+        if self.mounts:
+            commands += wait_for_mounts_commands(self.mounts)
+            if self.boot_timing_log_group:
+                commands.append(boot_phase_command('MountsReady'))
+        commands += self.bootstrap_commands
+        commands += worker_instance_commands(self.worker_policy, self.gpu_workers)
+        return commands
+
+    def post_worker_launch_commands(self) -> List[str]:
+        commands = []
+        if self.boot_timing_log_group:
+            commands += [
+                boot_phase_command('WorkerLaunched'),
+                *boot_timing_commands(self.boot_timing_log_group, Stack.of(self).region, self.fleet_name),
+            ]
+        if self.warm_pool_lifecycle_hook:
+            commands += warm_pool_lifecycle_commands(self.warm_pool_lifecycle_hook)
+        return commands
@@ -0,0 +1,185 @@
+import hashlib
+import json
+import os
+import shutil
+from importlib import metadata
+from typing import Iterable, List, Mapping, Optional, Set
+
+
+# Libraries whose versions change the synthesized templates
+CACHE_KEY_LIBRARIES = ['aws-cdk-lib', 'aws-rfdk', 'constructs', 'jsii']
+
+MANIFEST_FILE = 'manifest.json'
+
+
+class SynthCache:
+    """
+    Local cache of synthesized stack artifacts keyed on a hash of everything that shapes a stack.
+
+    Stacks whose key is unchanged are not constructed again, their template, asset manifest
+    and assets are copied from the cache into the new cloud assembly after synthesis. Stacks
+    are only restored together with the stacks they are connected to, see select_restorable.
+    Files in ignored_files, relative to source_dir, are left out of every key, e.g. a config
+    module whose values are passed to compute_key per stack.
+    """
+    def __init__(self, cache_dir: str, source_dir: str, enabled: bool = True,
+                 ignored_files: Iterable[str] = ()) -> None:
+        self.cache_dir = cache_dir
+        self.source_dir = source_dir
+        self.enabled = enabled
+        self.ignored_files = {os.path.normpath(path) for path in ignored_files}
+        self.keys = {}
+
+    def compute_key(self, stack_name: str, values: Mapping[str, object]) -> str:
+        """
+        Records and returns the cache key of a stack from its config values and props,
+        the library versions and the source of this package outside ignored_files
+        """
+        digest = hashlib.sha256()
+        digest.update(stack_name.encode())
+        digest.update(json.dumps(values, sort_keys=True, default=str).encode())
+        for library in CACHE_KEY_LIBRARIES:
+            try:
+                digest.update(f'{library}=={metadata.version(library)}'.encode())
+            except metadata.PackageNotFoundError:
+                digest.update(f'{library} missing'.encode())
+        for path in self.source_files():
+            with open(path, 'rb') as source:
+                digest.update(path.encode())
+                digest.update(source.read())
+        self.keys[stack_name] = digest.hexdigest()
+        return self.keys[stack_name]
+
+    def source_files(self) -> List[str]:
+        paths = []
+        for root, dirs, files in os.walk(self.source_dir):
+            dirs[:] = sorted(d for d in dirs if d != '__pycache__')
+            paths += [
+                os.path.join(root, name) for name in sorted(files) if name.endswith(('.py', '.json'))
+                and os.path.relpath(os.path.join(root, name), self.source_dir) not in self.ignored_files
+            ]
+        return paths
+
+    def entry_dir(self, stack_name: str) -> str:
+        return os.path.join(self.cache_dir, stack_name)
+
+    def is_hit(self, stack_name: str) -> bool:
+        if not self.enabled or stack_name not in self.keys:
+            return False
+        key_file = os.path.join(self.entry_dir(stack_name), 'key')
+        if not os.path.isfile(key_file):
+            return False
+        with open(key_file) as f:
+            return f.read() == self.keys[stack_name]
+
+    def select_restorable(self, stack_names: Iterable[str], dependencies: Mapping[str, List[str]]) -> Set[str]:
+        """
+        Returns the stacks that can be restored from the cache.
+
+        A stack is only restored if everything it depends on and every selected stack that
+        depends on it is restored too. Rebuilt stacks need their dependencies as constructs,
+        and a rebuilt producer would drop the exports a cached consumer still imports.
+        """
+        stack_names = list(stack_names)
+        restorable = {name for name in stack_names if self.is_hit(name)}
+        changed = True
+        while changed:
+            changed = False
+            for name in list(restorable):
+                dependents = [other for other in stack_names if name in dependencies.get(other, [])]
+                if (any(dep not in restorable for dep in dependencies.get(name, []) if dep in stack_names)
+                        or any(dependent not in restorable for dependent in dependents)):
+                    restorable.discard(name)
+                    changed = True
+        return restorable
+
+    def save(self, outdir: str, stack_names: Iterable[str]) -> None:
+        """
+        Copies the artifacts of freshly synthesized stacks from the cloud assembly into the cache
+        """
+        if not self.enabled:
+            return
+        manifest = read_manifest(outdir)
+        # The CDK CLI synthesizes again once it has looked up the missing context values,
+        # templates built with the placeholder values are never cached
+        if manifest.get('missing'):
+            return
+        for stack_name in stack_names:
+            if stack_name not in manifest['artifacts']:
+                continue
+            entry_dir = self.entry_dir(stack_name)
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            os.makedirs(entry_dir)
+
+            artifacts = stack_artifacts(manifest, stack_name)
+            for path in artifact_files(outdir, artifacts):
+                copy_path(os.path.join(outdir, path), os.path.join(entry_dir, path))
+            with open(os.path.join(entry_dir, MANIFEST_FILE), 'w') as f:
+                json.dump(artifacts, f, indent=1)
+            # Written last so an interrupted save is never treated as a hit
+            with open(os.path.join(entry_dir, 'key'), 'w') as f:
+                f.write(self.keys[stack_name])
+
+    def restore(self, outdir: str, stack_names: Iterable[str]) -> None:
+        """
+        Copies cached stack artifacts into the cloud assembly and adds them to its manifest
+        """
+        manifest = read_manifest(outdir)
+        for stack_name in stack_names:
+            entry_dir = self.entry_dir(stack_name)
+            with open(os.path.join(entry_dir, MANIFEST_FILE)) as f:
+                artifacts = json.load(f)
+            for path in os.listdir(entry_dir):
+                if path not in (MANIFEST_FILE, 'key'):
+                    copy_path(os.path.join(entry_dir, path), os.path.join(outdir, path))
+            manifest['artifacts'].update(artifacts)
+        with open(os.path.join(outdir, MANIFEST_FILE), 'w') as f:
+            json.dump(manifest, f, indent=2)
+
+
+def read_manifest(outdir: str) -> dict:
+    with open(os.path.join(outdir, MANIFEST_FILE)) as f:
+        manifest = json.load(f)
+    manifest.setdefault('artifacts', {})
+    return manifest
+
+
+def stack_artifacts(manifest: dict, stack_name: str) -> dict:
+    """
+    Returns the manifest entries of a stack and its asset manifest
+    """
+    artifacts = {stack_name: manifest['artifacts'][stack_name]}
+    for dependency in manifest['artifacts'][stack_name].get('dependencies', []):
+        if manifest['artifacts'].get(dependency, {}).get('type') == 'cdk:asset-manifest' \
+                and dependency == f'{stack_name}.assets':
+            artifacts[dependency] = manifest['artifacts'][dependency]
+    return artifacts
+
+
+def artifact_files(outdir: str, artifacts: dict) -> List[str]:
+    """
+    Returns the assembly relative paths of the templates, asset manifests and assets of artifacts
+    """
+    paths = []
+    for artifact in artifacts.values():
+        properties = artifact.get('properties', {})
+        for key in ('templateFile', 'file'):
+            if key in properties:
+                paths.append(properties[key])
+        if artifact.get('type') == 'cdk:asset-manifest':
+            with open(os.path.join(outdir, properties['file'])) as f:
+                assets = json.load(f)
+            for asset in list(assets.get('files', {}).values()) + list(assets.get('dockerImages', {}).values()):
+                source = asset.get('source', {})
+                path: Optional[str] = source.get('path') or source.get('directory')
+                # Stack templates are listed as file assets too
+                if path and path not in paths:
+                    paths.append(path)
+    return paths
+
+
+def copy_path(source: str, destination: str) -> None:
+    if os.path.isdir(source):
+        shutil.copytree(source, destination, dirs_exist_ok=True)
+    else:
+        shutil.copy2(source, destination)
@@ -0,0 +1,380 @@
+"""
+Synthesis benchmark for generated farm configurations.
+
+Each case builds the whole app in its own process with a generated number of Spot fleets and
+one storage option, then records wall time, peak RSS (the Python process and the jsii node
+runtime) and the resource count and template size of every stack. The VPC's availability
+zones come from a stubbed lookup context and AWS credentials are removed from the
+environment, so cases run offline.
+
+    python -m tests.benchmark.synth_benchmark --fleets 1 10 --storage efs
+    python -m tests.benchmark.synth_benchmark --update-thresholds
+"""
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import List, Mapping, Optional, Tuple
+
+
+PROJECT_DIR = os.path.realpath(os.path.join(os.path.dirname(__file__), os.pardir, os.pardir))
+THRESHOLDS_FILE = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'thresholds.json')
+
+FLEET_COUNTS = (1, 10, 50, 200)
+
+# AppConfig overrides for each storage option
+STORAGE_OPTIONS: Mapping[str, dict] = {
+    'efs': {'enable_efs': True, 'enable_fsx_zfs': False, 'production_storage': 'efs'},
+    'zfs': {'enable_efs': False, 'enable_fsx_zfs': True, 'production_storage': 'zfs'},
+    'efs_zfs': {'enable_efs': True, 'enable_fsx_zfs': True, 'production_storage': 'efs'},
+    'lustre': {'enable_efs': True, 'enable_fsx_zfs': False, 'production_storage': 'efs', 'enable_fsx_lustre': True},
+    'assets': {'enable_efs': True, 'enable_fsx_zfs': False, 'production_storage': 'efs', 'enable_asset_bucket': True},
+}
+
+ACCOUNT = '123456789012'
+REGION = 'us-east-1'
+# Stands in for the availability zone lookup of the VPC stack
+STUB_CONTEXT: Mapping[str, object] = {
+    f'availability-zones:account={ACCOUNT}:region={REGION}': [f'{REGION}a', f'{REGION}b', f'{REGION}c'],
+}
+
+# CloudFormation quotas every stack must stay within, the template size is the limit for
+# templates uploaded to S3, which CDK deploys do
+MAX_STACK_RESOURCES = 500
+MAX_TEMPLATE_BYTES = 1_000_000
+# IAM limits the inline policies of a role to 10,240 characters, whitespace excluded.
+# Resolved ARNs and names are counted as ARN_CHARACTERS characters each.
+MAX_INLINE_POLICY_CHARACTERS = 10_240
+ARN_CHARACTERS = 100
+
+NESTED_TEMPLATE_SUFFIX = '.nested.template.json'
+
+# Allowed growth over the recorded baseline before a case counts as a regression.
+# Wall time and memory depend on the machine, resource counts and template sizes do not.
+WALL_TIME_TOLERANCE = 1.5
+# Most of a small case is starting the jsii runtime, which varies by a few seconds
+WALL_TIME_SLACK_SECONDS = 10
+PEAK_RSS_TOLERANCE = 1.25
+RESOURCE_TOLERANCE = 1.05
+TEMPLATE_BYTES_TOLERANCE = 1.1
+
+# Variables that would let the AWS SDK, or CDK lookups, find credentials
+CREDENTIAL_VARIABLES = (
+    'AWS_ACCESS_KEY_ID', 'AWS_SECRET_ACCESS_KEY', 'AWS_SESSION_TOKEN', 'AWS_PROFILE', 'AWS_DEFAULT_PROFILE',
+    'AWS_CONTAINER_CREDENTIALS_RELATIVE_URI', 'AWS_CONTAINER_CREDENTIALS_FULL_URI', 'AWS_WEB_IDENTITY_TOKEN_FILE',
+)
+
+
+@dataclass
+class StackMetrics:
+    resources: int
+    template_bytes: int
+    # Size of the largest inline policy of the stack, see policy_characters
+    max_policy_characters: int = 0
+
+
+@dataclass
+class SynthResult:
+    """
+    Measurements of one benchmark case
+    """
+    fleet_count: int
+    storage: str
+    wall_seconds: float
+    peak_rss_mb: float
+    stacks: Mapping[str, StackMetrics] = field(default_factory=dict)
+    # Last line of the synthesis output when it failed, stacks is empty then
+    error: Optional[str] = None
+
+    @property
+    def name(self) -> str:
+        return case_name(self.fleet_count, self.storage)
+
+
+def case_name(fleet_count: int, storage: str) -> str:
+    return f'{storage}-{fleet_count}'
+
+
+def get_cases(fleet_counts: Optional[List[int]] = None, storage: Optional[List[str]] = None) -> List[Tuple[int, str]]:
+    """
+    Returns the (fleet count, storage option) pairs to run, every combination by default
+    """
+    storage = storage or list(STORAGE_OPTIONS)
+    unknown_storage = [name for name in storage if name not in STORAGE_OPTIONS]
+    if unknown_storage:
+        raise ValueError(
+            f"Unknown storage options {', '.join(unknown_storage)}, expected any of {', '.join(STORAGE_OPTIONS)}")
+    return [(count, name) for count in fleet_counts or FLEET_COUNTS for name in storage]
+
+
+def make_fleet_configs(template: Mapping[str, object], count: int) -> dict:
+    """
+    Returns count Spot fleet configs cloned from template, every fifth fleet runs GPU workers
+    """
+    fleets = {}
+    for index in range(count):
+        name = f'fleet{index:03d}'
+        fleet = {
+            **template,
+            'name': name,
+            'deadline_groups': [f'{name}-cloud'],
+            'deadline_pools': [name],
+            'tags': {'Name': f'{name}-Deadline-Worker', 'fleet': name},
+        }
+        if index % 5 == 4:
+            fleet.update(instance_types=['g5.2xlarge', 'g4dn.2xlarge'], gpu_workers='per_gpu')
+            fleet.pop('worker_policy', None)
+        fleets[name] = fleet
+    return fleets
+
+
+def configure_case(config, fleet_count: int, storage: str) -> None:
+    """
+    Applies the generated fleets and the storage option of a case to the app config
+    """
+    config.spot_fleet_configs = make_fleet_configs(config.spot_fleet_configs['blender'], fleet_count)
+    config.baseline_fleet_configs = {}
+    config.burst_regions = {}
+    config.vpc_id = None
+    for key, value in STORAGE_OPTIONS[storage].items():
+        setattr(config, key, value)
+
+
+def case_environment(outdir: str) -> Mapping[str, str]:
+    env = {key: value for key, value in os.environ.items() if key not in CREDENTIAL_VARIABLES}
+    env.update(
+        CDK_DEFAULT_ACCOUNT=ACCOUNT,
+        CDK_DEFAULT_REGION=REGION,
+        CDK_OUTDIR=outdir,
+        CDK_CONTEXT_JSON=json.dumps(STUB_CONTEXT),
+        # Keeps the SDK away from the instance metadata service and any shared config
+        AWS_EC2_METADATA_DISABLED='true',
+        AWS_CONFIG_FILE=os.devnull,
+        AWS_SHARED_CREDENTIALS_FILE=os.devnull,
+        JSII_SILENCE_WARNING_DEPRECATED_NODE_VERSION='1',
+    )
+    return env
+
+
+def read_stack_metrics(outdir: str) -> Mapping[str, StackMetrics]:
+    """
+    Returns the resource count and template size of each stack and nested stack in a cloud assembly
+    """
+    with open(os.path.join(outdir, 'manifest.json')) as manifest_file:
+        manifest = json.load(manifest_file)
+
+    missing_context = [entry['key'] for entry in manifest.get('missing') or []]
+    if missing_context:
+        raise RuntimeError(f"Synthesis needed lookups that are not stubbed: {', '.join(missing_context)}")
+
+    templates = {
+        name: artifact['properties']['templateFile'] for name, artifact in manifest['artifacts'].items()
+        if artifact['type'] == 'aws:cloudformation:stack'
+    }
+    # Nested stack templates are file assets of their parent stacks
+    templates.update({
+        file_name[:-len(NESTED_TEMPLATE_SUFFIX)]: file_name for file_name in os.listdir(outdir)
+        if file_name.endswith(NESTED_TEMPLATE_SUFFIX)
+    })
+
+    stacks = {}
+    for name, template_file_name in templates.items():
+        template_path = os.path.join(outdir, template_file_name)
+        with open(template_path) as template_file:
+            template = json.load(template_file)
+        policies = [resource['Properties']['PolicyDocument'] for resource in (template.get('Resources') or {}).values()
+                    if resource['Type'] == 'AWS::IAM::Policy']
+        stacks[name] = StackMetrics(
+            resources=len(template.get('Resources') or {}),
+            template_bytes=os.path.getsize(template_path),
+            max_policy_characters=max((policy_characters(policy) for policy in policies), default=0)
+        )
+    return stacks
+
+
+def policy_characters(document: object) -> int:
+    """
+    Returns the size IAM counts for a policy document, with each intrinsic function taken as a resolved ARN
+    """
+    if isinstance(document, dict):
+        if len(document) == 1 and (next(iter(document)) == 'Ref' or next(iter(document)).startswith('Fn::')):
+            return ARN_CHARACTERS + 2
+        return 2 + sum(len(json.dumps(key)) + 1 + policy_characters(value) for key, value in document.items()) \
+            + max(len(document) - 1, 0)
+    if isinstance(document, list):
+        return 2 + sum(policy_characters(value) for value in document) + max(len(document) - 1, 0)
+    return len(json.dumps(document))
+
+
+def run_case(fleet_count: int, storage: str, timeout: int = 1800) -> SynthResult:
+    """
+    Synthesizes the app for one case in a child process and measures it
+    """
+    with tempfile.TemporaryDirectory(prefix='synth-benchmark-') as outdir:
+        command = [sys.executable, '-m', 'tests.benchmark.synth_benchmark',
+                   '--synth-case', str(fleet_count), storage]
+        log_path = os.path.join(outdir, 'synth.log')
+        start = time.monotonic()
+        with open(log_path, 'wb') as log:
+            process = subprocess.Popen(command, cwd=PROJECT_DIR, env=case_environment(outdir),
+                                       stdout=log, stderr=subprocess.STDOUT)
+        # The child is reaped with wait4 rather than Popen.wait, which discards its rusage. The jsii
+        # node runtime is waited for by the child, so ru_maxrss covers both processes.
+        timer = threading.Timer(timeout, process.kill)
+        timer.start()
+        try:
+            _, status, usage = os.wait4(process.pid, 0)
+        finally:
+            timer.cancel()
+        process.returncode = os.waitstatus_to_exitcode(status)
+        wall_seconds = time.monotonic() - start
+        result = SynthResult(
+            fleet_count=fleet_count,
+            storage=storage,
+            wall_seconds=round(wall_seconds, 1),
+            # ru_maxrss is in KiB on Linux
+            peak_rss_mb=round(usage.ru_maxrss / 1024, 1)
+        )
+        if process.returncode != 0:
+            with open(log_path, errors='replace') as log:
+                lines = [line.strip() for line in log if line.strip()]
+            result.error = lines[-1] if lines else f'exit code {process.returncode}'
+        else:
+            result.stacks = read_stack_metrics(outdir)
+        return result
+
+
+def get_known_failures(result: SynthResult) -> List[str]:
+    """
+    Returns the synthesis error and CloudFormation quota breaches of a case. Counts are left out
+    so that a baseline can record failures that are known, e.g. farms too large for one stack.
+    """
+    if result.error:
+        return [f"Synthesis fails: {re.sub(r'[0-9]+', 'N', result.error)}"]
+    failures = []
+    for name, stack in sorted(result.stacks.items()):
+        if stack.resources > MAX_STACK_RESOURCES:
+            failures.append(f'{name} exceeds the CloudFormation limit of {MAX_STACK_RESOURCES} resources')
+        if stack.template_bytes > MAX_TEMPLATE_BYTES:
+            failures.append(f'{name} exceeds the CloudFormation template limit of {MAX_TEMPLATE_BYTES} bytes')
+        if stack.max_policy_characters > MAX_INLINE_POLICY_CHARACTERS:
+            failures.append(
+                f'{name} has a policy over the IAM inline policy limit of {MAX_INLINE_POLICY_CHARACTERS} characters')
+    return failures
+
+
+def check_result(result: SynthResult, thresholds: Mapping[str, dict]) -> List[str]:
+    """
+    Returns the new failures and regressions of a case against its baseline. Failures the
+    baseline records are expected, ones that were fixed ask for the baseline to be updated.
+    """
+    baseline = thresholds.get(result.name) or {}
+    known_failures = baseline.get('known_failures') or []
+    current_failures = get_known_failures(result)
+    failures = [failure for failure in current_failures if failure not in known_failures]
+    failures += [f'{failure} no longer happens, update the thresholds'
+                 for failure in known_failures if failure not in current_failures]
+    if not baseline or result.error:
+        return failures
+
+    wall_seconds_limit = max(baseline['wall_seconds'] * WALL_TIME_TOLERANCE,
+                             baseline['wall_seconds'] + WALL_TIME_SLACK_SECONDS)
+    if result.wall_seconds > wall_seconds_limit:
+        failures.append(f"Synthesis took {result.wall_seconds}s, the baseline is {baseline['wall_seconds']}s")
+    if result.peak_rss_mb > baseline['peak_rss_mb'] * PEAK_RSS_TOLERANCE:
+        failures.append(f"Peak RSS was {result.peak_rss_mb} MB, the baseline is {baseline['peak_rss_mb']} MB")
+    for name, stack in result.stacks.items():
+        stack_baseline = (baseline.get('stacks') or {}).get(name)
+        if stack_baseline is None:
+            continue
+        if stack.resources > stack_baseline['resources'] * RESOURCE_TOLERANCE:
+            failures.append(f"{name} has {stack.resources} resources, the baseline is {stack_baseline['resources']}")
+        if stack.template_bytes > stack_baseline['template_bytes'] * TEMPLATE_BYTES_TOLERANCE:
+            failures.append(
+                f"{name} template is {stack.template_bytes} bytes, the baseline is {stack_baseline['template_bytes']}")
+    return failures
+
+
+def load_thresholds(path: str = THRESHOLDS_FILE) -> Mapping[str, dict]:
+    if not os.path.exists(path):
+        return {}
+    with open(path) as thresholds_file:
+        return json.load(thresholds_file)
+
+
+def save_thresholds(results: List[SynthResult], path: str = THRESHOLDS_FILE) -> None:
+    """
+    Records results as the new baseline, keeping the baselines of cases that were not run
+    """
+    thresholds = dict(load_thresholds(path))
+    for result in results:
+        thresholds[result.name] = {
+            'wall_seconds': result.wall_seconds,
+            'peak_rss_mb': result.peak_rss_mb,
+            'stacks': {name: vars(stack) for name, stack in sorted(result.stacks.items())},
+            'known_failures': get_known_failures(result),
+        }
+    with open(path, 'w') as thresholds_file:
+        json.dump(dict(sorted(thresholds.items())), thresholds_file, indent=2)
+        thresholds_file.write('\n')
+
+
+def format_result(result: SynthResult) -> str:
+    lines = [f'{result.name}: {result.wall_seconds}s, peak RSS {result.peak_rss_mb} MB']
+    if result.error:
+        lines.append(f'  {result.error}')
+    for name, stack in sorted(result.stacks.items()):
+        lines.append(f'  {name:<40} {stack.resources:>5} resources {stack.template_bytes:>9} bytes '
+                     f'{stack.max_policy_characters:>6} policy characters')
+    return '\n'.join(lines)
+
+
+def synth_case(fleet_count: int, storage: str) -> None:
+    """
+    Runs in the child process, builds and synthesizes the app with the case's config
+    """
+    from package.config import config
+
+    configure_case(config, fleet_count, storage)
+    # Synthesizes on import
+    import package.app  # noqa: F401
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Benchmark synthesis of generated farm configurations')
+    parser.add_argument('--fleets', type=int, nargs='+', help=f'fleet counts, default {FLEET_COUNTS}')
+    parser.add_argument('--storage', nargs='+', choices=list(STORAGE_OPTIONS), help='storage options, default all')
+    parser.add_argument('--update-thresholds', action='store_true', help=f'record the results in {THRESHOLDS_FILE}')
+    parser.add_argument('--synth-case', nargs=2, metavar=('FLEETS', 'STORAGE'), help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.synth_case:
+        synth_case(int(args.synth_case[0]), args.synth_case[1])
+        return 0
+
+    thresholds = load_thresholds()
+    results = []
+    failed = False
+    for fleet_count, storage in get_cases(args.fleets, args.storage):
+        result = run_case(fleet_count, storage)
+        results.append(result)
+        print(format_result(result), flush=True)
+        if args.update_thresholds:
+            continue
+        for failure in check_result(result, thresholds):
+            failed = True
+            print(f'  FAIL {failure}', flush=True)
+
+    if args.update_thresholds:
+        save_thresholds(results)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,105 @@
+import json
+import os
+
+import pytest
+
+from tests.benchmark.synth_benchmark import (
+    ARN_CHARACTERS,
+    MAX_INLINE_POLICY_CHARACTERS,
+    MAX_STACK_RESOURCES,
+    StackMetrics,
+    SynthResult,
+    check_result,
+    get_cases,
+    get_known_failures,
+    load_thresholds,
+    make_fleet_configs,
+    policy_characters,
+    run_case,
+)
+
+
+# Every case synthesizes the whole app, which takes minutes for the larger farms
+run_benchmark = pytest.mark.skipif(
+    not os.getenv('RUN_SYNTH_BENCHMARK'), reason='set RUN_SYNTH_BENCHMARK=1 to run the synthesis benchmark')
+
+
+def make_result(resources=10, template_bytes=1000, wall_seconds=10.0, error=None):
+    return SynthResult(
+        fleet_count=1,
+        storage='efs',
+        wall_seconds=wall_seconds,
+        peak_rss_mb=300.0,
+        stacks={} if error else {'SpotFleetStack': StackMetrics(resources=resources, template_bytes=template_bytes)},
+        error=error
+    )
+
+
+BASELINE = {
+    'efs-1': {
+        'wall_seconds': 10.0,
+        'peak_rss_mb': 300.0,
+        'stacks': {'SpotFleetStack': {'resources': 10, 'template_bytes': 1000}},
+    }
+}
+
+
+def test_make_fleet_configs_names_fleets_uniquely():
+    fleets = make_fleet_configs({'name': 'blender', 'deadline_groups': ['blender-cloud'], 'max_capacity': 5}, 10)
+
+    assert len(fleets) == 10
+    assert len({group for fleet in fleets.values() for group in fleet['deadline_groups']}) == 10
+    assert sum(1 for fleet in fleets.values() if fleet.get('gpu_workers')) == 2
+
+
+def test_get_cases_rejects_unknown_storage():
+    with pytest.raises(ValueError):
+        get_cases([1], ['nfs'])
+
+
+def test_check_result_within_tolerance():
+    assert check_result(make_result(resources=10, template_bytes=1050, wall_seconds=12.0), BASELINE) == []
+
+
+def test_check_result_reports_regressions():
+    failures = check_result(make_result(resources=12, template_bytes=2000, wall_seconds=30.0), BASELINE)
+
+    assert len(failures) == 3
+
+
+def test_check_result_reports_resource_limit_without_baseline():
+    assert check_result(make_result(resources=MAX_STACK_RESOURCES + 1), {})
+
+
+def test_check_result_reports_inline_policy_limit():
+    result = make_result()
+    result.stacks['SpotFleetStack'].max_policy_characters = MAX_INLINE_POLICY_CHARACTERS + 1
+
+    assert check_result(result, BASELINE) == [
+        'SpotFleetStack has a policy over the IAM inline policy limit of 10240 characters']
+
+
+def test_policy_characters_counts_intrinsics_as_arns():
+    role_arn = {'Fn::GetAtt': ['SpotFleetRole', 'Arn']}
+    document = {'Statement': [{'Action': 'iam:PassRole', 'Resource': [role_arn, role_arn]}]}
+
+    assert policy_characters(document) == len(json.dumps(
+        {'Statement': [{'Action': 'iam:PassRole', 'Resource': ['x' * ARN_CHARACTERS] * 2}]}, separators=(',', ':')))
+
+
+def test_check_result_expects_known_failures():
+    error = "Number of resources in stack 'SpotFleetStack': 1233 is greater than allowed maximum of 500"
+    thresholds = {'efs-1': {**BASELINE['efs-1'], 'known_failures': get_known_failures(make_result(error=error))}}
+
+    assert check_result(make_result(error=error.replace('1233', '1240')), thresholds) == []
+    assert check_result(make_result(error='another error'), thresholds)
+    # A case that starts passing needs its baseline recorded
+    assert check_result(make_result(), thresholds)
+
+
+@run_benchmark
+@pytest.mark.parametrize('fleet_count,storage', get_cases())
+def test_synth_benchmark(fleet_count, storage):
+    result = run_case(fleet_count, storage)
+
+    assert check_result(result, load_thresholds()) == []
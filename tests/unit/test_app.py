@@ -0,0 +1,62 @@
+import json
+import os
+import subprocess
+import sys
+
+from tests.benchmark.synth_benchmark import PROJECT_DIR, STUB_CONTEXT, case_environment
+
+
+# RFDK sets these to a random value on every synth to rerun its custom resources
+FORCE_RUN_KEYS = ('forceRun', 'ForceRun')
+
+
+def synth_app(outdir: str, context: dict, vpc_id: str = None) -> dict:
+    """
+    Synthesizes the app with the default config and returns its stack templates by stack name
+    """
+    env = dict(case_environment(outdir))
+    env['CDK_CONTEXT_JSON'] = json.dumps({**STUB_CONTEXT, **context})
+    if vpc_id:
+        env['CDK_DEFAULT_VPC'] = vpc_id
+    subprocess.run([sys.executable, '-m', 'package.app'], cwd=PROJECT_DIR, env=env, check=True,
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    with open(os.path.join(outdir, 'manifest.json')) as manifest_file:
+        artifacts = json.load(manifest_file)['artifacts']
+    templates = {}
+    for name, artifact in artifacts.items():
+        if artifact['type'] == 'aws:cloudformation:stack':
+            with open(os.path.join(outdir, artifact['properties']['templateFile'])) as template_file:
+                templates[name] = without_force_run(json.load(template_file))
+    return templates
+
+
+def without_force_run(value: object) -> object:
+    if isinstance(value, dict):
+        return {key: without_force_run(item) for key, item in value.items() if key not in FORCE_RUN_KEYS}
+    if isinstance(value, list):
+        return [without_force_run(item) for item in value]
+    return value
+
+
+def test_selected_stacks_are_built_with_their_dependencies(tmp_path):
+    templates = synth_app(str(tmp_path), {'stacks': 'RenderFarmStorageStack'})
+
+    assert set(templates) == {'Renderfarm-VPC', 'RenderFarmStorageStack'}
+
+
+def test_selected_stack_without_dependents_matches_a_full_synth(tmp_path):
+    templates = synth_app(str(tmp_path / 'selected'), {'stacks': 'SpotFleetStack'})
+    full_templates = synth_app(str(tmp_path / 'full'), {})
+
+    assert 'RenderFarmMonitoringStack' not in templates
+    assert templates['SpotFleetStack'] == full_templates['SpotFleetStack']
+
+
+def test_imported_vpc_synthesizes(tmp_path):
+    # The VPC lookup returns placeholder values until the CLI fills in the context
+    templates = synth_app(str(tmp_path), {}, vpc_id='vpc-12345678')
+
+    assert 'SpotFleetStack' in templates
+    assert 'Renderfarm-VPC' not in templates
+    # Endpoints are only added to an imported VPC on request
+    assert 'Renderfarm-VPC-Endpoints' not in templates
@@ -0,0 +1,34 @@
+import pytest
+
+from package.lib.baseline_fleet_stack import validate_baseline_fleet
+from package.lib.worker_user_data import warm_pool_lifecycle_commands
+
+
+def baseline_fleet(**settings):
+    return {'name': 'dailies', 'max_capacity': 4, **settings}
+
+
+def test_baseline_fleet_accepts_warm_pool_and_schedules():
+    validate_baseline_fleet(baseline_fleet(
+        warm_pool={'min_size': 2, 'max_prepared_capacity': 4},
+        schedules=[{'name': 'DailiesStart', 'cron': '30 7 * * MON-FRI', 'min_capacity': 4}]))
+
+
+def test_baseline_fleet_rejects_invalid_settings():
+    with pytest.raises(ValueError):
+        validate_baseline_fleet(baseline_fleet(min_capacity=5))
+    with pytest.raises(ValueError):
+        validate_baseline_fleet(baseline_fleet(warm_pool={'min_size': 4, 'max_prepared_capacity': 2}))
+    with pytest.raises(ValueError):
+        validate_baseline_fleet(baseline_fleet(schedules=[{'name': 'Start', 'cron': 'cron(30 7 * * ? *)',
+                                                           'min_capacity': 4}]))
+    with pytest.raises(ValueError):
+        validate_baseline_fleet(baseline_fleet(schedules=[{'name': 'Start', 'cron': '30 7 * * MON-FRI'}]))
+
+
+def test_warm_pool_lifecycle_commands_complete_the_hook_on_every_boot():
+    commands = '\n'.join(warm_pool_lifecycle_commands('WorkerInitialized'))
+
+    assert "cat > '/var/lib/cloud/scripts/per-boot/render-warm-pool-lifecycle.sh'" in commands
+    assert '--lifecycle-hook-name WorkerInitialized' in commands
+    assert '== Warmed:* ]]; then' in commands
@@ -0,0 +1,27 @@
+import json
+
+from package.lib.scripts.boot_timing import metric_data, put_metric_data_command
+from package.lib.worker_user_data import BOOT_TIMING_NAMESPACE, boot_timing_metrics_statement
+
+
+def test_boot_timing_publishes_with_put_metric_data():
+    data = metric_data('blender', 'c6i.4xlarge', {'MountsReady': 42.5})
+    command = put_metric_data_command('us-east-1', data)
+
+    assert command[:3] == ['aws', 'cloudwatch', 'put-metric-data']
+    assert command[command.index('--namespace') + 1] == BOOT_TIMING_NAMESPACE
+    published = json.loads(command[command.index('--metric-data') + 1])
+    # One datum per fleet, as graphed by the dashboard, and one per fleet and instance type
+    assert [datum['Dimensions'] for datum in published] == [
+        [{'Name': 'Fleet', 'Value': 'blender'}],
+        [{'Name': 'Fleet', 'Value': 'blender'}, {'Name': 'InstanceType', 'Value': 'c6i.4xlarge'}],
+    ]
+    assert {(datum['MetricName'], datum['Value'], datum['Unit']) for datum in published} == {
+        ('MountsReady', 42.5, 'Seconds')}
+
+
+def test_boot_timing_metrics_statement_is_limited_to_the_namespace():
+    statement = boot_timing_metrics_statement().to_statement_json()
+
+    assert statement['Action'] == 'cloudwatch:PutMetricData'
+    assert statement['Condition'] == {'StringEquals': {'cloudwatch:namespace': BOOT_TIMING_NAMESPACE}}
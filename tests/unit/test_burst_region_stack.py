@@ -0,0 +1,151 @@
+import json
+import re
+
+import aws_cdk as cdk
+import pytest
+from aws_cdk import aws_ec2 as ec2, aws_route53 as route53
+from aws_cdk.assertions import Match, Template
+
+from package.lib.burst_region_stack import (
+    BurstPeeringStack,
+    BurstPeeringStackProps,
+    BurstRegionStack,
+    BurstRegionStackProps,
+    validate_burst_regions,
+)
+
+
+FLEETS = {
+    'blender': {'name': 'blender', 'is_linux': True, 'burst_regions': {'us-west-2': {'max_capacity': 10}}},
+}
+
+
+def test_validate_burst_regions_accepts_disjoint_cidrs():
+    validate_burst_regions('us-east-1', '10.0.0.0/16', {'us-west-2': {'vpc_cidr': '10.1.0.0/16'}}, FLEETS)
+
+
+def test_validate_burst_regions_rejects_overlapping_cidrs():
+    with pytest.raises(ValueError):
+        validate_burst_regions('us-east-1', '10.0.0.0/16', {'us-west-2': {'vpc_cidr': '10.0.128.0/17'}}, FLEETS)
+
+
+def test_validate_burst_regions_rejects_unconfigured_region():
+    with pytest.raises(ValueError):
+        validate_burst_regions('us-east-1', '10.0.0.0/16', {}, FLEETS)
+
+
+def make_stacks(**burst_settings):
+    app = cdk.App()
+    primary_env = cdk.Environment(account='123456789012', region='us-east-1')
+    primary_stack = cdk.Stack(app, 'Primary', env=primary_env)
+    primary_vpc = ec2.Vpc(primary_stack, 'Vpc', ip_addresses=ec2.IpAddresses.cidr('10.0.0.0/16'),
+                          availability_zones=['us-east-1a', 'us-east-1b'])
+    dns_zone = route53.PrivateHostedZone(primary_stack, 'Zone', vpc=primary_vpc, zone_name='deadline.internal')
+    fleet = {
+        'name': 'blender',
+        'is_linux': True,
+        'deadline_groups': ['blender-cloud'],
+        'deadline_pools': ['blender'],
+        'instance_types': ['c5.4xlarge', 'c6i.4xlarge'],
+        'worker_image': {'us-east-1': 'ami-11111111', 'us-west-2': 'ami-22222222'},
+        'burst_regions': {'us-west-2': {'max_capacity': 10, 'desired_capacity': 2, **burst_settings}},
+        'tags': {'fleet': 'blender'},
+    }
+    burst_stack = BurstRegionStack(app, 'BurstRegion-us-west-2',
+        props=BurstRegionStackProps(
+            primary_region='us-east-1',
+            primary_vpc=primary_vpc,
+            vpc_cidr='10.1.0.0/16',
+            spot_fleet_configs={'blender': fleet},
+            render_queue_address='renderqueue.deadline.internal:4433',
+            worker_mounts=[],
+            worker_boot_timing=False
+        ),
+        env=cdk.Environment(account='123456789012', region='us-west-2'))
+    peering_stack = BurstPeeringStack(app, 'BurstPeering-us-west-2',
+        props=BurstPeeringStackProps(
+            burst_region='us-west-2',
+            burst_vpc=burst_stack.vpc,
+            vpc_cidr='10.1.0.0/16',
+            peering_connection_id=burst_stack.peering_connection_id,
+            primary_vpc=primary_vpc,
+            dns_zone=dns_zone
+        ),
+        env=primary_env)
+    return burst_stack, peering_stack
+
+
+def test_burst_region_routes_to_the_primary_vpc_and_runs_spot_fleets():
+    burst_stack, _ = make_stacks()
+    template = Template.from_stack(burst_stack)
+
+    # The primary VPC's ID and CIDR are read from the primary region's cross-region exports
+    template.has_resource_properties('AWS::EC2::VPCPeeringConnection', {
+        'PeerRegion': 'us-east-1',
+        'PeerVpcId': {'Fn::GetAtt': ['ExportsReader8B249524', Match.string_like_regexp('RefVpc')]},
+    })
+    routes = [route for name, route in template.find_resources('AWS::EC2::Route').items()
+              if name.startswith('PrimaryRoute')]
+    assert len(routes) == len(burst_stack.vpc.private_subnets)
+    assert all(re.search('GetAttVpc.*CidrBlock', route['Properties']['DestinationCidrBlock']['Fn::GetAtt'][1])
+               for route in routes)
+    assert all(route['Properties']['VpcPeeringConnectionId'] == {'Ref': 'PrimaryPeering'} for route in routes)
+
+    template.has_resource_properties('AWS::AutoScaling::AutoScalingGroup', {
+        'MinSize': '0',
+        'MaxSize': '10',
+        'DesiredCapacity': '2',
+        'MixedInstancesPolicy': {
+            'InstancesDistribution': {
+                'OnDemandBaseCapacity': 0,
+                'OnDemandPercentageAboveBaseCapacity': 0,
+                'SpotAllocationStrategy': 'price-capacity-optimized',
+            },
+            'LaunchTemplate': Match.object_like({
+                'Overrides': [{'InstanceType': 'c5.4xlarge'}, {'InstanceType': 'c6i.4xlarge'}],
+            }),
+        },
+    })
+    template.has_resource_properties('AWS::EC2::LaunchTemplate', {
+        'LaunchTemplateData': Match.object_like({'ImageId': 'ami-22222222'}),
+    })
+
+
+def test_idle_burst_fleets_scale_to_zero():
+    burst_stack, _ = make_stacks()
+    template = Template.from_stack(burst_stack)
+
+    template.has_resource_properties('AWS::AutoScaling::ScalingPolicy', {
+        'PolicyType': 'StepScaling',
+        'AdjustmentType': 'ExactCapacity',
+        'StepAdjustments': [{'MetricIntervalUpperBound': 0, 'ScalingAdjustment': 0}],
+    })
+    template.has_resource_properties('AWS::CloudWatch::Alarm', {
+        'Namespace': 'AWS/EC2',
+        'MetricName': 'CPUUtilization',
+        'Statistic': 'Maximum',
+        'ComparisonOperator': 'LessThanThreshold',
+        'EvaluationPeriods': 6,
+        'AlarmActions': [{'Ref': Match.string_like_regexp('blenderIdleScaleIn')}],
+    })
+
+    burst_stack, _ = make_stacks(idle_shutdown_minutes=0)
+    Template.from_stack(burst_stack).resource_count_is('AWS::AutoScaling::ScalingPolicy', 0)
+
+    with pytest.raises(ValueError):
+        make_stacks(idle_shutdown_minutes=12)
+
+
+def test_burst_peering_routes_primary_subnets_and_associates_the_zone():
+    _, peering_stack = make_stacks()
+    template = Template.from_stack(peering_stack)
+
+    routes = template.find_resources('AWS::EC2::Route')
+    assert len(routes) == 2
+    assert all(route['Properties']['DestinationCidrBlock'] == '10.1.0.0/16' for route in routes.values())
+
+    association = next(iter(template.find_resources('Custom::AWS').values()))
+    create = json.dumps(association['Properties']['Create'])
+    assert 'associateVPCWithHostedZone' in create
+    assert 'us-west-2' in create
+    assert 'disassociateVPCFromHostedZone' in json.dumps(association['Properties']['Delete'])
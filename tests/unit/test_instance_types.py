@@ -0,0 +1,66 @@
+import json
+
+import pytest
+
+from package.lib.instance_types import (
+    InstanceSpec,
+    load_catalog,
+    resolve_instance_requirements,
+    save_catalog,
+    select_instance_types,
+)
+
+
+CATALOG = {
+    'c6i.4xlarge': InstanceSpec(vcpus=16, memory_gib=32, network_gbps=12.5),
+    'c6i.8xlarge': InstanceSpec(vcpus=32, memory_gib=64, network_gbps=12.5),
+    'c5.4xlarge': InstanceSpec(vcpus=16, memory_gib=32, network_gbps=10),
+    'c5d.4xlarge': InstanceSpec(vcpus=16, memory_gib=32, local_storage_gb=400, network_gbps=10),
+    'm6i.4xlarge': InstanceSpec(vcpus=16, memory_gib=64, network_gbps=12.5),
+    'g5.4xlarge': InstanceSpec(vcpus=16, memory_gib=64, gpus=1, gpu_memory_gib=24, local_storage_gb=600,
+                               network_gbps=25),
+}
+
+
+def test_select_instance_types_ranks_families_for_diversity():
+    types = select_instance_types({'min_vcpus': 16, 'max_vcpus': 32}, CATALOG)
+
+    # One type of each family before the larger sizes, leanest and newest families first
+    assert types == ['c6i.4xlarge', 'c5.4xlarge', 'c5d.4xlarge', 'm6i.4xlarge', 'c6i.8xlarge']
+
+
+def test_select_instance_types_filters():
+    assert select_instance_types({'min_vcpus': 16, 'memory_per_vcpu_gib': 4}, CATALOG) == ['m6i.4xlarge']
+    assert select_instance_types({'min_vcpus': 16, 'local_nvme': True}, CATALOG) == ['c5d.4xlarge']
+    assert select_instance_types({'min_vcpus': 16, 'network_gbps': 12.5, 'max_types': 1}, CATALOG) == ['c6i.4xlarge']
+    assert select_instance_types({'gpus': 1, 'gpu_memory_gib': 16}, CATALOG) == ['g5.4xlarge']
+
+
+def test_select_instance_types_rejects_invalid_requirements():
+    with pytest.raises(ValueError):
+        select_instance_types({'min_vcpu': 16}, CATALOG)
+    with pytest.raises(ValueError):
+        select_instance_types({'min_vcpus': 128}, CATALOG)
+
+
+def test_resolve_instance_requirements():
+    fleets = resolve_instance_requirements({
+        'blender': {'name': 'blender', 'instance_requirements': {'min_vcpus': 16, 'local_nvme': True}},
+        'maya': {'name': 'maya', 'instance_types': ['c5.large']},
+    })
+
+    assert fleets['blender']['instance_types']
+    assert all(load_catalog()[name].local_storage_gb for name in fleets['blender']['instance_types'])
+    assert fleets['maya']['instance_types'] == ['c5.large']
+
+    with pytest.raises(ValueError):
+        resolve_instance_requirements({'blender': {
+            'name': 'blender', 'instance_types': ['c5.large'], 'instance_requirements': {'min_vcpus': 16}}})
+
+
+def test_save_catalog_round_trips(tmp_path):
+    path = str(tmp_path / 'catalog.json')
+    save_catalog(CATALOG, path)
+
+    assert load_catalog(path) == CATALOG
+    assert len(json.load(open(path))) == len(CATALOG)
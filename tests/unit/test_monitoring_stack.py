@@ -0,0 +1,134 @@
+import json
+import os
+
+import aws_cdk as cdk
+import pytest
+from aws_cdk import aws_ec2 as ec2
+from aws_cdk.assertions import Match, Template
+
+from package.lib.monitoring_stack import MonitoringStack, MonitoringStackProps, get_alarm_thresholds
+from package.lib.rfdk_deadline_template_stack import DeadlineStackProps, RfdkDeadlineTemplateStack
+
+
+STAGE_PATH = os.path.join(os.path.dirname(os.path.realpath(__file__)), os.pardir, os.pardir, 'stage')
+
+
+def test_alarm_thresholds_overrides():
+    thresholds = get_alarm_thresholds({'database_cpu': 60})
+
+    assert thresholds['database_cpu'] == 60
+    assert thresholds['render_queue_cpu'] == 85
+
+
+def test_alarm_thresholds_rejects_unknown_keys():
+    with pytest.raises(ValueError):
+        get_alarm_thresholds({'db_cpu': 60})
+
+
+def make_template(**props):
+    app = cdk.App()
+    env = cdk.Environment(account='123456789012', region='us-east-1')
+    vpc = ec2.Vpc(cdk.Stack(app, 'Vpc', env=env), 'Vpc')
+    spot_fleet_configs = {'blender': {'name': 'blender', 'max_capacity': 5}}
+    deadline_stack = RfdkDeadlineTemplateStack(app, 'Deadline', env=env, props=DeadlineStackProps(
+        vpc=vpc, aws_region='us-east-1', renderqueue_name='renderqueue', zone_name='deadline-test.internal',
+        deadline_version='10.4.2', use_traffic_encryption=True, docker_recipes_stage_path=STAGE_PATH,
+        spot_fleet_configs=spot_fleet_configs))
+    stack = MonitoringStack(app, 'Monitoring', env=env, props=MonitoringStackProps(
+        render_queue=deadline_stack.render_queue,
+        render_queue_service=deadline_stack.render_queue_service,
+        database=deadline_stack.database,
+        spot_fleet_configs=spot_fleet_configs,
+        **props))
+    return Template.from_stack(stack)
+
+
+def get_alarm_thresholds_by_name(template):
+    return {
+        name[:name.index('Alarm')]: alarm['Properties']['Threshold']
+        for name, alarm in template.find_resources('AWS::CloudWatch::Alarm').items()
+    }
+
+
+def test_alarms_use_config_thresholds():
+    template = make_template(efs_file_system_id='fs-efs', zfs_file_system_id='fs-zfs',
+                             alarm_thresholds={'database_cpu': 60})
+
+    assert get_alarm_thresholds_by_name(template) == {
+        'RenderQueueResponseTime': 1,
+        'RenderQueue5xx': 10,
+        'RenderQueueCpu': 85,
+        'DatabaseCpu': 60,
+        'EfsThroughputUtilization': 80,
+        'ZfsThroughputUtilization': 80,
+    }
+    template.all_resources_properties('AWS::CloudWatch::Alarm', {
+        'EvaluationPeriods': 3,
+        'ComparisonOperator': 'GreaterThanThreshold',
+        'AlarmActions': [{'Ref': Match.string_like_regexp('RenderFarmAlarms')}],
+    })
+    template.has_resource_properties('AWS::CloudWatch::Alarm', {
+        'Metrics': Match.array_with([Match.object_like({'Expression': '100 * (io / PERIOD(io)) / permitted'})]),
+    })
+
+
+def test_storage_alarms_follow_deployed_file_systems():
+    template = make_template()
+
+    assert list(get_alarm_thresholds_by_name(template)) == [
+        'RenderQueueResponseTime', 'RenderQueue5xx', 'RenderQueueCpu', 'DatabaseCpu']
+
+
+def get_dashboard_body(template):
+    """
+    Returns the dashboard body with the references it joins in replaced by a placeholder
+    """
+    dashboards = template.find_resources('AWS::CloudWatch::Dashboard')
+    assert len(dashboards) == 1
+    parts = next(iter(dashboards.values()))['Properties']['DashboardBody']['Fn::Join'][1]
+    return json.loads(''.join(part if isinstance(part, str) else 'REF' for part in parts))
+
+
+def get_dashboard_expressions(template):
+    return [metric[0]['expression'] for widget in get_dashboard_body(template)['widgets']
+            for metric in widget['properties'].get('metrics', []) if 'expression' in metric[0]]
+
+
+def test_dashboard_searches_fleet_and_boot_metrics():
+    expressions = get_dashboard_expressions(make_template(efs_file_system_id='fs-efs'))
+
+    # Only this farm's fleets, AWS/EC2Spot would include every Spot Fleet request of the account
+    assert 'SEARCH(\'{RenderFarm/SpotFleet,Fleet} MetricName="FulfilledCapacity"\', \'Maximum\', 300)' in expressions
+    assert 'SEARCH(\'{RenderFarm/WorkerBoot,Fleet} MetricName="FirstTask"\', \'Average\', 300)' in expressions
+    assert '100 * (io / PERIOD(io)) / permitted' in expressions
+
+
+def test_boot_phases_are_only_graphed_with_boot_timing():
+    expressions = get_dashboard_expressions(make_template(worker_boot_timing=False))
+
+    assert not any('RenderFarm/WorkerBoot' in expression for expression in expressions)
+
+
+def test_spot_fleet_metrics_are_published_for_the_farms_fleets():
+    template = make_template()
+
+    template.has_resource_properties('AWS::Lambda::Function', {
+        'Handler': 'index.handler',
+        'Environment': {'Variables': {'FLEETS': '["blender"]'}},
+    })
+    template.has_resource_properties('AWS::Events::Rule', {'ScheduleExpression': 'rate(5 minutes)'})
+    template.has_resource_properties('AWS::IAM::Policy', {
+        'PolicyDocument': {'Statement': Match.array_with([Match.object_like({
+            'Action': 'cloudwatch:PutMetricData',
+            'Condition': {'StringEquals': {'cloudwatch:namespace': 'RenderFarm/SpotFleet'}},
+        })])},
+    })
+
+
+def test_alarm_email_subscription_is_optional():
+    make_template().resource_count_is('AWS::SNS::Subscription', 0)
+
+    make_template(alarm_email='render-ops@example.com').has_resource_properties('AWS::SNS::Subscription', {
+        'Protocol': 'email',
+        'Endpoint': 'render-ops@example.com',
+    })
@@ -1,15 +1,105 @@
-import aws_cdk as core
-import aws_cdk.assertions as assertions
+import os
 
-from rfdk_deadline_template.rfdk_deadline_template_stack import RfdkDeadlineTemplateStack
+import aws_cdk as cdk
+import pytest
+from aws_cdk import aws_ec2 as ec2
+from aws_cdk.assertions import Match, Template
 
-# example tests. To run these tests, uncomment this file along with the example
-# resource in rfdk_deadline_template/rfdk_deadline_template_stack.py
-def test_sqs_queue_created():
-    app = core.App()
-    stack = RfdkDeadlineTemplateStack(app, "rfdk-deadline-template")
-    template = assertions.Template.from_stack(stack)
+from package.lib.rfdk_deadline_template_stack import (
+    DeadlineStackProps,
+    RfdkDeadlineTemplateStack,
+    get_database_sizing,
+    get_render_queue_sizing,
+)
 
-#     template.has_resource_properties("AWS::SQS::Queue", {
-#         "VisibilityTimeout": 300
-#     })
+
+STAGE_PATH = os.path.join(os.path.dirname(os.path.realpath(__file__)), os.pardir, os.pardir, 'stage')
+
+
+def test_database_sizing_presets():
+    assert get_database_sizing(50).instance_type == 'r5.large'
+    assert get_database_sizing(100).instance_count == 1
+
+    sizing = get_database_sizing(2000)
+    assert (sizing.instance_type, sizing.instance_count) == ('r5.4xlarge', 3)
+
+
+def test_database_sizing_overrides():
+    sizing = get_database_sizing(50, instance_type='r6g.large', instance_count=2, parameters={'tls': 'disabled'})
+
+    assert (sizing.instance_type, sizing.instance_count) == ('r6g.large', 2)
+    assert sizing.parameters == {'audit_logs': 'enabled', 'tls': 'disabled'}
+
+
+def test_database_sizing_rejects_too_many_instances():
+    with pytest.raises(ValueError):
+        get_database_sizing(50, instance_count=17)
+
+
+def test_render_queue_sizing_presets():
+    sizing = get_render_queue_sizing(600)
+
+    assert (sizing.instance_type, sizing.min_capacity, sizing.max_capacity) == ('c5.2xlarge', 2, 5)
+    assert sizing.scaling_target == 60
+
+
+def test_render_queue_sizing_raises_max_to_min_capacity():
+    sizing = get_render_queue_sizing(50, min_capacity=3)
+
+    assert (sizing.min_capacity, sizing.max_capacity) == (3, 3)
+
+
+def test_render_queue_sizing_rejects_invalid_settings():
+    with pytest.raises(ValueError):
+        get_render_queue_sizing(50, scaling_metric='memory')
+    with pytest.raises(ValueError):
+        get_render_queue_sizing(50, desired_capacity=5)
+
+
+def make_template(**props):
+    app = cdk.App()
+    env = cdk.Environment(account='123456789012', region='us-east-1')
+    vpc = ec2.Vpc(cdk.Stack(app, 'Vpc', env=env), 'Vpc')
+    stack = RfdkDeadlineTemplateStack(app, 'Deadline', env=env, props=DeadlineStackProps(
+        vpc=vpc, aws_region='us-east-1', renderqueue_name='renderqueue', zone_name='deadline-test.internal',
+        deadline_version='10.4.2', use_traffic_encryption=True, docker_recipes_stage_path=STAGE_PATH,
+        spot_fleet_configs={'blender': {'name': 'blender', 'max_capacity': 600}}, **props))
+    return Template.from_stack(stack)
+
+
+def test_database_sizing_applies_to_rfdk_cluster():
+    template = make_template(database_parameters={'profiler': 'enabled'})
+
+    # Fails when RFDK moves the Repository database, which would replace it on deploy
+    clusters = template.find_resources('AWS::DocDB::DBCluster')
+    assert list(clusters) == ['RepositoryDocumentDatabase4A1EFF43']
+    assert clusters['RepositoryDocumentDatabase4A1EFF43']['Properties']['EnableCloudwatchLogsExports'] == [
+        'audit', 'profiler']
+    template.resource_count_is('AWS::DocDB::DBInstance', 2)
+    template.all_resources_properties('AWS::DocDB::DBInstance', {
+        'DBInstanceClass': 'db.r5.2xlarge',
+        'AutoMinorVersionUpgrade': True,
+    })
+    template.has_resource_properties('AWS::DocDB::DBClusterParameterGroup', {
+        'Parameters': {'audit_logs': 'enabled', 'profiler': 'enabled'},
+    })
+
+
+def test_render_queue_service_scales_through_capacity_provider():
+    template = make_template()
+
+    # Fails when RFDK changes the RCS service that the autoscaling rewrites
+    services = template.find_resources('AWS::ECS::Service')
+    assert len(services) == 1
+    service = next(iter(services.values()))['Properties']
+    assert 'LaunchType' not in service
+    assert len(service['CapacityProviderStrategy']) == 1
+    template.resource_count_is('AWS::ApplicationAutoScaling::ScalableTarget', 1)
+
+
+def test_render_queue_admits_burst_region_workers():
+    template = make_template(burst_client_cidrs={'us-west-2': '10.1.0.0/16'})
+
+    template.has_resource_properties('AWS::EC2::SecurityGroup', {
+        'SecurityGroupIngress': Match.array_with([Match.object_like(
+            {'CidrIp': '10.1.0.0/16', 'FromPort': 4433, 'ToPort': 4433})])})
@@ -0,0 +1,41 @@
+from package.lib.monitoring_stack import SPOT_FLEET_NAMESPACE
+from package.lib.scripts.spot_fleet_metrics import FLEET_TAG, NAMESPACE, get_fleet_capacity, metric_data
+from package.lib.spot_fleet_stack import FLEET_NAME_TAG
+
+
+def make_request(state, target, fulfilled, tags):
+    return {
+        'SpotFleetRequestState': state,
+        'SpotFleetRequestConfig': {'TargetCapacity': target, 'FulfilledCapacity': fulfilled},
+        'Tags': [{'Key': key, 'Value': value} for key, value in tags.items()],
+    }
+
+
+def test_fleet_capacity_only_counts_this_farms_active_requests():
+    requests = [
+        make_request('active', 4, 3.0, {FLEET_TAG: 'blender'}),
+        make_request('modifying', 2, 2.0, {FLEET_TAG: 'blender'}),
+        make_request('cancelled_terminating', 8, 8.0, {FLEET_TAG: 'blender'}),
+        # Fleets of other farms and untagged Spot Fleet requests
+        make_request('active', 10, 10.0, {FLEET_TAG: 'houdini'}),
+        make_request('active', 10, 10.0, {}),
+    ]
+
+    assert get_fleet_capacity(requests, ['blender', 'maya']) == {
+        'blender': {'TargetCapacity': 6, 'FulfilledCapacity': 5.0},
+        'maya': {'TargetCapacity': 0, 'FulfilledCapacity': 0},
+    }
+
+
+def test_fleet_capacity_is_published_per_fleet():
+    data = metric_data({'blender': {'TargetCapacity': 6, 'FulfilledCapacity': 5.0}})
+
+    assert [(datum['MetricName'], datum['Dimensions'], datum['Value']) for datum in data] == [
+        ('TargetCapacity', [{'Name': 'Fleet', 'Value': 'blender'}], 6),
+        ('FulfilledCapacity', [{'Name': 'Fleet', 'Value': 'blender'}], 5.0),
+    ]
+
+
+def test_script_matches_the_stacks():
+    assert NAMESPACE == SPOT_FLEET_NAMESPACE
+    assert FLEET_TAG == FLEET_NAME_TAG
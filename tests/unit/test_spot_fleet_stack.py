@@ -0,0 +1,202 @@
+import json
+import os
+
+import aws_cdk as cdk
+import pytest
+from aws_cdk import aws_ec2 as ec2
+from aws_cdk.assertions import Template
+
+from package.lib.rfdk_deadline_template_stack import DeadlineStackProps, RfdkDeadlineTemplateStack
+from package.lib import spot_fleet_stack
+from package.lib.spot_fleet_stack import (
+    FLEET_NAME_TAG,
+    FLEET_RESOURCES,
+    FLEET_SHARD_RESOURCE_BUDGET,
+    SPOT_PLUGIN_CONFIG_BYTES,
+    SPOT_PLUGIN_CONFIG_BYTES_PER_OVERRIDE,
+    SpotFleetStack,
+    SpotFleetStackProps,
+    get_fleet_subnet_selection,
+    get_spot_plugin_settings,
+    is_direct_connection,
+    pack_fleet_shards,
+)
+
+
+STAGE_PATH = os.path.join(os.path.dirname(os.path.realpath(__file__)), os.pardir, os.pardir, 'stage')
+
+
+def make_fleets(count, is_linux=True):
+    return {
+        f'fleet{index}': {
+            'name': f'fleet{index}',
+            'is_linux': is_linux,
+            'deadline_groups': [f'fleet{index}'],
+            'instance_types': ['c5.4xlarge', 'c6i.4xlarge'],
+        }
+        for index in range(count)
+    }
+
+
+def test_spot_plugin_preset_with_overrides():
+    settings = get_spot_plugin_settings('aggressive_burst', {'idle_shutdown_minutes': 5})
+
+    assert settings.maximum_instances_started_per_cycle == 250
+    assert settings.idle_shutdown.to_minutes() == 5
+    assert settings.strict_hard_cap is False
+
+
+def test_steady_preset_matches_plugin_defaults():
+    settings = get_spot_plugin_settings('steady')
+
+    assert settings.maximum_instances_started_per_cycle == 50
+    assert settings.idle_shutdown.to_minutes() == 10
+    assert settings.strict_hard_cap is False
+    assert settings.delete_sep_terminated_workers is False
+    assert settings.delete_ec2_spot_interrupted_workers is False
+
+
+def test_spot_plugin_rejects_unknown_preset():
+    with pytest.raises(ValueError):
+        get_spot_plugin_settings('fast')
+
+
+def test_spot_plugin_rejects_invalid_settings():
+    with pytest.raises(ValueError):
+        get_spot_plugin_settings('steady', {'idle_shutdown': 5})
+    with pytest.raises(ValueError):
+        get_spot_plugin_settings('steady', {'maximum_instances_started_per_cycle': 0})
+
+
+def test_repository_connection_defaults_to_render_queue():
+    assert is_direct_connection({'name': 'blender'}) is False
+    assert is_direct_connection({'name': 'blender', 'repository_connection': 'direct'}) is True
+    with pytest.raises(ValueError):
+        is_direct_connection({'name': 'blender', 'repository_connection': 'rcs'})
+
+
+def test_fleets_fitting_one_stack_are_not_sharded():
+    fleets = make_fleets(10)
+
+    assert pack_fleet_shards(fleets) == [list(fleets)]
+
+
+def test_fleets_are_sharded_in_config_order():
+    fleets = make_fleets(100)
+    shards = pack_fleet_shards(fleets)
+
+    assert len(shards) > 1
+    assert [key for shard in shards for key in shard] == list(fleets)
+    assert all(len(shard) * FLEET_RESOURCES <= FLEET_SHARD_RESOURCE_BUDGET for shard in shards)
+    # Adding a fleet only changes the last shard
+    assert pack_fleet_shards(make_fleets(101))[:-1] == shards[:-1]
+
+
+def test_windows_fleets_pack_more_per_shard():
+    assert len(pack_fleet_shards(make_fleets(100, is_linux=False))) < len(pack_fleet_shards(make_fleets(100)))
+
+
+def test_spot_plugin_configuration_too_large():
+    with pytest.raises(ValueError):
+        pack_fleet_shards(make_fleets(1000))
+
+
+def test_fleet_subnets_follow_availability_zones():
+    stack = cdk.Stack(cdk.App(), 'Vpc', env=cdk.Environment(account='123456789012', region='us-east-1'))
+    vpc = ec2.Vpc(stack, 'Vpc', availability_zones=['us-east-1a', 'us-east-1b', 'us-east-1c'])
+
+    def get_subnet_count(fleet):
+        selection = get_fleet_subnet_selection(vpc, fleet)
+        return len(vpc.select_subnets(
+            subnet_type=selection.subnet_type, availability_zones=selection.availability_zones).subnet_ids)
+
+    assert get_subnet_count({'name': 'blender'}) == 3
+    assert get_subnet_count({'name': 'blender', 'availability_zones': ['us-east-1b']}) == 1
+    with pytest.raises(ValueError):
+        get_fleet_subnet_selection(vpc, {'name': 'blender', 'availability_zones': ['us-west-2a']})
+
+
+def make_spot_fleet_stack(spot_fleet_configs):
+    app = cdk.App()
+    env = cdk.Environment(account='123456789012', region='us-east-1')
+    vpc = ec2.Vpc(cdk.Stack(app, 'Vpc', env=env), 'Vpc', availability_zones=['us-east-1a', 'us-east-1b'])
+    deadline_stack = RfdkDeadlineTemplateStack(app, 'Deadline', env=env, props=DeadlineStackProps(
+        vpc=vpc, aws_region='us-east-1', renderqueue_name='renderqueue', zone_name='deadline-test.internal',
+        deadline_version='10.4.2', use_traffic_encryption=True, docker_recipes_stage_path=STAGE_PATH,
+        spot_fleet_configs=spot_fleet_configs))
+    return SpotFleetStack(app, 'SpotFleet', env=env, props=SpotFleetStackProps(
+        vpc=vpc,
+        aws_region='us-east-1',
+        spot_fleet_configs=spot_fleet_configs,
+        render_queue=deadline_stack.render_queue,
+        repository=deadline_stack.repository,
+        security_group_ids=[deadline_stack.render_worker_sg.security_group_id],
+        worker_mounts=[],
+        worker_boot_timing=False
+    ))
+
+
+def make_fleet_config(name, **settings):
+    return {
+        'name': name,
+        'is_linux': True,
+        'deadline_groups': [f'{name}-cloud'],
+        'deadline_pools': [name],
+        'instance_types': ['c5.4xlarge', 'c6i.4xlarge'],
+        'worker_image': {'us-east-1': 'ami-11111111'},
+        'max_capacity': 5,
+        'tags': {},
+        **settings,
+    }
+
+
+def test_spot_plugin_launch_template_overrides_are_strings():
+    template = Template.from_stack(make_spot_fleet_stack({'blender': make_fleet_config('blender')}))
+
+    # CloudFormation passes custom resource properties to RFDK's lambda as strings, which it only
+    # accepts for the string fields of an override
+    plugin_config = next(iter(template.find_resources('Custom::RFDK_ConfigureSpotEventPlugin').values()))
+    launch_template_configs = plugin_config['Properties']['spotFleetRequestConfigurations'][
+        'blender-cloud']['LaunchTemplateConfigs']
+    assert len(launch_template_configs) == 1
+    overrides = launch_template_configs[0]['Overrides']
+    assert len(overrides) == 4
+    assert all(set(override) == {'InstanceType', 'SubnetId'} for override in overrides)
+    assert {override['InstanceType'] for override in overrides} == {'c5.4xlarge', 'c6i.4xlarge'}
+
+
+def test_sharded_fleets_keep_one_launch_template_config_per_fleet(monkeypatch):
+    # One fleet per nested stack
+    monkeypatch.setattr(spot_fleet_stack, 'FLEET_SHARD_RESOURCE_BUDGET', FLEET_RESOURCES)
+    fleets = {name: make_fleet_config(name) for name in ('blender', 'maya', 'nuke')}
+    template = Template.from_stack(make_spot_fleet_stack(fleets))
+
+    assert len(template.find_resources('AWS::CloudFormation::Stack')) == 3
+    plugin_config = next(iter(template.find_resources('Custom::RFDK_ConfigureSpotEventPlugin').values()))
+    configurations = plugin_config['Properties']['spotFleetRequestConfigurations']
+    for name in fleets:
+        launch_template_configs = configurations[f'{name}-cloud']['LaunchTemplateConfigs']
+        assert len(launch_template_configs) == 1
+        # The launch template comes from the fleet's nested stack
+        assert 'Fn::GetAtt' in launch_template_configs[0]['LaunchTemplateSpecification']['LaunchTemplateId']
+        overrides = launch_template_configs[0]['Overrides']
+        assert all(set(override) == {'InstanceType', 'SubnetId'} for override in overrides)
+        # The shard budgets estimate the configuration's size from above
+        assert len(json.dumps(configurations[f'{name}-cloud'])) < (
+            SPOT_PLUGIN_CONFIG_BYTES + SPOT_PLUGIN_CONFIG_BYTES_PER_OVERRIDE * len(overrides))
+
+
+def test_weighted_fleets_are_rejected():
+    with pytest.raises(ValueError):
+        make_spot_fleet_stack({'blender': make_fleet_config('blender', weight_by_vcpu=True)})
+
+
+def test_spot_fleet_requests_are_tagged_with_the_fleet_name():
+    template = Template.from_stack(make_spot_fleet_stack({'blender': make_fleet_config('blender')}))
+
+    plugin_config = next(iter(template.find_resources('Custom::RFDK_ConfigureSpotEventPlugin').values()))
+    tag_specifications = plugin_config['Properties']['spotFleetRequestConfigurations'][
+        'blender-cloud']['TagSpecifications']
+    assert {'Key': FLEET_NAME_TAG, 'Value': 'blender'} in next(
+        specification['Tags'] for specification in tag_specifications
+        if specification['ResourceType'] == 'spot-fleet-request')
@@ -0,0 +1,150 @@
+import aws_cdk as cdk
+import pytest
+from aws_cdk import aws_ec2 as ec2
+from aws_cdk.assertions import Match, Template
+
+from package.lib.storage_stack import (
+    StorageStack,
+    StorageStackProps,
+    WorkerMount,
+    get_az_worker_counts,
+    get_storage_subnets,
+    size_zfs,
+    worker_mount_read_statements,
+)
+
+
+def make_vpc() -> ec2.Vpc:
+    stack = cdk.Stack(cdk.App(), 'Vpc', env=cdk.Environment(account='123456789012', region='us-east-1'))
+    return ec2.Vpc(stack, 'Vpc', availability_zones=['us-east-1a', 'us-east-1b', 'us-east-1c'])
+
+
+def test_size_zfs_rounds_up_to_throughput_tier():
+    sizing = size_zfs(10, throughput_per_worker=50, iops_per_worker=500, capacity_per_worker=16)
+
+    assert sizing.throughput_capacity == 640
+    assert sizing.storage_capacity == 192
+    assert sizing.iops == 5000
+
+
+def test_size_zfs_caps_at_largest_tier():
+    sizing = size_zfs(1000, throughput_per_worker=50, iops_per_worker=500, capacity_per_worker=16)
+
+    assert sizing.throughput_capacity == 10240
+    assert sizing.iops == 400000
+
+
+def test_size_zfs_overrides():
+    sizing = size_zfs(10, 50, 500, 16, storage_capacity=1024, throughput_capacity=160, iops=3072)
+
+    assert (sizing.storage_capacity, sizing.throughput_capacity, sizing.iops) == (1024, 160, 3072)
+
+
+def test_size_zfs_rejects_invalid_throughput():
+    with pytest.raises(ValueError):
+        size_zfs(10, 50, 500, 16, throughput_capacity=200)
+
+
+def test_worker_mount_read_statements_grant_list_and_get_only():
+    mounts = [
+        WorkerMount(source='fs:/', path='/mnt/production', fs_type='nfs', options=''),
+        WorkerMount(source='s3://assets/', path='/mnt/assets', fs_type='mount-s3', options='',
+                    s3_bucket_arn='arn:aws:s3:::assets'),
+    ]
+    statements = [statement.to_statement_json() for statement in worker_mount_read_statements(mounts)]
+
+    assert statements == [
+        {'Action': 's3:ListBucket', 'Effect': 'Allow', 'Resource': 'arn:aws:s3:::assets'},
+        {'Action': 's3:GetObject', 'Effect': 'Allow', 'Resource': 'arn:aws:s3:::assets/*'},
+    ]
+    assert worker_mount_read_statements(mounts[:1]) == []
+
+
+def test_az_worker_counts_spread_unpinned_fleets():
+    fleets = [
+        {'name': 'blender', 'max_capacity': 6},
+        {'name': 'gpu', 'max_capacity': 4, 'availability_zones': ['us-east-1b']},
+    ]
+
+    assert get_az_worker_counts(fleets, ['us-east-1a', 'us-east-1b', 'us-east-1c']) == {
+        'us-east-1a': 2, 'us-east-1b': 6, 'us-east-1c': 2}
+    with pytest.raises(ValueError):
+        get_az_worker_counts([{'name': 'gpu', 'max_capacity': 4, 'availability_zones': ['us-east-1d']}],
+                             ['us-east-1a'])
+
+
+def test_storage_subnets_are_stable_and_follow_fleets():
+    vpc = make_vpc()
+    fleets = [{'name': 'gpu', 'max_capacity': 4, 'availability_zones': ['us-east-1c']}]
+
+    def get_azs(placement, placement_fleets):
+        return [subnet.availability_zone for subnet in get_storage_subnets(vpc, placement, placement_fleets)]
+
+    assert get_azs('first_az', fleets) == ['us-east-1a', 'us-east-1b', 'us-east-1c']
+    # Unpinned fleets weigh every AZ equally and keep the VPC's order
+    assert get_azs('fleet_az', [{'name': 'blender', 'max_capacity': 6}]) == ['us-east-1a', 'us-east-1b', 'us-east-1c']
+    assert get_azs('fleet_az', fleets) == ['us-east-1c', 'us-east-1a', 'us-east-1b']
+    with pytest.raises(ValueError):
+        get_storage_subnets(vpc, 'random', fleets)
+
+
+def test_zfs_is_exported_to_burst_regions():
+    vpc = make_vpc()
+    stack = StorageStack(vpc.stack.node.scope, 'Storage',
+        props=StorageStackProps(vpc=vpc, production_storage='zfs', spot_fleet_configs={},
+                                burst_client_cidrs={'us-west-2': '10.1.0.0/16'}),
+        env=cdk.Environment(account='123456789012', region='us-east-1'))
+    template = Template.from_stack(stack)
+
+    zfs = template.find_resources('AWS::FSx::FileSystem')['ZfsFileSystem']
+    client_configurations = zfs['Properties']['OpenZFSConfiguration']['RootVolumeConfiguration'][
+        'NfsExports'][0]['ClientConfigurations']
+    assert [configuration['Clients'] for configuration in client_configurations][1:] == ['10.1.0.0/16']
+    template.has_resource_properties('AWS::EC2::SecurityGroup', {
+        'SecurityGroupIngress': Match.array_with([Match.object_like(
+            {'CidrIp': '10.1.0.0/16', 'FromPort': 2049, 'Description': 'Burst region us-west-2 workers'})])})
+
+
+def test_lustre_file_servers_reach_each_other_and_clients():
+    vpc = make_vpc()
+    stack = StorageStack(vpc.stack.node.scope, 'Storage',
+        props=StorageStackProps(vpc=vpc, production_storage='efs', enable_efs=True, enable_fsx_zfs=False,
+                                enable_fsx_lustre=True, spot_fleet_configs={},
+                                burst_client_cidrs={'us-west-2': '10.1.0.0/16'}),
+        env=cdk.Environment(account='123456789012', region='us-east-1'))
+    template = Template.from_stack(stack)
+
+    # Inline egress rules, a group without them gets EC2's default allow-all egress
+    egress = template.find_resources('AWS::EC2::SecurityGroup')['RenderFarmStorageSG5FD12B9C'][
+        'Properties']['SecurityGroupEgress']
+    assert sorted((rule['FromPort'], rule['ToPort']) for rule in egress) == [(988, 988)] * 2 + [(1018, 1023)] * 2
+    assert sorted(rule['FromPort'] for rule in egress if rule['CidrIp'] == '10.1.0.0/16') == [988, 1018]
+
+
+def test_production_mounts_keep_close_to_open_consistency():
+    for production_storage in ('efs', 'zfs'):
+        vpc = make_vpc()
+        stack = StorageStack(vpc.stack.node.scope, 'Storage',
+            props=StorageStackProps(vpc=vpc, production_storage=production_storage, enable_efs=True,
+                                    enable_fsx_zfs=True, spot_fleet_configs={}),
+            env=cdk.Environment(account='123456789012', region='us-east-1'))
+
+        assert 'nocto' not in stack.worker_mounts[0].options.split(',')
+
+
+def test_zfs_keeps_pinned_subnets():
+    vpc = make_vpc()
+    stack = StorageStack(vpc.stack.node.scope, 'Storage',
+        props=StorageStackProps(vpc=vpc, production_storage='zfs', spot_fleet_configs={},
+                                zfs_subnet_ids=['subnet-33333333', 'subnet-11111111']),
+        env=cdk.Environment(account='123456789012', region='us-east-1'))
+
+    Template.from_stack(stack).has_resource_properties('AWS::FSx::FileSystem', {
+        'SubnetIds': ['subnet-33333333', 'subnet-11111111'],
+        'OpenZFSConfiguration': Match.object_like({'PreferredSubnetId': 'subnet-33333333'}),
+    })
+    with pytest.raises(ValueError):
+        StorageStack(vpc.stack.node.scope, 'OtherStorage',
+            props=StorageStackProps(vpc=vpc, production_storage='zfs', spot_fleet_configs={},
+                                    zfs_subnet_ids=['subnet-33333333']),
+            env=cdk.Environment(account='123456789012', region='us-east-1'))
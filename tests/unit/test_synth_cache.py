@@ -0,0 +1,108 @@
+import json
+import os
+
+from package.synth_cache import SynthCache
+
+
+DEPENDENCIES = {
+    'Vpc': [],
+    'Storage': ['Vpc'],
+    'Fleet': ['Vpc', 'Storage'],
+}
+
+
+def write_assembly(outdir, stack_names):
+    os.makedirs(outdir, exist_ok=True)
+    artifacts = {}
+    for name in stack_names:
+        with open(os.path.join(outdir, f'{name}.template.json'), 'w') as f:
+            json.dump({'Resources': {name: {}}}, f)
+        with open(os.path.join(outdir, f'asset.{name}'), 'w') as f:
+            f.write(name)
+        with open(os.path.join(outdir, f'{name}.assets.json'), 'w') as f:
+            json.dump({'files': {name: {'source': {'path': f'asset.{name}'}}}}, f)
+        artifacts[f'{name}.assets'] = {'type': 'cdk:asset-manifest', 'properties': {'file': f'{name}.assets.json'}}
+        artifacts[name] = {
+            'type': 'aws:cloudformation:stack',
+            'properties': {'templateFile': f'{name}.template.json'},
+            'dependencies': [f'{name}.assets'],
+        }
+    with open(os.path.join(outdir, 'manifest.json'), 'w') as f:
+        json.dump({'version': '1', 'artifacts': artifacts}, f)
+
+
+def make_cache(tmp_path, values):
+    cache = SynthCache(str(tmp_path / 'cache'), str(tmp_path / 'src'))
+    os.makedirs(tmp_path / 'src', exist_ok=True)
+    for name in DEPENDENCIES:
+        cache.compute_key(name, values.get(name, {}))
+    return cache
+
+
+def test_unchanged_stacks_are_restored(tmp_path):
+    cache = make_cache(tmp_path, {})
+    write_assembly(str(tmp_path / 'first'), list(DEPENDENCIES))
+    cache.save(str(tmp_path / 'first'), list(DEPENDENCIES))
+
+    cache = make_cache(tmp_path, {})
+    restorable = cache.select_restorable(list(DEPENDENCIES), DEPENDENCIES)
+    assert restorable == set(DEPENDENCIES)
+
+    write_assembly(str(tmp_path / 'second'), [])
+    cache.restore(str(tmp_path / 'second'), restorable)
+    with open(tmp_path / 'second' / 'manifest.json') as f:
+        manifest = json.load(f)
+    assert set(manifest['artifacts']) == {name for stack in DEPENDENCIES for name in (stack, f'{stack}.assets')}
+    assert os.path.isfile(tmp_path / 'second' / 'asset.Fleet')
+
+
+def test_changed_stack_invalidates_its_neighbours(tmp_path):
+    cache = make_cache(tmp_path, {})
+    write_assembly(str(tmp_path / 'first'), list(DEPENDENCIES))
+    cache.save(str(tmp_path / 'first'), list(DEPENDENCIES))
+
+    # A changed fleet needs its dependencies as constructs
+    cache = make_cache(tmp_path, {'Fleet': {'max_capacity': 10}})
+    assert cache.select_restorable(list(DEPENDENCIES), DEPENDENCIES) == set()
+
+    # A rebuilt VPC must not drop exports used by a cached storage stack
+    cache = make_cache(tmp_path, {'Vpc': {'cidr': '10.1.0.0/16'}})
+    assert cache.select_restorable(['Vpc', 'Storage'], DEPENDENCIES) == set()
+
+
+def test_disabled_cache_never_hits(tmp_path):
+    cache = make_cache(tmp_path, {})
+    write_assembly(str(tmp_path / 'first'), list(DEPENDENCIES))
+    cache.save(str(tmp_path / 'first'), list(DEPENDENCIES))
+
+    cache = SynthCache(str(tmp_path / 'cache'), str(tmp_path / 'src'), enabled=False)
+    for name in DEPENDENCIES:
+        cache.compute_key(name, {})
+    assert cache.select_restorable(list(DEPENDENCIES), DEPENDENCIES) == set()
+
+
+def test_assembly_with_missing_context_is_not_cached(tmp_path):
+    cache = make_cache(tmp_path, {})
+    write_assembly(str(tmp_path / 'first'), list(DEPENDENCIES))
+    with open(tmp_path / 'first' / 'manifest.json') as f:
+        manifest = json.load(f)
+    manifest['missing'] = [{'key': 'vpc-provider:account=123456789012:region=us-east-1', 'provider': 'vpc-provider'}]
+    with open(tmp_path / 'first' / 'manifest.json', 'w') as f:
+        json.dump(manifest, f)
+    cache.save(str(tmp_path / 'first'), list(DEPENDENCIES))
+
+    assert make_cache(tmp_path, {}).select_restorable(list(DEPENDENCIES), DEPENDENCIES) == set()
+
+
+def test_ignored_files_do_not_change_keys(tmp_path):
+    os.makedirs(tmp_path / 'src')
+    (tmp_path / 'src' / 'config.py').write_text('max_capacity = 5\n')
+    (tmp_path / 'src' / 'app.py').write_text('app = None\n')
+    cache = SynthCache(str(tmp_path / 'cache'), str(tmp_path / 'src'), ignored_files=['config.py'])
+    key = cache.compute_key('Fleet', {'max_capacity': 5})
+
+    (tmp_path / 'src' / 'config.py').write_text('max_capacity = 5  # per fleet\n')
+    assert cache.compute_key('Fleet', {'max_capacity': 5}) == key
+
+    (tmp_path / 'src' / 'app.py').write_text('app = True\n')
+    assert cache.compute_key('Fleet', {'max_capacity': 5}) != key
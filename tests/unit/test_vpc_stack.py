@@ -0,0 +1,29 @@
+import aws_cdk as cdk
+import pytest
+from aws_cdk.assertions import Template
+
+from package.lib.vpc_stack import VpcStack, VpcStackProps, get_nat_gateway_count
+
+
+def test_nat_gateway_modes():
+    assert get_nat_gateway_count('single') == 1
+    assert get_nat_gateway_count('per_az') is None
+    with pytest.raises(ValueError):
+        get_nat_gateway_count('none')
+
+
+def test_vpc_stack_adds_nat_per_az_and_endpoints():
+    app = cdk.App()
+    stack = VpcStack(app, 'Vpc', props=VpcStackProps(nat_gateway_mode='per_az', vpc_endpoints=['s3', 'ssm']),
+                     env=cdk.Environment(account='123456789012', region='us-east-1'))
+    template = Template.from_stack(stack)
+
+    azs = len(stack.vpc.availability_zones)
+    template.resource_count_is('AWS::EC2::NatGateway', azs)
+    # S3 gateway endpoint and the ssm, ssmmessages and ec2messages interface endpoints
+    template.resource_count_is('AWS::EC2::VPCEndpoint', 4)
+
+
+def test_vpc_stack_rejects_unknown_endpoints():
+    with pytest.raises(ValueError):
+        VpcStack(cdk.App(), 'Vpc', props=VpcStackProps(vpc_endpoints=['dynamodb']))
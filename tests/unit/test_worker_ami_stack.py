@@ -0,0 +1,58 @@
+import json
+
+import aws_cdk as cdk
+from aws_cdk import aws_ec2 as ec2
+from aws_cdk.assertions import Template
+
+from package.lib.worker_ami_stack import WorkerAmiStack, WorkerAmiStackProps
+
+
+FLEETS = {
+    'blender': {
+        'name': 'blender',
+        'is_linux': True,
+        'render_app': {'name': 'blender', 'version': '4.2.3'},
+    },
+}
+
+
+def get_names(deadline_version, fleets=FLEETS):
+    app = cdk.App()
+    env = cdk.Environment(account='123456789012', region='us-east-1')
+    vpc = ec2.Vpc(cdk.Stack(app, 'Vpc', env=env), 'Vpc')
+    stack = WorkerAmiStack(app, 'WorkerAmi', env=env, props=WorkerAmiStackProps(
+        vpc=vpc, deadline_version=deadline_version, spot_fleet_configs=fleets))
+    template = Template.from_stack(stack)
+    resources = {**template.find_resources('AWS::ImageBuilder::Component'),
+                 **template.find_resources('AWS::ImageBuilder::ImageRecipe')}
+    return {resource['Properties']['Name'] for resource in resources.values()}
+
+
+def test_changed_contents_rename_components_and_recipes():
+    names = get_names('10.4.2')
+
+    # Unchanged contents keep their names
+    assert get_names('10.4.2') == names
+    changed = names - get_names('10.4.3')
+    assert {name.rsplit('-', 1)[0] for name in changed} == {'WorkerAmi-DeadlineClient', 'WorkerAmi-blender'}
+    # Another render app version only renames its component and the recipe using it
+    fleets = {'blender': {**FLEETS['blender'], 'render_app': {'name': 'blender', 'version': '4.2.4'}}}
+    changed = names - get_names('10.4.2', fleets)
+    assert {name.rsplit('-', 1)[0] for name in changed} == {'WorkerAmi-Blender423', 'WorkerAmi-blender'}
+
+
+def test_blender_component_validates_the_installed_binary():
+    app = cdk.App()
+    env = cdk.Environment(account='123456789012', region='us-east-1')
+    vpc = ec2.Vpc(cdk.Stack(app, 'Vpc', env=env), 'Vpc')
+    template = Template.from_stack(WorkerAmiStack(app, 'WorkerAmi', env=env, props=WorkerAmiStackProps(
+        vpc=vpc, deadline_version='10.4.2', spot_fleet_configs=FLEETS)))
+
+    recipe = next(iter(template.find_resources('AWS::ImageBuilder::ImageRecipe').values()))
+    assert 'amazon-linux-2023-x86' in json.dumps(recipe['Properties']['ParentImage'])
+    component = next(resource for resource in template.find_resources('AWS::ImageBuilder::Component').values()
+                     if resource['Properties']['Name'].startswith('WorkerAmi-Blender423-'))
+    phases = json.loads(component['Properties']['Data'])['phases']
+    validate = [phase for phase in phases if phase['name'] == 'validate']
+    assert validate[0]['steps'][0]['inputs']['commands'] == [
+        'set -euo pipefail', 'blender --version | grep "^Blender 4.2.3"']
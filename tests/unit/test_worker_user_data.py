@@ -0,0 +1,88 @@
+import aws_cdk as cdk
+import pytest
+
+from package.lib.storage_stack import WorkerMount
+from package.lib.worker_user_data import (
+    WorkerUserDataProvider,
+    boot_phase_command,
+    mount_commands,
+    validate_worker_policy,
+    worker_instance_commands,
+)
+
+
+def test_worker_instance_commands_per_gpu_creates_worker_instances():
+    commands = '\n'.join(worker_instance_commands(None, 'per_gpu'))
+
+    assert 'WORKER_COUNT=$(( GPU_COUNT < WORKER_COUNT ? GPU_COUNT : WORKER_COUNT ))' in commands
+    assert 'touch "/var/lib/Thinkbox/Deadline10/slaves/worker$WORKER.ini"' in commands
+    assert 'WORKER_SETTINGS+=(-g "$WORKER")' in commands
+
+
+def test_worker_instance_commands_sizes_by_vcpus_and_memory():
+    commands = '\n'.join(worker_instance_commands(
+        {'vcpus_per_worker': 8, 'memory_per_worker_gib': 16, 'max_workers': 4}, None))
+
+    assert 'WORKER_COUNT=4' in commands
+    assert 'VCPUS / 8 < WORKER_COUNT' in commands
+    assert 'MEMORY_GIB / 16 < WORKER_COUNT' in commands
+    assert '-c "$(seq -s , $(( WORKER * 8 )) $(( (WORKER + 1) * 8 - 1 )))"' in commands
+
+
+def test_worker_instance_commands_tasks_mode_sets_concurrent_tasks():
+    commands = '\n'.join(worker_instance_commands({'mode': 'tasks', 'vcpus_per_worker': 4}, None))
+
+    assert '-n "$WORKER_NAME" -t "$WORKER_COUNT"' in commands
+    assert 'slaves' not in commands
+
+
+def test_worker_instance_commands_without_policy():
+    assert worker_instance_commands(None, None) == []
+    with pytest.raises(ValueError):
+        worker_instance_commands(None, 'per_core')
+
+
+def test_validate_worker_policy():
+    with pytest.raises(ValueError):
+        validate_worker_policy('blender', {'cpus_per_worker': 4})
+    with pytest.raises(ValueError):
+        validate_worker_policy('blender', {'vcpus_per_worker': 0})
+
+
+def test_mount_commands_adds_fs_cache_option():
+    mount = WorkerMount(source='fs:/', path='/mnt/production', fs_type='nfs', options='nfsvers=4.1', fs_cache=True)
+
+    assert 'nfsvers=4.1$FS_CACHE_OPTION' in '\n'.join(mount_commands(mount))
+
+
+def test_only_cached_mounts_wait_for_local_storage():
+    cached = '\n'.join(mount_commands(WorkerMount(
+        source='fs:/', path='/mnt/production', fs_type='nfs', options='nfsvers=4.1', fs_cache=True)))
+    uncached = '\n'.join(mount_commands(WorkerMount(
+        source='fs@tcp:/fsx', path='/mnt/lustre', fs_type='lustre', options='noatime')))
+
+    assert cached.index('kill -0 "$LOCAL_STORAGE_PID"') < cached.index('/etc/fstab')
+    assert 'LOCAL_STORAGE_PID' not in uncached
+
+
+def test_local_storage_is_set_up_in_the_background():
+    provider = WorkerUserDataProvider(cdk.Stack(), 'UserData', render_queue_address='renderqueue:4433',
+        use_traffic_encryption=True, mounts=[WorkerMount(
+            source='fs:/', path='/mnt/production', fs_type='nfs', options='nfsvers=4.1', fs_cache=True)])
+    commands = provider.pre_cloud_watch_agent_commands()
+
+    assert commands.index('LOCAL_STORAGE_PID=$!') < commands.index('MOUNT_PIDS+=($!)')
+    assert provider.pre_worker_configuration_commands()[0].startswith('wait "$LOCAL_STORAGE_PID"')
+
+
+def test_mount_commands_mounts_s3_with_local_cache():
+    mount = WorkerMount(source='s3://assets/', path='/mnt/assets', fs_type='mount-s3', options='read-only')
+    commands = '\n'.join(mount_commands(mount))
+
+    assert 'command -v mount-s3 >/dev/null || yum install -y' in commands
+    assert '"s3://assets/ /mnt/assets mount-s3 read-only,cache=/mnt/local/s3cache 0 0"' in commands
+
+
+def test_boot_phase_command_records_uptime():
+    assert boot_phase_command('MountsReady') == \
+        'echo "MountsReady $(cut -d " " -f 1 /proc/uptime)" >> /var/lib/render-boot/phases'